@@ -0,0 +1,418 @@
+"""
+Замеры без сети на локальном стенде (standin_server) и сравнение с базой.
+
+Сценарии:
+  pinterest_download — download_all() по N пинам (оригиналы /originals/)
+  pixiv_user         — handle_pixiv_user(): сбор ID, пакетный резолв, конвейер
+  pixiv_ajax_pages   — N вызовов pixiv_ajax_pages() в RESOLVE_WORKERS потоков
+  scroll_pinterest   — collect_image_urls() по ленте из N пинов
+  scroll_pixiv       — smart_infinite_scroll() по ленте из N работ
+
+Скролл идёт через FeedDriver — «браузер без браузера», который листает
+ту же ленту /api/feed, что и страница /feed; с --browser edge|chrome —
+через настоящий headless-браузер.
+
+Каждый замер (сценарий × размер) — отдельный процесс: пиковый RSS
+относится только к нему. Стенд живёт в родительском процессе, его
+счётчики дают «запросов на работу» (с ретраями и подсунутыми 429/503).
+
+  python src/bench.py --sizes 1000,10000,50000 --save bench_baseline.json
+  python src/bench.py --sizes 1000,10000 --baseline bench_baseline.json
+Код выхода 1 — есть регрессия хуже --tolerance относительно базы.
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+import dom_extract
+import scroll_pacing
+from standin_server import StandinConfig, pin_hash, start_server
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCENARIOS = ("pinterest_download", "pixiv_user", "pixiv_ajax_pages", "scroll_pinterest", "scroll_pixiv")
+# Чем больше, тем лучше; остальные метрики — чем меньше, тем лучше
+HIGHER_IS_BETTER = ("files_per_s", "mb_per_s", "items_per_s")
+COMPARED = ("files_per_s", "mb_per_s", "items_per_s", "requests_per_work", "peak_rss_mb")
+
+
+# ---------- браузер без браузера ----------
+class FeedDriver:
+    """
+    Лента стенда без браузера: «скролл» подгружает следующую пачку
+    /api/feed, когда до низа меньше 1200px — как JS страницы /feed.
+    Понимает скрипты dom_extract, AdaptivePacer и скроллы коллекторов.
+    Пачка грузится в фоне, как fetch на странице: пока ответ не пришёл,
+    трекер AdaptivePacer видит запрос «в полёте», новые узлы появляются
+    только после ответа, и от него же отсчитывается тишина сети.
+    """
+
+    VIEWPORT = 900
+    ROW_H = 308
+    PER_ROW = 5
+
+    def __init__(self, base: str):
+        self.base = base
+        self.sess = requests.Session()
+        self.current_url = "about:blank"
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._fetcher: threading.Thread | None = None
+
+    def get(self, url: str) -> None:
+        self._wait_fetch()
+        self.current_url = url
+        self.kind = (parse_qs(urlsplit(url).query).get("kind") or [""])[0]
+        self.items: list[dict] = []
+        self.page = 0
+        self.more = True
+        self.y = 0
+        self._cursor: dict[tuple, int] = {}
+        # Первая пачка — часть загрузки страницы
+        self._inflight = 1
+        self._fetch(0)
+
+    def _fetch(self, page: int) -> None:
+        try:
+            j = self.sess.get(f"{self.base}/api/feed", params={"kind": self.kind, "page": page}).json()
+        except (requests.RequestException, ValueError):
+            j = {"items": [], "more": self.more}
+        with self._lock:
+            self.items.extend(j["items"])
+            self.page = page + 1
+            self.more = bool(j["more"])
+            self._inflight -= 1
+            self._last = time.monotonic()
+
+    def _wait_fetch(self) -> None:
+        if self._fetcher is not None:
+            self._fetcher.join()
+            self._fetcher = None
+
+    @property
+    def height(self) -> int:
+        return math.ceil(len(self.items) / self.PER_ROW) * self.ROW_H
+
+    def _scroll_to(self, y: float) -> None:
+        with self._lock:
+            self.y = int(max(0, min(y, self.height - self.VIEWPORT)))
+            start = (self.more and not self._inflight
+                     and self.y + self.VIEWPORT >= self.height - 1200)
+            if start:
+                self._inflight += 1
+                self._last = time.monotonic()
+        if start:
+            self._fetcher = threading.Thread(target=self._fetch, args=(self.page,), daemon=True)
+            self._fetcher.start()
+
+    def _extract(self, selector: str, kind: str, incremental: bool) -> list:
+        key = (kind, selector)
+        with self._lock:
+            items = list(self.items)
+        start = 0
+        if incremental:
+            start = self._cursor.get(key, 0)
+            self._cursor[key] = len(items)
+        if kind == "img":
+            return [[it["src"], it.get("srcset", "")] for it in items[start:]]
+        return [it["href"] for it in items[start:] if "href" in it]
+
+    def _tracker(self) -> tuple[int, int, float]:
+        with self._lock:
+            return len(self.items), self._inflight, (time.monotonic() - self._last) * 1000
+
+    def execute_script(self, script: str, *args):
+        self.calls += 1
+        if script is dom_extract._EXTRACT_JS:
+            return self._extract(*args)
+        if script is dom_extract._RESET_JS:
+            self._cursor.clear()
+            return None
+        if script is scroll_pacing._PROBE_JS:
+            return [*self._tracker(), self.height]
+        if "window.__adPace ||" in script:
+            # AdaptivePacer.settle() после driver.get
+            return list(self._tracker())
+        if "scrollBy" in script:
+            self._scroll_to(self.y + self.VIEWPORT * 0.8)
+            return self.y
+        if "scrollTo(0, arguments[0])" in script:
+            self._scroll_to(args[0])
+            return self.y
+        if "scrollTo(0, document.body.scrollHeight)" in script:
+            self._scroll_to(self.height)
+            return [self.y, self.height] if "return [" in script else None
+        if "scrollHeight" in script:
+            return self.height
+        return None
+
+    def quit(self) -> None:
+        self._wait_fetch()
+        self.sess.close()
+
+
+def make_browser(name: str):
+    from pacing_report import make_driver
+    return make_driver(name, None)
+
+
+# ---------- сценарии (в дочернем процессе) ----------
+def _quiet():
+    # 50k строк [OK] в консоль стоят заметного времени — в замер их не пускаем
+    return contextlib.redirect_stdout(open(os.devnull, "w", encoding="utf-8"))
+
+
+def run_pinterest_download(base: str, size: int, out: str, args) -> dict:
+    import pinterest_download_pins as pins
+    urls = []
+    for i in range(size):
+        h = pin_hash(i)
+        urls.append(f"{base}/i.pinimg.com/736x/{h[:2]}/{h[2:4]}/{h[4:6]}/{h}.jpg")
+    workers = args.workers or pins.DOWNLOAD_WORKERS
+    with _quiet():
+        ok = pins.download_all(urls, out, workers)
+    nbytes = sum(e.stat().st_size for e in os.scandir(out) if e.is_file())
+    return {"works": size, "files": ok, "bytes": nbytes}
+
+
+def _pixiv_session(base: str, args):
+    import pixiv_core as px
+    px.PIXIV_API_ROOT = base
+    # Замеряем код, а не вежливость: лимитер почти не держит (если не задан --rate)
+    px.RATE_LIMITER.defaults.update(rate=args.rate, max_rate=max(args.rate, px.RATE_MAX), burst=args.rate)
+    if args.workers:
+        px.DOWNLOAD_WORKERS = args.workers
+    return px, px.get_session_with_cookies(None, px.PIXIV_REFERER_ROOT, cookies=[],
+                                           pool_size=px.RESOLVE_WORKERS + px.DOWNLOAD_WORKERS)
+
+
+def run_pixiv_user(base: str, size: int, out: str, args) -> dict:
+    px, sess = _pixiv_session(base, args)
+    with _quiet():
+        px.handle_pixiv_user(None, sess, "https://www.pixiv.net/users/1", out, None)
+        px.save_sidecars(out, None)
+    return {"works": size, "files": px.TRANSFER.files, "bytes": px.TRANSFER.bytes}
+
+
+def run_pixiv_ajax_pages(base: str, size: int, out: str, args) -> dict:
+    px, sess = _pixiv_session(base, args)
+    with ThreadPoolExecutor(max_workers=px.RESOLVE_WORKERS) as ex:
+        found = sum(len(r) for r in ex.map(lambda i: px.pixiv_ajax_pages(sess, str(i)), range(1000, 1000 + size)))
+    return {"works": size, "items": found}
+
+
+def _feed_driver(base: str, kind: str, args):
+    url = f"{base}/feed" + (f"?kind={kind}" if kind else "")
+    drv = make_browser(args.browser) if args.browser else FeedDriver(base)
+    drv.get(url)
+    return drv
+
+
+def run_scroll_pinterest(base: str, size: int, out: str, args) -> dict:
+    import pinterest_download_pins as pins
+    drv = _feed_driver(base, "", args)
+    try:
+        with _quiet():
+            urls = pins.collect_image_urls(drv, size // 5 + 50, pins.SCROLL_PAUSE, pins.ADAPTIVE_STABLE_ROUNDS,
+                                           adaptive=True, stable_seconds=args.stable_s)
+    finally:
+        drv.quit()
+    return {"works": size, "items": len(urls)}
+
+
+def run_scroll_pixiv(base: str, size: int, out: str, args) -> dict:
+    import pixiv_core as px
+    px.SCROLL_MAX_ROUNDS = size // 5 + 50
+    px.ADAPTIVE_PACING = True
+    px.SCROLL_STABLE_S = args.stable_s
+    drv = _feed_driver(base, "pixiv", args)
+    try:
+        with _quiet():
+            ids = px.smart_infinite_scroll(drv)
+    finally:
+        drv.quit()
+    return {"works": size, "items": len(ids)}
+
+
+RUNNERS = {
+    "pinterest_download": run_pinterest_download,
+    "pixiv_user": run_pixiv_user,
+    "pixiv_ajax_pages": run_pixiv_ajax_pages,
+    "scroll_pinterest": run_scroll_pinterest,
+    "scroll_pixiv": run_scroll_pixiv,
+}
+
+
+def peak_rss_mb() -> float | None:
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux — КБ, macOS — байты
+        return round(rss / (1048576 if sys.platform == "darwin" else 1024), 1)
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / 1048576, 1)
+    except (ImportError, AttributeError):
+        return None
+
+
+def child_main(args) -> None:
+    out = tempfile.mkdtemp(prefix="bench-")
+    try:
+        t0 = time.perf_counter()
+        res = RUNNERS[args.child](args.base, args.size, out, args)
+        res["seconds"] = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+    res["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(res))
+
+
+# ---------- родительский процесс ----------
+def measure(scenario: str, size: int, args) -> dict:
+    cfg = StandinConfig(items=size, page_size=25, latency=args.latency, jitter=args.latency / 4,
+                        works=size, file_size=args.file_kb * 1024, img_latency=args.img_latency,
+                        error_rate=args.error_rate, retry_after=0.2)
+    srv, base = start_server(cfg)
+    try:
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", scenario, "--size", str(size),
+               "--base", base, "--rate", str(args.rate), "--workers", str(args.workers),
+               "--stable-s", str(args.stable_s)]
+        if args.browser:
+            cmd += ["--browser", args.browser]
+        p = subprocess.run(cmd, capture_output=True, text=True)
+        if p.returncode != 0:
+            raise RuntimeError(f"{scenario}/{size}: {p.stderr.strip().splitlines()[-1] if p.stderr.strip() else p.returncode}")
+        res = json.loads(p.stdout.strip().splitlines()[-1])
+    finally:
+        srv.shutdown()
+    hits = cfg.reset_hits()
+    secs = max(res["seconds"], 1e-6)
+    requests_made = sum(hits.values())
+    row = {
+        "scenario": scenario,
+        "size": size,
+        "seconds": round(secs, 3),
+        "works": res["works"],
+        "files": res.get("files", 0),
+        "items": res.get("items", 0),
+        "requests": requests_made,
+        "injected_errors": sum(v for k, v in hits.items() if k.endswith((":429", ":503"))),
+        "requests_per_work": round(requests_made / max(res["works"], 1), 3),
+        "files_per_s": round(res.get("files", 0) / secs, 2),
+        "mb_per_s": round(res.get("bytes", 0) / 1048576 / secs, 2),
+        "items_per_s": round(res.get("items", 0) / secs, 2),
+        "peak_rss_mb": res["peak_rss_mb"],
+    }
+    return row
+
+
+def compare(rows: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """Регрессии: метрика хуже базы больше чем на tolerance (доля)."""
+    base = {(r["scenario"], r["size"]): r for r in baseline}
+    out = []
+    for r in rows:
+        b = base.get((r["scenario"], r["size"]))
+        if b is None:
+            continue
+        for m in COMPARED:
+            new, old = r.get(m), b.get(m)
+            if new is None or old is None or (not new and not old):
+                continue
+            if m in HIGHER_IS_BETTER:
+                worse = new < old * (1 - tolerance)
+            else:
+                worse = new > old * (1 + tolerance)
+            if worse:
+                out.append(f"{r['scenario']}/{r['size']}: {m} {old} → {new} "
+                           f"({(new - old) / max(abs(old), 1e-9) * 100:+.0f}%)")
+    return out
+
+
+def print_table(rows: list[dict]) -> None:
+    cols = ("scenario", "size", "seconds", "files_per_s", "mb_per_s", "items_per_s",
+            "requests_per_work", "injected_errors", "peak_rss_mb")
+    print("  ".join(f"{c:>18}" if i else f"{c:<20}" for i, c in enumerate(cols)))
+    for r in rows:
+        print("  ".join(f"{str(r[c]):>18}" if i else f"{str(r[c]):<20}" for i, c in enumerate(cols)))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Замеры на локальном стенде Pinterest/Pixiv")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS), help="через запятую: " + ", ".join(SCENARIOS))
+    ap.add_argument("--sizes", default="1000", help="размеры коллекций через запятую (1000,10000,50000)")
+    ap.add_argument("--latency", type=float, default=0.02, help="задержка AJAX/ленты стенда, с")
+    ap.add_argument("--img-latency", type=float, default=0.0, help="задержка отдачи картинки, с")
+    ap.add_argument("--file-kb", type=int, default=16, help="размер «оригинала», КБ")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="доля подсунутых 429/503")
+    ap.add_argument("--rate", type=float, default=500.0, help="темп лимитера Pixiv, запр/с")
+    ap.add_argument("--workers", type=int, default=0, help="потоков скачивания (0 — из настроек модулей)")
+    ap.add_argument("--stable-s", type=float, default=1.0, help="сколько секунд без роста ленты = конец скролла")
+    ap.add_argument("--browser", choices=["edge", "chrome"], help="скролл в настоящем headless-браузере")
+    ap.add_argument("--json", help="записать результаты в файл")
+    ap.add_argument("--save", metavar="BASELINE", help="сохранить результаты как базу")
+    ap.add_argument("--baseline", help="сравнить с базой")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="допустимое ухудшение (доля)")
+    # Внутреннее: запуск одного замера в дочернем процессе
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--base", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child_main(args)
+        return 0
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in RUNNERS]
+    if unknown:
+        ap.error(f"неизвестные сценарии: {', '.join(unknown)}")
+    rows = []
+    for size in (int(x) for x in args.sizes.split(",") if x.strip()):
+        for sc in scenarios:
+            print(f"[bench] {sc} × {size}…", file=sys.stderr)
+            rows.append(measure(sc, size, args))
+    print_table(rows)
+
+    doc = {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "python": sys.version.split()[0],
+           "params": {k: getattr(args, k) for k in ("latency", "img_latency", "file_kb", "error_rate",
+                                                    "rate", "workers", "stable_s", "browser")},
+           "results": rows}
+    for path in (args.json, args.save):
+        if path:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(doc, f, ensure_ascii=False, indent=1)
+            os.replace(path + ".tmp", path)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if base.get("params") != doc["params"]:
+            print(f"[warn] параметры базы отличаются: {base.get('params')}", file=sys.stderr)
+        regressions = compare(rows, base.get("results") or [], args.tolerance)
+        if regressions:
+            print(f"\nРегрессии (хуже базы > {args.tolerance:.0%}):")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print(f"\nРегрессий нет (допуск {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
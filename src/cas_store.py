@@ -0,0 +1,161 @@
+"""
+Контентно-адресуемое хранилище (дедупликация одинаковых картинок).
+
+Хеш считается прямо во время записи 32 КБ чанков — файл не
+перечитывается. Содержимое хранится один раз в objects/ab/<digest>,
+а по «логическим» путям (board, папка pixiv-пользователя) кладутся
+жёсткие ссылки на этот blob.
+
+Исключение — докачка: состояние hashlib не сохранить рядом с .part,
+поэтому уже лежащий префикс читается один раз, чтобы засеять хеш.
+
+Индекс (index.json) помнит:
+  blobs: digest → {"size", "ext"}
+  keys:  стабильный ключ URL → digest
+По ключу уже известной картинки её можно положить по новому пути
+вообще без сетевого запроса.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+HASH_ALGO = "sha256"
+
+
+class HashingWriter:
+    """Файл для записи, который попутно считает хеш всего записанного."""
+
+    def __init__(self, path: str, mode: str = "wb", algo: str = HASH_ALGO):
+        self.path = path
+        self.size = 0
+        self._h = hashlib.new(algo)
+        if "a" in mode and os.path.exists(path):
+            # Докачка: хеш должен покрывать уже лежащий префикс .part
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    self._h.update(chunk)
+                    self.size += len(chunk)
+        self._f = open(path, mode)
+
+    def write(self, chunk: bytes) -> int:
+        self._h.update(chunk)
+        self.size += len(chunk)
+        return self._f.write(chunk)
+
+    @property
+    def digest(self) -> str:
+        return self._h.hexdigest()
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "HashingWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class CasStore:
+    def __init__(self, root: str, algo: str = HASH_ALGO, autosave_every: int = 50, log=print):
+        self.root = root
+        self.algo = algo
+        self.autosave_every = autosave_every
+        self.log = log
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.index_path = os.path.join(root, "index.json")
+        self.blobs: dict[str, dict] = {}
+        self.keys: dict[str, str] = {}
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._load()
+
+    # ---------- индекс ----------
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.blobs = dict(data.get("blobs") or {})
+            self.keys = dict(data.get("keys") or {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            self.log(f"[warn] индекс CAS {self.index_path} не прочитан: {e}")
+
+    def save(self) -> None:
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"algo": self.algo, "blobs": self.blobs, "keys": self.keys}, f,
+                      separators=(",", ":"))
+        os.replace(tmp, self.index_path)
+        self._dirty = 0
+
+    def _touch_locked(self) -> None:
+        self._dirty += 1
+        if self.autosave_every and self._dirty >= self.autosave_every:
+            self._save_locked()
+
+    # ---------- blobs ----------
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def writer(self, part_path: str, mode: str = "wb") -> HashingWriter:
+        return HashingWriter(part_path, mode, self.algo)
+
+    def lookup(self, key: str) -> tuple[str, dict] | None:
+        """(digest, {"size", "ext"}) для известного ключа, если blob на месте."""
+        with self._lock:
+            digest = self.keys.get(key)
+            meta = self.blobs.get(digest) if digest else None
+        if not meta or not os.path.isfile(self.blob_path(digest)):
+            return None
+        return digest, meta
+
+    def link_known(self, key: str, path: str) -> bool:
+        """Кладёт уже известный по ключу blob по пути path без скачивания."""
+        hit = self.lookup(key)
+        if not hit:
+            return False
+        self._materialize(hit[0], path)
+        return True
+
+    def commit(self, part_path: str, digest: str, path: str, key: str | None = None,
+               ext: str = "") -> bool:
+        """
+        Переносит готовый .part в хранилище и ставит ссылку по path.
+        Возвращает True, если такой контент уже был (дубликат отброшен).
+        """
+        blob = self.blob_path(digest)
+        with self._lock:
+            dup = digest in self.blobs and os.path.isfile(blob)
+            if dup:
+                os.remove(part_path)
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(part_path, blob)
+                self.blobs[digest] = {"size": os.path.getsize(blob), "ext": ext}
+            if key:
+                self.keys[key] = digest
+            self._touch_locked()
+        self._materialize(digest, path)
+        return dup
+
+    def _materialize(self, digest: str, path: str) -> None:
+        blob = self.blob_path(digest)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".lnk"
+        try:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            os.link(blob, tmp)
+        except OSError:
+            # Другой том / ФС без жёстких ссылок — остаётся только копия
+            shutil.copyfile(blob, tmp)
+        os.replace(tmp, path)
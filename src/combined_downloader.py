@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Единый консольный загрузчик: Pixiv и Pinterest по списку URL, без окна.
+
+URL берутся из аргументов и/или файла (-i, по одному в строке, # —
+комментарий, "-" — stdin) и раздаются обработчикам по хосту, как в
+process_single_url(). Модули сайтов импортируются только при первом
+URL своего сайта, Selenium — только если понадобился браузер, tkinter
+не импортируется вовсе: cron-синхронизация Pixiv по сохранённым кукам
+(--no-browser) стартует быстро и работает на Linux без дисплея.
+
+Лог идёт в stderr, результат — JSON в stdout (или в файл --json):
+по записи на URL (сайт, статус, время, ошибка), итоги и метрики по
+стадиям (они же во время работы — в {out}/.metrics.json и Prometheus
+textfile, см. metrics.py). Код выхода
+0 — все URL обработаны, 1 — были ошибки, 2 — нечего делать.
+
+  python combined_downloader.py -i urls.txt -o downloads
+  python combined_downloader.py --no-browser --json sync.json https://www.pixiv.net/users/123
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from metrics import METRICS, MetricsReporter
+
+# ===================== НАСТРОЙКИ =====================
+DOWNLOAD_ROOT     = "downloads"
+URL_WORKERS       = 3      # сколько URL одновременно (браузерные шаги всё равно по очереди)
+EDGE_PROFILE_ROOT = os.path.join(os.environ.get("LOCALAPPDATA", ""), "Microsoft", "Edge", "User Data")
+EDGE_PROFILE_NAME = "Default"
+PINTEREST_SETTLE_S = 3.0   # пауза после открытия борда перед скроллом
+METRICS_REFRESH_S = 15.0   # как часто переписывать {out}/.metrics.json и .metrics.prom
+# =====================================================
+
+# Хост → сайт (по подстроке, первый совпавший)
+SITES = (
+    ("pixiv.net", "pixiv"),
+    ("pinterest.", "pinterest"),
+    ("pin.it", "pinterest"),
+)
+
+
+def site_of(url: str) -> str | None:
+    host = (urlparse(url).hostname or "").lower()
+    for needle, site in SITES:
+        if needle in host:
+            return site
+    return None
+
+
+def read_url_list(path: str) -> list[str]:
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        return [ln.strip() for ln in f if ln.strip() and not ln.lstrip().startswith("#")]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class Runner:
+    """Общее на запуск: ленивый драйвер Edge и одна PixivRun на все pixiv-URL."""
+
+    def __init__(self, out_root: str, workers: int, no_browser: bool,
+                 profile_root: str, profile_name: str, headless: bool):
+        self.out_root = out_root
+        self.workers = workers
+        self.no_browser = no_browser
+        self.profile_root = profile_root
+        self.profile_name = profile_name
+        self.headless = headless
+        self._lock = threading.Lock()
+        self._driver = None
+        self._pixiv = None
+        self.pinterest_files = 0
+
+    # ---------- браузер ----------
+    def _start_edge(self):
+        if self.no_browser:
+            raise RuntimeError("нужен браузер, а он выключен (--no-browser)")
+        import pixiv_core
+        return pixiv_core.setup_edge_driver(self.profile_root, self.headless, self.profile_name, None)
+
+    def _driver_locked(self):
+        # Сам Edge (и Selenium) поднимется только при первом браузерном шаге
+        if self._driver is None:
+            from cookie_store import LazyDriver
+            self._driver = LazyDriver(self._start_edge, log=(lambda m: None) if self.no_browser else print)
+        return self._driver
+
+    def driver(self):
+        with self._lock:
+            return self._driver_locked()
+
+    # ---------- сайты ----------
+    def pixiv_run(self):
+        with self._lock:
+            if self._pixiv is None:
+                import pixiv_core
+                # Куки — с диска, если есть; иначе отсюда стартует Edge
+                self._pixiv = pixiv_core.PixivRun(self._driver_locked(), None, url_workers=self.workers)
+            return self._pixiv
+
+    def handle_pixiv(self, url: str) -> dict:
+        import pixiv_core
+        run = self.pixiv_run()
+        res = pixiv_core.handle_pixiv(self.driver(), url, self.out_root, None, run)
+        if res["failed"] or res["no_originals"]:
+            raise RuntimeError(f"не скачано файлов {res['failed']}, работ без оригиналов "
+                               f"{len(res['no_originals'])} (из {res['works']})")
+        return {"works": res["works"], "files": res["files"]}
+
+    def handle_pinterest(self, url: str) -> dict:
+        import pinterest_download_pins as pin
+        import pixiv_core  # общие BROWSER_LANE и safe_name
+        slug = urlparse(url).path.strip("/").replace("/", "_") or "home"
+        out_dir = os.path.join(self.out_root, "pinterest", pixiv_core.safe_name(slug))
+        pin.ensure_dir(out_dir)
+        manifest = pin.Manifest.in_dir(out_dir) if pin.SYNC_MODE else None
+        known = manifest.known_keys() if manifest is not None else None
+        store = pin.CasStore(os.path.join(self.out_root, ".cas")) if pin.CAS_ENABLED else None
+        cache = (pin.RevalidationCache(os.path.join(out_dir, ".http_cache.json"))
+                 if pin.HTTP_CACHE_ENABLED else None)
+        journal = (pin.ScrollJournal(os.path.join(out_dir, pin.JOURNAL_NAME))
+                   if pin.SCROLL_CHECKPOINTS else None)
+        driver = self.driver()
+        # Скролл занимает браузер целиком — остальные браузерные шаги ждут
+        with pixiv_core.BROWSER_LANE:
+            driver.get(url)
+            time.sleep(PINTEREST_SETTLE_S)
+            progress = pin.stream_collect_and_download(driver, out_dir, pin.DOWNLOAD_WORKERS,
+                                                       manifest, store, cache, known, journal)
+        with self._lock:
+            self.pinterest_files += progress.ok
+        if progress.failed:
+            raise RuntimeError(f"не скачано {len(progress.failed)} из {progress.found}")
+        return {"found": progress.found, "files": progress.ok}
+
+    def process(self, url: str) -> dict:
+        site = site_of(url)
+        res = {"url": url, "site": site, "status": "ok"}
+        t0 = time.time()
+        print(f"\n=== {url}")
+        try:
+            if site == "pixiv":
+                res.update(self.handle_pixiv(url))
+            elif site == "pinterest":
+                res.update(self.handle_pinterest(url))
+            else:
+                res["status"] = "skipped"
+                res["error"] = "неизвестный сайт"
+        except Exception as e:
+            print(f"[ERROR] {url}: {e}")
+            res["status"] = "error"
+            res["error"] = str(e)
+        res["seconds"] = round(time.time() - t0, 2)
+        return res
+
+    def close(self) -> dict:
+        totals = {}
+        if self._pixiv is not None:
+            import pixiv_core
+            self._pixiv.close()
+            totals["pixiv"] = {"files": pixiv_core.TRANSFER.files, "bytes": pixiv_core.TRANSFER.bytes}
+        if self.pinterest_files:
+            totals["pinterest"] = {"files": self.pinterest_files}
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception:
+                pass
+        return totals
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Pixiv / Pinterest: скачивание по списку URL без GUI")
+    ap.add_argument("urls", nargs="*", help="URL работ, профилей, бордов")
+    ap.add_argument("-i", "--input", help="файл со списком URL (по одному в строке; - — stdin)")
+    ap.add_argument("-o", "--out", default=DOWNLOAD_ROOT, help="папка загрузок")
+    ap.add_argument("-w", "--workers", type=int, default=URL_WORKERS, help="URL одновременно")
+    ap.add_argument("--json", default="-", help="куда писать результат (- — stdout)")
+    ap.add_argument("--no-browser", action="store_true",
+                    help="не запускать Edge: Pixiv только по сохранённым кукам через AJAX")
+    ap.add_argument("--profile-root", default=EDGE_PROFILE_ROOT, help="Edge User Data")
+    ap.add_argument("--profile-name", default=EDGE_PROFILE_NAME)
+    ap.add_argument("--headless", action="store_true")
+    ap.add_argument("--metrics-prom", help="Prometheus textfile (по умолчанию {out}/.metrics.prom)")
+    args = ap.parse_args(argv)
+
+    urls = list(args.urls)
+    if args.input:
+        urls += read_url_list(args.input)
+    if not urls:
+        ap.print_usage(sys.stderr)
+        print("нет URL", file=sys.stderr)
+        return 2
+
+    out = sys.stdout
+    t0 = time.time()
+    workers = max(1, min(args.workers, len(urls)))
+    runner = Runner(args.out, workers, args.no_browser, args.profile_root, args.profile_name, args.headless)
+    # Весь лог (print в модулях сайтов) — в stderr, stdout остаётся под JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        os.makedirs(args.out, exist_ok=True)
+        reporter = MetricsReporter(METRICS, os.path.join(args.out, ".metrics.json"),
+                                   args.metrics_prom or os.path.join(args.out, ".metrics.prom"),
+                                   interval=METRICS_REFRESH_S).start()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                results = list(ex.map(runner.process, urls))
+        finally:
+            totals = runner.close()
+            reporter.stop()
+
+    failed = sum(1 for r in results if r["status"] == "error")
+    report = {
+        "urls": len(urls),
+        "ok": sum(1 for r in results if r["status"] == "ok"),
+        "failed": failed,
+        "skipped": sum(1 for r in results if r["status"] == "skipped"),
+        "seconds": round(time.time() - t0, 2),
+        **totals,
+        "metrics": METRICS.snapshot(),
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json == "-":
+        out.write(text + "\n")
+    else:
+        tmp = args.json + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        os.replace(tmp, args.json)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
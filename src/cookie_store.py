@@ -0,0 +1,247 @@
+"""
+Сохранённые куки браузера и «ленивый» драйвер.
+
+Куки Pixiv после запуска Edge сохраняются на диск, и следующий запуск
+строит requests-сессию сразу из файла — без msedgedriver и профиля.
+Файл защищён: в Windows шифруется DPAPI (расшифровать может только
+тот же пользователь), в остальных ОС — права 0600. При загрузке
+выкидываются истёкшие куки; если истёк обязательный (логин) или файл
+старше max_age — считаем, что сохранённых кук нет.
+
+LazyDriver поднимает настоящий драйвер только при первом обращении
+(пагинация/скролл, прогрев после 403, непонятная страница).
+WarmDriver — он же, но живёт между запусками окна: без cold start Edge
+на каждый Start, с проверкой живости и закрытием по простою.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+_MAGIC_DPAPI = b"DPAPI1\n"
+
+
+# ---------- защита файла ----------
+def _dpapi(data: bytes, protect: bool) -> bytes:
+    import ctypes
+    from ctypes import wintypes
+
+    class BLOB(ctypes.Structure):
+        _fields_ = [("cbData", wintypes.DWORD), ("pbData", ctypes.POINTER(ctypes.c_char))]
+
+    buf = ctypes.create_string_buffer(data, len(data))
+    blob_in = BLOB(len(data), ctypes.cast(buf, ctypes.POINTER(ctypes.c_char)))
+    blob_out = BLOB()
+    fn = ctypes.windll.crypt32.CryptProtectData if protect else ctypes.windll.crypt32.CryptUnprotectData
+    if protect:
+        ok = fn(ctypes.byref(blob_in), "ArtDownloader", None, None, None, 0, ctypes.byref(blob_out))
+    else:
+        ok = fn(ctypes.byref(blob_in), None, None, None, None, 0, ctypes.byref(blob_out))
+    if not ok:
+        raise OSError("DPAPI: не удалось " + ("зашифровать" if protect else "расшифровать"))
+    try:
+        return ctypes.string_at(blob_out.pbData, blob_out.cbData)
+    finally:
+        ctypes.windll.kernel32.LocalFree(blob_out.pbData)
+
+
+def _write_protected(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if sys.platform == "win32":
+        data = _MAGIC_DPAPI + _dpapi(data, True)
+    tmp = path + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    if sys.platform != "win32":
+        os.chmod(path, 0o600)
+
+
+def _read_protected(path: str) -> bytes:
+    with open(path, "rb") as f:
+        data = f.read()
+    if data.startswith(_MAGIC_DPAPI):
+        data = _dpapi(data[len(_MAGIC_DPAPI):], False)
+    return data
+
+
+# ---------- куки ----------
+def save_cookies(path: str, cookies: list[dict]) -> None:
+    _write_protected(path, json.dumps({"saved": time.time(), "cookies": cookies}).encode("utf-8"))
+
+
+def load_cookies(path: str, required: tuple[str, ...] = (), max_age: float = 0.0, log=print) -> list[dict] | None:
+    """Живые куки из файла или None (нет файла, истёк обязательный, файл слишком старый)."""
+    try:
+        data = json.loads(_read_protected(path).decode("utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log(f"[warn] сохранённые куки {path} не прочитаны: {e}")
+        return None
+    now = time.time()
+    if max_age and now - float(data.get("saved") or 0) > max_age:
+        return None
+    alive = [c for c in data.get("cookies") or [] if not c.get("expiry") or c["expiry"] > now]
+    names = {c.get("name") for c in alive}
+    if any(r not in names for r in required):
+        return None
+    return alive
+
+
+def apply_cookies(sess, cookies: list[dict]) -> None:
+    for c in cookies:
+        try:
+            sess.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"))
+        except Exception:
+            pass
+
+
+# ---------- ленивый драйвер ----------
+class LazyDriver:
+    """
+    Прокси драйвера: factory() вызывается при первом обращении к любому
+    атрибуту. quit() до запуска ничего не делает.
+    """
+
+    def __init__(self, factory, on_start=None, log=print):
+        self._factory = factory
+        self.on_start = on_start
+        self._log = log
+        self._driver = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._driver is not None
+
+    def _get(self):
+        if self._driver is None:
+            with self._lock:
+                if self._driver is None:
+                    if self._failed:
+                        raise RuntimeError("браузер не запустился")
+                    self._log("[i] Нужен браузер — запускаю Edge…")
+                    drv = self._factory()
+                    if drv is None:
+                        self._failed = True
+                        raise RuntimeError("браузер не запустился")
+                    self._driver = drv
+                    if self.on_start is not None:
+                        self.on_start(drv)
+        return self._driver
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def quit(self) -> None:
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+
+class WarmDriver(LazyDriver):
+    """
+    LazyDriver на всё время работы окна: запуск берёт его через acquire()
+    и отдаёт через release() вместо quit(). Если никто не держит драйвер
+    idle_s секунд — Edge закрывается, следующий запуск поднимет его снова
+    (лениво). Перед браузерным шагом после паузы дольше check_s драйвер
+    проверяется одним запросом; мёртвый (Edge закрыли руками, упал)
+    выбрасывается и запускается заново. Если Edge умер уже внутри шага,
+    это ловит drop_dead() (см. browser_step в pixiv_core).
+    """
+
+    def __init__(self, factory, idle_s: float = 900.0, check_s: float = 30.0, on_start=None, log=print):
+        super().__init__(factory, on_start=on_start, log=log)
+        self.idle_s = idle_s
+        self.check_s = check_s
+        self.users = 0
+        self._last_used = 0.0
+        self._timer: threading.Timer | None = None
+
+    @staticmethod
+    def alive(drv) -> bool:
+        try:
+            drv.current_window_handle
+            return True
+        except Exception:
+            return False
+
+    def _take(self, drv=None):
+        """Забирает драйвер (только drv, если указан) — закрывать его будет вызывающий."""
+        with self._lock:
+            if self._driver is None or (drv is not None and self._driver is not drv):
+                return None
+            drv, self._driver = self._driver, None
+            return drv
+
+    @staticmethod
+    def _close(drv) -> None:
+        if drv is not None:
+            try:
+                drv.quit()
+            except Exception:
+                pass
+
+    def _get(self):
+        with self._lock:
+            drv = self._driver
+            now = time.monotonic()
+            stale = drv is not None and now - self._last_used > self.check_s
+            self._last_used = now
+        if stale and not self.alive(drv):
+            self._log("[i] Edge не отвечает — запускаю заново")
+            self._close(self._take(drv))
+        return super()._get()
+
+    def drop_dead(self) -> bool:
+        """
+        После ошибки браузерного шага: если Edge мёртв — выбрасывает его
+        (следующее обращение поднимет новый) и возвращает True.
+        """
+        drv = self._driver
+        if drv is None or self.alive(drv):
+            return False
+        self._log("[i] Edge упал посреди шага — запускаю заново")
+        self._close(self._take(drv))
+        return True
+
+    def acquire(self) -> "WarmDriver":
+        with self._lock:
+            self.users += 1
+            # Прошлый неудачный старт не должен запрещать новую попытку
+            self._failed = False
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return self
+
+    def release(self) -> None:
+        with self._lock:
+            self.users = max(0, self.users - 1)
+            if self.users or self._driver is None or not self.idle_s:
+                return
+            self._timer = threading.Timer(self.idle_s, self._idle)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _idle(self) -> None:
+        with self._lock:
+            if self.users:
+                return
+            self._timer = None
+            drv, self._driver = self._driver, None
+        if drv is not None:
+            self._log(f"[i] Edge простаивал {self.idle_s / 60:.0f} мин — закрываю")
+            self._close(drv)
+
+    def quit(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._close(self._take())
@@ -0,0 +1,112 @@
+"""
+Извлечение кандидатов (img src/srcset, a href) из DOM за ОДИН execute_script.
+
+Вместо find_elements + get_attribute на каждый элемент (каждый вызов —
+отдельный HTTP round trip к WebDriver) страница сама собирает нужные
+атрибуты и отдаёт их одним массивом.
+
+Инкрементальный режим: при первом вызове на странице ставится
+MutationObserver, который складывает добавленные/изменённые узлы в буфер
+на стороне страницы. Следующие вызовы возвращают только то, что появилось
+с прошлого шага. После driver.get() состояние сбрасывается само —
+первый вызов на новой странице снова вернёт всё.
+"""
+
+import re
+
+# arguments[0] — CSS-селектор, arguments[1] — "img" | "link",
+# arguments[2] — true: инкрементально, false: полный снимок без буфера
+_EXTRACT_JS = r"""
+const sel = arguments[0], kind = arguments[1], incremental = arguments[2];
+const read = (kind === "img")
+    ? (n) => [n.getAttribute("src") || "", n.getAttribute("srcset") || ""]
+    : (n) => n.href || n.getAttribute("href") || "";
+const snapshot = () => Array.from(document.querySelectorAll(sel), read);
+if (!incremental) return snapshot();
+
+const root = (window.__adExtract = window.__adExtract || {});
+const key = kind + "|" + sel;
+let st = root[key];
+if (!st) {
+    st = root[key] = {buf: new Set()};
+    const add = (n) => {
+        if (n.nodeType !== 1) return;
+        if (n.matches(sel)) st.buf.add(n);
+        if (n.querySelectorAll) n.querySelectorAll(sel).forEach((c) => st.buf.add(c));
+    };
+    st.obs = new MutationObserver((muts) => {
+        for (const m of muts) {
+            if (m.type === "attributes") add(m.target);
+            else m.addedNodes.forEach(add);
+        }
+    });
+    st.obs.observe(document.documentElement, {
+        childList: true, subtree: true,
+        attributes: true, attributeFilter: ["src", "srcset", "href"],
+    });
+    return snapshot();
+}
+// Узлы читаются даже если их уже убрали из DOM (виртуализированные ленты)
+const out = Array.from(st.buf, read);
+st.buf.clear();
+return out;
+"""
+
+_RESET_JS = r"""
+const root = window.__adExtract || {};
+for (const k of Object.keys(root)) { try { root[k].obs.disconnect(); } catch (e) {} }
+window.__adExtract = {};
+"""
+
+
+def parse_srcset(srcset: str) -> list[tuple[str, str, float]]:
+    """
+    Разбирает srcset в список (url, тип дескриптора "w"/"x", значение).
+    Запись без дескриптора считается "1x".
+    """
+    out = []
+    for part in re.split(r",\s+|,(?=https?:)", srcset or ""):
+        tokens = part.strip().split()
+        if not tokens:
+            continue
+        url = tokens[0].rstrip(",")
+        kind, value = "x", 1.0
+        if len(tokens) > 1:
+            m = re.fullmatch(r"(\d+(?:\.\d+)?)([wx])", tokens[1].lower())
+            if m:
+                value, kind = float(m.group(1)), m.group(2)
+        out.append((url, kind, value))
+    return out
+
+
+def best_from_srcset(srcset: str, must_contain: str | None = None) -> str | None:
+    """
+    Самый большой вариант из srcset по дескриптору ширины (Nw),
+    а если ширин нет — по плотности (Nx). Порядок записей не важен.
+    """
+    entries = [e for e in parse_srcset(srcset) if not must_contain or must_contain in e[0]]
+    if not entries:
+        return None
+    widths = [e for e in entries if e[1] == "w"]
+    pool = widths or entries
+    return max(pool, key=lambda e: e[2])[0]
+
+
+def collect_images(driver, selector: str = "img", incremental: bool = True) -> list[tuple[str, str]]:
+    """Пары (src, srcset) для всех подходящих <img> — один round trip."""
+    res = driver.execute_script(_EXTRACT_JS, selector, "img", incremental) or []
+    return [(r[0] or "", r[1] or "") for r in res if r]
+
+
+def collect_links(driver, selector: str = "a[href]", incremental: bool = True) -> list[str]:
+    """Абсолютные href для всех подходящих ссылок — один round trip."""
+    res = driver.execute_script(_EXTRACT_JS, selector, "link", incremental) or []
+    return [h for h in res if h]
+
+
+def reset(driver) -> None:
+    """Снимает наблюдатели и очищает буферы (следующий вызов вернёт всё заново)."""
+    try:
+        driver.execute_script(_RESET_JS)
+    except Exception:
+        pass
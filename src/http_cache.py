@@ -0,0 +1,112 @@
+"""
+Кеш ревалидации для бинарных загрузок (sidecar JSON в папке загрузок).
+
+Для каждого скачанного URL запоминаются ETag, Last-Modified,
+Content-Length и локальный путь. Повторная проверка уже скачанного
+файла отправляет If-None-Match / If-Modified-Since; ответ 304 —
+попадание без единого байта тела.
+"""
+
+import json
+import os
+import threading
+
+
+class RevalidationCache:
+    def __init__(self, path: str, autosave_every: int = 50, log=print):
+        self.path = path
+        self.autosave_every = autosave_every
+        self.log = log
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.entries: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = dict(json.load(f).get("entries") or {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            self.log(f"[warn] кеш ревалидации {self.path} не прочитан: {e}")
+
+    def save(self) -> None:
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "entries": self.entries}, f,
+                      ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self._dirty = 0
+
+    def get(self, url: str) -> dict | None:
+        with self._lock:
+            e = self.entries.get(url)
+            return dict(e) if e else None
+
+    def conditional_headers(self, url: str, path: str | None = None) -> dict:
+        """
+        Заголовки условного запроса, если по URL есть запись и локальный
+        файл на месте (и совпадает по длине, когда она известна).
+        Если указан path — только когда запись относится именно к нему.
+        """
+        e = self.get(url)
+        if not e or not e.get("path"):
+            return {}
+        if path and os.path.abspath(e["path"]) != os.path.abspath(path):
+            return {}
+        try:
+            size = os.path.getsize(e["path"])
+        except OSError:
+            return {}
+        if e.get("length") and int(e["length"]) != size:
+            return {}
+        headers = {}
+        if e.get("etag"):
+            headers["If-None-Match"] = e["etag"]
+        if e.get("last_modified"):
+            headers["If-Modified-Since"] = e["last_modified"]
+        return headers
+
+    def record(self, url: str, resp_headers, path: str, length: int | None = None) -> None:
+        """
+        Запоминает валидаторы ответа и путь, куда легло тело.
+        length — итоговый размер файла (для докачанных через Range
+        Content-Length ответа описывает только хвост).
+        """
+        entry = {
+            "etag": resp_headers.get("ETag"),
+            "last_modified": resp_headers.get("Last-Modified"),
+            "length": length if length is not None else resp_headers.get("Content-Length"),
+            "path": path,
+        }
+        if not entry["etag"] and not entry["last_modified"]:
+            # Без валидаторов ревалидировать нечем — не засоряем кеш
+            return
+        with self._lock:
+            self.entries[url] = entry
+            self.misses += 1
+            self._dirty += 1
+            if self.autosave_every and self._dirty >= self.autosave_every:
+                self._save_locked()
+
+    def note_hit(self, url: str) -> dict | None:
+        """Учитывает ответ 304; возвращает запись (с путём к локальной копии)."""
+        with self._lock:
+            e = self.entries.get(url)
+            self.hits += 1
+            if e and e.get("length"):
+                self.bytes_saved += int(e["length"])
+            return dict(e) if e else None
+
+    def summary(self) -> str:
+        return (f"ревалидация: 304={self.hits}, 200={self.misses}, "
+                f"сэкономлено {self.bytes_saved / 1048576:.1f} МБ")
@@ -0,0 +1,113 @@
+"""
+Докачка оставшихся .part файлов через HTTP Range.
+
+Рядом с .part лежит <part>.val — URL и валидатор (ETag или
+Last-Modified) ответа, с которого .part начали писать. Докачка идёт
+только с ним: Range: bytes=N- плюс If-Range, чтобы сервер отдал хвост
+того же самого ресурса. На 206 с корректным Content-Range и тем же
+валидатором тело дописывается в конец, на 200 — файл пишется заново.
+.part без валидатора или от другого URL выбрасывается. После записи
+размер сверяется с полной длиной (из Content-Range или Content-Length).
+"""
+
+import json
+import os
+import re
+
+
+class ResumeError(Exception):
+    """Сервер вернул диапазон, который нельзя пристыковать к .part."""
+
+
+def part_offset(part_path: str) -> int:
+    try:
+        return os.path.getsize(part_path)
+    except OSError:
+        return 0
+
+
+def validator_of(headers) -> str | None:
+    """Валидатор для If-Range: сильный ETag, иначе Last-Modified."""
+    etag = headers.get("ETag") or ""
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified") or None
+
+
+def _val_path(part_path: str) -> str:
+    return part_path + ".val"
+
+
+def _load_validator(part_path: str) -> dict:
+    try:
+        with open(_val_path(part_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def resume_headers(part_path: str, url: str) -> tuple[int, dict]:
+    """
+    (offset, заголовки) для запроса. Если .part нельзя доказуемо
+    пристыковать к url, он удаляется и запрос идёт с нуля: (0, {}).
+    """
+    offset = part_offset(part_path)
+    if offset <= 0:
+        return 0, {}
+    val = _load_validator(part_path)
+    if val.get("url") != url or not val.get("validator"):
+        discard(part_path)
+        return 0, {}
+    # identity — чтобы смещения и длины считались в байтах тела, а не gzip-потока
+    return offset, {"Range": f"bytes={offset}-", "If-Range": val["validator"],
+                    "Accept-Encoding": "identity"}
+
+
+def begin(resp, offset: int, part_path: str, url: str) -> tuple[str, int | None]:
+    """
+    По ответу решает, как писать .part: ("ab", total) для докачки
+    или ("wb", total) для записи с нуля. total — ожидаемый итоговый размер
+    (None, если сервер его не сообщил). При записи с нуля запоминает
+    валидатор ответа для следующей докачки.
+    """
+    if resp.status_code == 206:
+        cr = resp.headers.get("Content-Range", "")
+        m = re.fullmatch(r"bytes (\d+)-(\d+)/(\d+|\*)", cr.strip())
+        if not m or int(m.group(1)) != offset:
+            raise ResumeError(f"неожиданный Content-Range '{cr}' для смещения {offset}")
+        expected = _load_validator(part_path).get("validator")
+        if not expected or validator_of(resp.headers) != expected:
+            raise ResumeError("ресурс изменился с начала .part (валидатор не совпал)")
+        total = None if m.group(3) == "*" else int(m.group(3))
+        return "ab", total
+    enc = (resp.headers.get("Content-Encoding") or "identity").lower()
+    cl = resp.headers.get("Content-Length")
+    total = int(cl) if cl and cl.isdigit() and enc == "identity" else None
+    _save_validator(part_path, url, validator_of(resp.headers))
+    return "wb", total
+
+
+def _save_validator(part_path: str, url: str, validator: str | None) -> None:
+    if not validator:
+        # Без валидатора докачать безопасно нельзя — такой .part потом выбросится
+        try:
+            os.remove(_val_path(part_path))
+        except OSError:
+            pass
+        return
+    os.makedirs(os.path.dirname(part_path) or ".", exist_ok=True)
+    with open(_val_path(part_path), "w", encoding="utf-8") as f:
+        json.dump({"url": url, "validator": validator}, f)
+
+
+def is_complete(part_path: str, total: int | None) -> bool:
+    return total is None or part_offset(part_path) == total
+
+
+def discard(part_path: str) -> None:
+    """Удаляет .part (если он ещё есть) вместе с его валидатором."""
+    for p in (part_path, _val_path(part_path)):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
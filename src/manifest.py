@@ -0,0 +1,81 @@
+"""
+Постоянный манифест папки загрузок (JSON рядом с файлами).
+
+Ключ — стабильный идентификатор картинки (для Pinterest — хеш-путь pinimg),
+значение — {"file", "status", "size", "ts"}. По манифесту можно понять,
+что уже скачано, ДО любых сетевых запросов.
+"""
+
+import json
+import os
+import threading
+import time
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+
+
+class Manifest:
+    def __init__(self, path: str, autosave_every: int = 50):
+        self.path = path
+        self.autosave_every = autosave_every
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.entries: dict[str, dict] = {}
+        self.load()
+
+    @classmethod
+    def in_dir(cls, directory: str, name: str = "manifest.json", **kw) -> "Manifest":
+        os.makedirs(directory, exist_ok=True)
+        return cls(os.path.join(directory, name), **kw)
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = dict(data.get("entries") or {})
+        except FileNotFoundError:
+            self.entries = {}
+        except (OSError, ValueError) as e:
+            # Битый манифест не должен ронять запуск — начинаем с чистого
+            print(f"[warn] манифест {self.path} не прочитан: {e}")
+            self.entries = {}
+
+    def save(self) -> None:
+        with self._lock:
+            data = {"version": 1, "entries": self.entries}
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.path)
+            self._dirty = 0
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            e = self.entries.get(key)
+            return dict(e) if e else None
+
+    def is_done(self, key: str) -> bool:
+        e = self.entries.get(key)
+        return bool(e) and e.get("status") == STATUS_OK
+
+    def known_keys(self) -> set[str]:
+        with self._lock:
+            return {k for k, e in self.entries.items() if e.get("status") == STATUS_OK}
+
+    def record(self, key: str, file: str, status: str = STATUS_OK, size: int = 0, **extra) -> None:
+        with self._lock:
+            entry = dict(self.entries.get(key) or {})
+            entry.update(extra)
+            entry.update({"file": file, "status": status, "size": int(size), "ts": time.time()})
+            self.entries[key] = entry
+            self._dirty += 1
+            flush = self.autosave_every and self._dirty >= self.autosave_every
+        if flush:
+            self.save()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
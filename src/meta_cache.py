@@ -0,0 +1,97 @@
+"""
+Дисковый кеш ответов AJAX Pixiv (sidecar JSON в папке загрузок).
+
+Ключ — "эндпоинт:id" (например "pages:123456"), значение — уже
+разобранный результат (список оригиналов, URL zip, список ID) и время
+записи. Срок жизни задаётся по эндпоинту: None — вечно (списки страниц
+опубликованной работы не меняются), число — секунды (profile/all
+меняется с каждой новой работой). При переполнении выбрасываются
+записи, к которым дольше всего не обращались. bypass=True — читать
+мимо кеша (ответы всё равно записываются и освежают его).
+"""
+
+import json
+import os
+import threading
+import time
+
+DAY = 24 * 3600
+
+
+class MetaCache:
+    def __init__(self, path: str, ttl: dict[str, float | None] | None = None,
+                 max_entries: int = 50000, bypass: bool = False,
+                 autosave_every: int = 100, log=print):
+        self.path = path
+        self.ttl = dict(ttl or {})
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.autosave_every = autosave_every
+        self.log = log
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.entries: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = dict(json.load(f).get("entries") or {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            self.log(f"[warn] кеш метаданных {self.path} не прочитан: {e}")
+
+    def save(self) -> None:
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "entries": self.entries}, f,
+                      ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self._dirty = 0
+
+    def get(self, endpoint: str, key: str):
+        """Закешированное значение или None (нет, протухло, bypass)."""
+        k = f"{endpoint}:{key}"
+        now = time.time()
+        with self._lock:
+            e = None if self.bypass else self.entries.get(k)
+            ttl = self.ttl.get(endpoint)
+            if e is not None and ttl is not None and now - e["t"] > ttl:
+                del self.entries[k]
+                e = None
+            if e is None:
+                self.misses += 1
+                return None
+            e["a"] = now
+            self.hits += 1
+            return e["v"]
+
+    def put(self, endpoint: str, key: str, value) -> None:
+        if value is None or value == [] or value == "":
+            # Пустой ответ мог быть из-за авторизации/403 — не запоминаем
+            return
+        now = time.time()
+        with self._lock:
+            self.entries[f"{endpoint}:{key}"] = {"t": now, "a": now, "v": value}
+            if self.max_entries and len(self.entries) > self.max_entries:
+                self._evict_locked()
+            self._dirty += 1
+            if self.autosave_every and self._dirty >= self.autosave_every:
+                self._save_locked()
+
+    def _evict_locked(self) -> None:
+        # Выкидываем ~10% самых давно использованных, чтобы не сортировать на каждой записи
+        drop = len(self.entries) - int(self.max_entries * 0.9)
+        for k, _ in sorted(self.entries.items(), key=lambda kv: kv[1].get("a", 0))[:drop]:
+            del self.entries[k]
+
+    def summary(self) -> str:
+        return f"кеш метаданных: попаданий {self.hits}, запросов {self.misses}, записей {len(self.entries)}"
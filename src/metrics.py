@@ -0,0 +1,235 @@
+"""
+Метрики запуска: счётчики и гистограммы задержек по стадиям.
+
+  stage_seconds{stage=…}      — шаг скролла, сбор ID по стратегии,
+                                AJAX-метаданные по эндпоинту, скачивание файла
+  http_seconds{host}          — каждый HTTP-запрос через RateLimitedSession
+  http_responses_total{host,code}, retries_total{host}, throttles_total{host}
+  files_total, bytes_total    — скачанные файлы (скорость — в JSON и через rate())
+  sleep_seconds_total{reason} — сколько потоки проспали: бэкофф, лимитер,
+                                паузы скролла, прогрев — против работы
+
+Реестр METRICS один на процесс, модули пишут в него напрямую.
+MetricsReporter раз в interval секунд (и в конце) переписывает JSON-сводку
+и Prometheus textfile (для node_exporter --collector.textfile.directory).
+Файлы пишутся через tmp + os.replace — читатель не увидит половину файла.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+PREFIX = "artdl"
+# Границы корзин гистограмм, секунды: от быстрого AJAX до долгого скачивания/скролла
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # последняя — +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, v: float) -> None:
+        i = 0
+        while i < len(self.buckets) and v > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += v
+        self.max = max(self.max, v)
+
+    def quantile(self, q: float) -> float:
+        """Оценка по корзинам (верхняя граница корзины, куда попал квантиль)."""
+        if not self.count:
+            return 0.0
+        need, acc = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= need:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "sum": round(self.sum, 3),
+                "avg": round(self.sum / self.count, 4) if self.count else 0.0,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "max": round(self.max, 3)}
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _esc(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(items: tuple, extra: tuple = ()) -> str:
+    parts = [f'{k}="{_esc(v)}"' for k, v in items + extra]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    def __init__(self, prefix: str = PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self.counters: dict[tuple, float] = {}
+            self.hists: dict[tuple, Histogram] = {}
+
+    # ---------- запись ----------
+    def inc(self, name: str, n: float = 1, **labels) -> None:
+        k = _key(name, labels)
+        with self._lock:
+            self.counters[k] = self.counters.get(k, 0) + n
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        k = _key(name, labels)
+        with self._lock:
+            h = self.hists.get(k)
+            if h is None:
+                h = self.hists[k] = Histogram()
+            h.observe(seconds)
+
+    @contextlib.contextmanager
+    def timed(self, name: str, **labels):
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - t0, **labels)
+
+    def sleep(self, seconds: float, reason: str) -> None:
+        """time.sleep с учётом: сколько и почему поток простаивал."""
+        if seconds > 0:
+            time.sleep(seconds)
+            self.inc("sleep_seconds_total", seconds, reason=reason)
+
+    def slept(self, seconds: float, reason: str) -> None:
+        """Учесть ожидание, которое уже прошло (паузы AdaptivePacer, лимитер)."""
+        if seconds > 0:
+            self.inc("sleep_seconds_total", seconds, reason=reason)
+
+    # ---------- чтение ----------
+    def snapshot(self) -> dict:
+        with self._lock:
+            wall = max(time.time() - self.started, 1e-6)
+            counters: dict[str, dict] = {}
+            for (name, items), v in sorted(self.counters.items()):
+                counters.setdefault(name, {})[",".join(f"{k}={x}" for k, x in items) or "_"] = round(v, 3)
+            hists: dict[str, dict] = {}
+            for (name, items), h in sorted(self.hists.items()):
+                hists.setdefault(name, {})[",".join(f"{k}={x}" for k, x in items) or "_"] = h.to_dict()
+        files = counters.get("files_total", {}).get("_", 0)
+        nbytes = counters.get("bytes_total", {}).get("_", 0)
+        slept = counters.get("sleep_seconds_total", {})
+        return {
+            "started": self.started,
+            "wall_seconds": round(wall, 2),
+            "files_per_s": round(files / wall, 3),
+            "bytes_per_s": round(nbytes / wall, 1),
+            "sleep_seconds": round(sum(slept.values()), 2),
+            "counters": counters,
+            "histograms": hists,
+        }
+
+    def prometheus(self) -> str:
+        p = self.prefix
+        out = [f"# HELP {p}_run_started_seconds Unix time the run started",
+               f"# TYPE {p}_run_started_seconds gauge",
+               f"{p}_run_started_seconds {self.started:.0f}"]
+        with self._lock:
+            counters = sorted(self.counters.items())
+            hists = sorted(self.hists.items())
+        typed = set()
+        for (name, items), v in counters:
+            if name not in typed:
+                out.append(f"# TYPE {p}_{name} counter")
+                typed.add(name)
+            out.append(f"{p}_{name}{_labels(items)} {v:g}")
+        for (name, items), h in hists:
+            if name not in typed:
+                out.append(f"# TYPE {p}_{name} histogram")
+                typed.add(name)
+            acc = 0
+            for le, c in zip(list(h.buckets) + ["+Inf"], h.counts):
+                acc += c
+                out.append(f"{p}_{name}_bucket{_labels(items, (('le', str(le)),))} {acc}")
+            out.append(f"{p}_{name}_sum{_labels(items)} {h.sum:.6f}")
+            out.append(f"{p}_{name}_count{_labels(items)} {h.count}")
+        return "\n".join(out) + "\n"
+
+    def summary(self) -> str:
+        s = self.snapshot()
+        parts = [f"{s['files_per_s']:.2f} файлов/с", f"{s['bytes_per_s'] / 1048576:.2f} МБ/с",
+                 f"в паузах {s['sleep_seconds']:.0f} с"]
+        for name, series in s["histograms"].get("stage_seconds", {}).items():
+            parts.append(f"{name.replace('stage=', '')}: {series['count']}× p95 {series['p95']:g} с")
+        return "метрики: " + ", ".join(parts)
+
+    # ---------- экспорт ----------
+    @staticmethod
+    def _write(path: str, text: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def write_json(self, path: str) -> None:
+        self._write(path, json.dumps(self.snapshot(), ensure_ascii=False, indent=1))
+
+    def write_prometheus(self, path: str) -> None:
+        self._write(path, self.prometheus())
+
+
+METRICS = Metrics()
+
+
+class MetricsReporter:
+    """Фоновый поток: раз в interval секунд переписывает JSON и textfile."""
+
+    def __init__(self, metrics: Metrics, json_path: str | None, prom_path: str | None,
+                 interval: float = 15.0, log=print):
+        self.metrics = metrics
+        self.json_path = json_path
+        self.prom_path = prom_path
+        self.interval = interval
+        self.log = log
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def flush(self) -> None:
+        try:
+            if self.json_path:
+                self.metrics.write_json(self.json_path)
+            if self.prom_path:
+                self.metrics.write_prometheus(self.prom_path)
+        except OSError as e:
+            self.log(f"[warn] метрики не записаны: {e}")
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self) -> "MetricsReporter":
+        if self.interval and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="metrics", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+        self.log(f"[i] {self.metrics.summary()}")
@@ -0,0 +1,90 @@
+"""
+Отчёт: фиксированная пауза скролла против адаптивной на локальной ленте.
+
+Поднимает standin_server, открывает /feed в headless-браузере и дважды
+прогоняет collect_image_urls(): с фиксированной SCROLL_PAUSE и с
+адаптивной паузой. Печатает таблицу: время, шаги, найдено URL.
+
+    python src/pacing_report.py --items 600 --latency 0.3
+    python src/pacing_report.py --browser chrome
+
+--browser feed — без браузера, через FeedDriver из bench.py: это
+симуляция (запрос ленты «в полёте» и тишина сети моделируются, картинки
+и отрисовка — нет), не замер настоящей страницы.
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+from selenium import webdriver
+
+import pinterest_download_pins as pins
+from standin_server import StandinConfig, start_server
+
+
+def make_driver(browser: str, driver_path: str | None, base: str = ""):
+    if browser == "feed":
+        from bench import FeedDriver
+        return FeedDriver(base)
+    if browser == "chrome":
+        opts = webdriver.ChromeOptions()
+        opts.add_argument("--headless=new")
+        opts.add_argument("--no-sandbox")
+        svc = webdriver.ChromeService(executable_path=driver_path) if driver_path else None
+        return webdriver.Chrome(options=opts, service=svc) if svc else webdriver.Chrome(options=opts)
+    opts = webdriver.EdgeOptions()
+    opts.add_argument("--headless=new")
+    svc = webdriver.EdgeService(executable_path=driver_path) if driver_path else None
+    return webdriver.Edge(options=opts, service=svc) if svc else webdriver.Edge(options=opts)
+
+
+def run_once(driver, url: str, adaptive: bool, pause: float, stable_rounds: int, stable_seconds: float):
+    driver.get(url)
+    time.sleep(0.5)
+    log = io.StringIO()
+    t0 = time.monotonic()
+    with contextlib.redirect_stdout(log):
+        urls = pins.collect_image_urls(driver, pins.MAX_SCROLLS, pause, stable_rounds,
+                                       adaptive=adaptive, stable_seconds=stable_seconds)
+    elapsed = time.monotonic() - t0
+    steps = log.getvalue().count("[SCROLL]")
+    return elapsed, steps, len(urls)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="fixed vs adaptive scroll pacing")
+    ap.add_argument("--items", type=int, default=600)
+    ap.add_argument("--page-size", type=int, default=25)
+    ap.add_argument("--latency", type=float, default=0.3)
+    ap.add_argument("--browser", choices=["edge", "chrome", "feed"], default="edge")
+    ap.add_argument("--driver", help="путь к msedgedriver/chromedriver (иначе Selenium Manager)")
+    args = ap.parse_args()
+
+    srv, base = start_server(StandinConfig(items=args.items, page_size=args.page_size,
+                                           latency=args.latency))
+    driver = make_driver(args.browser, args.driver, base)
+    try:
+        rows = []
+        for name, adaptive in (("fixed", False), ("adaptive", True)):
+            # Те же условия остановки, что и в боевом запуске для каждого режима
+            pins.ADAPTIVE_PACING = adaptive
+            rounds, stable_s = pins.stop_params()
+            elapsed, steps, found = run_once(driver, f"{base}/feed", adaptive,
+                                             pins.SCROLL_PAUSE, rounds, stable_s)
+            rows.append((name, elapsed, steps, found))
+    finally:
+        driver.quit()
+        srv.shutdown()
+
+    print(f"\nЛента: {args.items} пинов, по {args.page_size} на запрос, задержка API {args.latency:.2f} с")
+    print(f"{'режим':<10}{'время, с':>10}{'шагов':>8}{'URL':>8}{'с/шаг':>8}")
+    for name, elapsed, steps, found in rows:
+        print(f"{name:<10}{elapsed:>10.1f}{steps:>8}{found:>8}{elapsed / max(steps, 1):>8.2f}")
+    if rows[0][1] > 0:
+        print(f"Ускорение: x{rows[0][1] / max(rows[1][1], 1e-6):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,26 @@
 import os
 import re
 import time
-from typing import Set, List
+import random
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Set, List, Optional
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.edge.service import Service as EdgeService
-from selenium.common.exceptions import StaleElementReferenceException
+
+import dom_extract
+from scroll_pacing import AdaptivePacer, StableTracker
+from scroll_journal import ScrollJournal
+from manifest import Manifest
+from cas_store import CasStore
+from http_cache import RevalidationCache
+from metrics import METRICS, MetricsReporter
+import http_resume
 
 
 # ===================== НАСТРОЙКИ =====================
@@ -28,9 +41,63 @@ SCROLL_PAUSE = 1.8
 # Сколько раз подряд можно НЕ находить новые картинки, чтобы остановиться
 STABLE_ROUNDS = 10
 
+# Адаптивная пауза: следующий шаг — как только подгрузились новые пины и сеть
+# затихла; SCROLL_PAUSE — обычный потолок ожидания, при тишине он растёт
+# до SCROLL_MAX_WAIT. Шаги короткие, поэтому остановка считается по времени:
+# не меньше STABLE_SECONDS секунд без новых URL (и хотя бы ADAPTIVE_STABLE_ROUNDS шагов).
+ADAPTIVE_PACING = True
+SCROLL_MAX_WAIT = 4.0
+STABLE_SECONDS = 15.0
+ADAPTIVE_STABLE_ROUNDS = 3
+
 # Таймаут HTTP-запросов
 REQUEST_TIMEOUT = 25
 
+# Ретраи одной картинки (429/5xx/обрыв); оборванный .part докачивается через Range
+MAX_RETRIES = 4
+BASE_BACKOFF_S = 0.7
+
+# Сколько картинок качать параллельно (1 = по одной, как раньше).
+# Пул keep-alive соединений к i.pinimg.com подгоняется под это число.
+DOWNLOAD_WORKERS = 8
+
+# Как часто печатать сводку прогресса при параллельном скачивании
+PROGRESS_EVERY = 50
+
+# Потоковый режим: скачивание идёт параллельно со скроллом, новые URL
+# передаются воркерам через ограниченную очередь (при заполнении скролл ждёт)
+STREAMING = True
+STREAM_QUEUE_SIZE = 200
+
+# Чекпоинты скролла: каждые CHECKPOINT_EVERY шагов новые URL и позиция
+# дописываются в журнал; после падения следующий запуск продолжает с того же места
+SCROLL_CHECKPOINTS = True
+CHECKPOINT_EVERY = 10
+JOURNAL_NAME = ".scroll_journal.jsonl"
+
+# Режим синхронизации: манифест в папке загрузок, стабильные имена файлов
+# по хешу pinimg, уже скачанные пины пропускаются без сетевых запросов
+SYNC_MODE = True
+
+# Сколько уже известных пинов подряд должно попасться при скролле,
+# чтобы считать, что дальше только старое, и остановиться (0 = не останавливаться)
+KNOWN_STOP_RUN = 60
+
+# Дедупликация: одинаковый контент хранится один раз в общем хранилище
+# (downloads\.cas), по путям бордов — жёсткие ссылки на него
+CAS_ENABLED = False
+CAS_DIR = os.path.join(os.path.dirname(DOWNLOAD_DIR) or ".", ".cas")
+
+# Кеш ETag/Last-Modified (DOWNLOAD_DIR\.http_cache.json). При REVALIDATE_EXISTING
+# уже скачанное не пропускается, а перепроверяется условным запросом (304 = актуально)
+HTTP_CACHE_ENABLED = True
+REVALIDATE_EXISTING = False
+
+# Метрики (скролл, скачивание, ретраи, паузы) в DOWNLOAD_DIR\.metrics.json и .metrics.prom,
+# переписываются раз в METRICS_REFRESH секунд
+METRICS_ENABLED = True
+METRICS_REFRESH = 15.0
+
 # Мусор по ключевым словам (оставляем, но БЕЗ фильтра по размеру)
 TRASH_KEYWORDS = [
     "avatars", "profile_images", "favicon", "logo", "static"
@@ -53,6 +120,10 @@ def is_trash_image(url: str) -> bool:
     return False
 
 
+def backoff_sleep(try_index: int) -> None:
+    METRICS.sleep(BASE_BACKOFF_S * (2 ** try_index) + random.random() * 0.3, "backoff")
+
+
 def make_original_url(url: str) -> str:
     """
     Превью вида ../236x/../474x/../736x/ → пробуем заменить на /originals/
@@ -60,151 +131,538 @@ def make_original_url(url: str) -> str:
     return re.sub(r"/\d+x/", "/originals/", url, count=1)
 
 
-def collect_image_urls(driver,
-                       max_scrolls: int,
-                       pause: float,
-                       stable_rounds: int) -> List[str]:
+def pin_key(url: str) -> str:
     """
-    Скроллит ТЕКУЩУЮ страницу (board, saved, home feed)
-    и собирает все уникальные pinimg.com URL'ы.
-    Останавливается, когда несколько итераций подряд не появляется новых URL.
+    Стабильный ключ картинки — хеш-путь pinimg без размера и расширения:
+    https://i.pinimg.com/736x/ab/cd/ef/abcdef….jpg → ab/cd/ef/abcdef…
     """
-    urls: Set[str] = set()
-    stable = 0
+    path = re.sub(r"^https?://[^/]+", "", url.split("?")[0])
+    path = re.sub(r"^/(?:\d+x\d*|originals)/", "/", path)
+    return os.path.splitext(path.strip("/"))[0]
 
-    for i in range(max_scrolls):
-        print(f"[SCROLL] {i + 1}/{max_scrolls}")
 
-        # 1) Собираем картинки на текущем экране
-        before = len(urls)
+def pick_candidate(src: str, srcset: str) -> Optional[str]:
+    """
+    Выбирает лучший pinimg.com URL для одного <img>:
+    самый широкий вариант из srcset, иначе обычный src.
+    """
+    candidate = None
 
-        try:
-            imgs = driver.find_elements(By.TAG_NAME, "img")
-        except Exception:
-            imgs = []
+    # Если есть srcset → берём самый большой вариант (по дескриптору ширины)
+    if "pinimg.com" in srcset:
+        candidate = dom_extract.best_from_srcset(srcset, must_contain="pinimg.com")
 
-        for img in imgs:
-            try:
-                src = img.get_attribute("src") or ""
-                srcset = img.get_attribute("srcset") or ""
-            except StaleElementReferenceException:
-                continue
+    # Если нет srcset, но есть обычный src
+    if not candidate and "pinimg.com" in src:
+        candidate = src
 
-            candidate = None
+    if not candidate or is_trash_image(candidate):
+        return None
+    return candidate
 
-            # Если есть srcset → берём самый большой вариант
-            if "pinimg.com" in srcset:
-                parts = [p.strip().split(" ")[0] for p in srcset.split(",")]
-                big_parts = [p for p in parts if "pinimg.com" in p]
-                if big_parts:
-                    candidate = big_parts[-1]
 
-            # Если нет srcset, но есть обычный src
-            if not candidate and "pinimg.com" in src:
-                candidate = src
+def stop_params() -> tuple:
+    """(stable_rounds, stable_seconds) для текущего режима пауз."""
+    if ADAPTIVE_PACING:
+        return ADAPTIVE_STABLE_ROUNDS, STABLE_SECONDS
+    return STABLE_ROUNDS, 0.0
 
-            if not candidate:
-                continue
-            if is_trash_image(candidate):
-                continue
 
-            urls.add(candidate)
+def fast_forward(driver, offset: int, pacer: Optional[AdaptivePacer], pause: float,
+                 max_steps: int) -> int:
+    """
+    Проматывает ленту до ~offset: прыжком в конец, пока лента подгружается.
+    Картинки по пути не разбираем — эти URL уже есть в журнале.
+    """
+    y, last_h, still = 0, 0, 0
+    for _ in range(max_steps):
+        y, h = driver.execute_script(
+            "window.scrollTo(0, document.body.scrollHeight);"
+            "return [window.scrollY, document.body.scrollHeight];")
+        if y >= offset:
+            break
+        still = still + 1 if h <= last_h else 0
+        if still >= 3:
+            break
+        last_h = h
+        if pacer is not None:
+            METRICS.slept(pacer.wait()[0], "scroll")
+        else:
+            METRICS.sleep(pause, "scroll")
+    return driver.execute_script("window.scrollTo(0, arguments[0]); return window.scrollY;",
+                                 min(offset, y or offset)) or 0
 
-        after = len(urls)
-        diff = after - before
-        print(f"   Картинок собрано: {after} (+{diff})")
 
-        # 2) Проверяем, есть ли прогресс
-        if diff == 0:
-            stable += 1
-            print(f"   Нет новых URL (stable {stable}/{stable_rounds})")
-            if stable >= stable_rounds:
-                print("   Похоже, контент перестал подгружаться — выходим из скролла.")
-                break
+def collect_image_urls(driver,
+                       max_scrolls: int,
+                       pause: float,
+                       stable_rounds: int,
+                       known: Optional[Set[str]] = None,
+                       known_stop_run: int = 0,
+                       on_new: Optional[Callable[[str], None]] = None,
+                       status: Optional[Callable[[], str]] = None,
+                       adaptive: bool = False,
+                       stable_seconds: float = 0.0,
+                       journal: Optional[ScrollJournal] = None) -> List[str]:
+    """
+    Скроллит ТЕКУЩУЮ страницу (board, saved, home feed)
+    и собирает все уникальные pinimg.com URL'ы.
+    Останавливается, когда несколько итераций подряд не появляется новых URL.
+    Атрибуты всех <img> забираются одним execute_script за шаг,
+    причём только с узлов, появившихся после предыдущего шага.
+    Если передан known (ключи pin_key из манифеста) — останавливается, как только
+    подряд встретилось known_stop_run уже известных пинов.
+    on_new вызывается для каждого нового URL сразу при обнаружении (потоковый режим),
+    status — строка прогресса, которая дописывается к логу шага.
+    adaptive — вместо фиксированной pause ждать ровно до подгрузки новых пинов
+    (pause становится обычным потолком ожидания), stable_seconds — минимальное
+    время без роста, после которого разрешено остановиться.
+    journal — журнал чекпоинтов: если в нём есть прерванная сессия для этой
+    страницы, URL из него загружаются, лента проматывается до сохранённой
+    позиции, и сбор продолжается оттуда.
+    """
+    urls: Set[str] = set()
+    tracker = StableTracker(stable_rounds, stable_seconds)
+    seen_keys: Set[str] = set()
+    known_run = 0
+    dom_extract.reset(driver)
+    pacer = None
+    if adaptive:
+        pacer = AdaptivePacer(driver, "img", base_cap=pause, max_wait=max(pause, SCROLL_MAX_WAIT))
+        pacer.start()
+    started = time.monotonic()
+    offset = 0
+
+    if journal is not None:
+        page = driver.current_url
+        if journal.load(page):
+            print(f"[resume] В журнале {len(journal.urls)} URL, позиция {journal.offset}px — проматываю...")
+            for u in sorted(journal.urls):
+                urls.add(u)
+                if on_new is not None:
+                    on_new(u)
+            offset = fast_forward(driver, journal.offset, pacer, pause, max_scrolls)
+            journal.position = offset
+            print(f"[resume] Продолжаю с {offset}px")
+            dom_extract.reset(driver)
+            if pacer is not None:
+                pacer.start()
         else:
-            stable = 0
+            journal.begin(page)
 
-        # 3) Плавный скролл вниз — не сразу в самый низ, а примерно на экран
-        driver.execute_script("window.scrollBy(0, window.innerHeight * 0.8);")
-        time.sleep(pause)
+    try:
+        for i in range(max_scrolls):
+            print(f"[SCROLL] {i + 1}/{max_scrolls}")
+            step_t0 = time.monotonic()
+
+            # 1) Собираем картинки, появившиеся с прошлого шага
+            before = len(urls)
+
+            try:
+                imgs = dom_extract.collect_images(driver)
+            except Exception:
+                imgs = []
+
+            for src, srcset in imgs:
+                candidate = pick_candidate(src, srcset)
+                if not candidate or candidate in urls:
+                    continue
+                urls.add(candidate)
+                if on_new is not None:
+                    on_new(candidate)
+                if journal is not None:
+                    journal.add(candidate)
+                if known is not None:
+                    key = pin_key(candidate)
+                    if key not in seen_keys:
+                        seen_keys.add(key)
+                        known_run = known_run + 1 if key in known else 0
+
+            after = len(urls)
+            diff = after - before
+            print(f"   Картинок собрано: {after} (+{diff})" + (f" | {status()}" if status else ""))
+
+            if known_stop_run and known_run >= known_stop_run:
+                print(f"   {known_run} уже скачанных пинов подряд — дальше только старое, выходим из скролла.")
+                break
+
+            # 2) Проверяем, есть ли прогресс
+            stop = tracker.update(diff > 0)
+            if diff == 0:
+                print(f"   Нет новых URL (stable {tracker.stable}/{stable_rounds}, "
+                      f"{tracker.quiet_for:.1f}/{stable_seconds:.0f} с)")
+                if stop:
+                    print("   Похоже, контент перестал подгружаться — выходим из скролла.")
+                    break
+
+            if journal is not None and (i + 1) % CHECKPOINT_EVERY == 0:
+                journal.checkpoint()
+
+            # 3) Плавный скролл вниз — не сразу в самый низ, а примерно на экран
+            offset = driver.execute_script(
+                "window.scrollBy(0, window.innerHeight * 0.8); return window.scrollY;") or offset
+            if journal is not None:
+                journal.position = offset
+            if pacer is not None:
+                METRICS.slept(pacer.wait()[0], "scroll")
+            else:
+                METRICS.sleep(pause, "scroll")
+            METRICS.observe("stage_seconds", time.monotonic() - step_t0, stage="scroll_step", site="pinterest")
+    except BaseException:
+        # Драйвер/сеть упали — сбрасываем в журнал всё найденное к этому моменту
+        if journal is not None:
+            journal.checkpoint()
+            print(f"[checkpoint] Сохранено в журнал: {len(urls)} URL — следующий запуск продолжит.")
+        raise
+
+    if pacer is not None and pacer.steps:
+        print(f"   Пауз: {pacer.steps}, ожидание {pacer.total_waited:.1f} с "
+              f"(фиксированно было бы {pacer.steps * pause:.1f} с), "
+              f"весь скролл {time.monotonic() - started:.1f} с")
 
     # Финальный проход на всякий случай (если что-то догрузилось в самом конце)
     print("Делаю финальный проход по странице...")
     try:
-        imgs = driver.find_elements(By.TAG_NAME, "img")
+        imgs = dom_extract.collect_images(driver, incremental=False)
     except Exception:
         imgs = []
 
     before_final = len(urls)
-    for img in imgs:
-        try:
-            src = img.get_attribute("src") or ""
-            srcset = img.get_attribute("srcset") or ""
-        except StaleElementReferenceException:
-            continue
-
-        candidate = None
-        if "pinimg.com" in srcset:
-            parts = [p.strip().split(" ")[0] for p in srcset.split(",")]
-            big_parts = [p for p in parts if "pinimg.com" in p]
-            if big_parts:
-                candidate = big_parts[-1]
-        if not candidate and "pinimg.com" in src:
-            candidate = src
-        if not candidate:
-            continue
-        if is_trash_image(candidate):
-            continue
-        urls.add(candidate)
+    for src, srcset in imgs:
+        candidate = pick_candidate(src, srcset)
+        if candidate and candidate not in urls:
+            urls.add(candidate)
+            if on_new is not None:
+                on_new(candidate)
 
     after_final = len(urls)
     print(f"   Финальный проход добавил: {after_final - before_final} URL")
 
+    if journal is not None:
+        journal.finish()
+
     return sorted(urls)
 
 
-def download_image(url: str, out_dir: str, index: int) -> bool:
+def make_session(pool_size: int) -> requests.Session:
+    """
+    Одна общая Session с пулом keep-alive соединений под число воркеров,
+    чтобы не делать TLS-рукопожатие к i.pinimg.com на каждую картинку.
+    """
+    sess = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size))
+    sess.mount("https://", adapter)
+    sess.mount("http://", adapter)
+    return sess
+
+
+def image_filename(url: str, index: int, ext: str, stable: bool) -> str:
+    if stable:
+        return f"pin_{os.path.basename(pin_key(url))}{ext}"
+    return f"pinterest_{index:05d}{ext}"
+
+
+def download_image(url: str, out_dir: str, index: int,
+                   sess: Optional[requests.Session] = None,
+                   manifest: Optional[Manifest] = None,
+                   store: Optional[CasStore] = None,
+                   cache: Optional[RevalidationCache] = None) -> bool:
     """
     Скачивает одну картинку.
     1) пробует /originals/
     2) если не вышло — качает исходный URL
+    Если передана sess — соединения берутся из её пула.
+    Если передан manifest — имя файла берётся из хеша pinimg (не зависит от
+    позиции в списке), а уже скачанные пины пропускаются без запроса.
+    Если передан store — хеш считается при записи, контент хранится один раз,
+    а уже известный хранилищу пин кладётся ссылкой без скачивания.
+    Если передан cache — для ранее скачанного URL шлётся условный запрос.
     """
     ensure_dir(out_dir)
 
+    key = pin_key(url) if manifest is not None else None
+    if key and manifest.is_done(key) and not REVALIDATE_EXISTING:
+        return True
+
+    cas_key = "pinimg:" + pin_key(url)
+    if store is not None:
+        hit = store.lookup(cas_key)
+        if hit:
+            digest, meta = hit
+            fname = image_filename(url, index, meta.get("ext") or ".jpg", key is not None)
+            path = os.path.join(out_dir, fname)
+            if not os.path.exists(path):
+                store.link_known(cas_key, path)
+            if key:
+                manifest.record(key, fname, size=meta.get("size", 0), digest=digest)
+            print(f"[dedup] {fname} (уже в хранилище)")
+            return True
+
     orig_url = make_original_url(url)
+    http = sess or requests
+    t0 = time.monotonic()
+    # .part — всегда по хешу пина: индекс между запусками (и в потоковом режиме) другой,
+    # и чужой .part не должен достаться этой картинке
+    stem = os.path.join(out_dir, image_filename(url, index, "", True))
 
     for attempt, u in enumerate([orig_url, url], start=1):
-        try:
-            r = requests.get(u, timeout=REQUEST_TIMEOUT, stream=True)
-            r.raise_for_status()
+        # У оригинала и fallback разное содержимое — и .part у них разные
+        tmp = stem + (".part" if attempt == 1 else ".fallback.part")
+        for i in range(MAX_RETRIES):
+            offset, headers = http_resume.resume_headers(tmp, u)
+            if not offset:
+                headers = cache.conditional_headers(u) if cache is not None else {}
+            try:
+                # with r — соединение возвращается в пул даже при skip/ошибке
+                with http.get(u, headers=headers, timeout=REQUEST_TIMEOUT, stream=True) as r:
+                    if r.status_code == 304 and cache is not None:
+                        entry = cache.note_hit(u) or {}
+                        fname = os.path.basename(entry.get("path") or "")
+                        if key and fname:
+                            manifest.record(key, fname, size=int(entry.get("length") or 0))
+                        print(f"[304] {fname or u} не изменился")
+                        return True
+                    if r.status_code == 416 and offset:
+                        http_resume.discard(tmp)
+                        continue
+                    if r.status_code == 429 or r.status_code >= 500:
+                        print(f"[retry] HTTP {r.status_code} → {u} (попытка {i + 1}/{MAX_RETRIES})")
+                        METRICS.inc("retries_total", host=urlsplit(u).hostname or "")
+                        backoff_sleep(i)
+                        continue
+                    if not r.ok:
+                        # 403/404 и т.п. — повторять бессмысленно, идём к следующему URL
+                        print(f"[ERR] попытка {attempt} для {u}: HTTP {r.status_code}")
+                        break
+
+                    ctype = r.headers.get("Content-Type", "").lower()
+                    ext = ".jpg"
+                    if "png" in ctype:
+                        ext = ".png"
+                    elif "webp" in ctype:
+                        ext = ".webp"
+
+                    fname = image_filename(url, index, ext, key is not None)
+                    path = os.path.join(out_dir, fname)
+
+                    if os.path.exists(path) and not REVALIDATE_EXISTING:
+                        print(f"[skip] {fname} уже есть")
+                        http_resume.discard(tmp)
+                        if key:
+                            manifest.record(key, fname, size=os.path.getsize(path))
+                        return True
+
+                    mode, total = http_resume.begin(r, offset, tmp, u)
+                    with (store.writer(tmp, mode) if store is not None else open(tmp, mode)) as f:
+                        for chunk in r.iter_content(1024 * 32):
+                            if chunk:
+                                f.write(chunk)
+                    if not http_resume.is_complete(tmp, total):
+                        # Оборвалось — .part остаётся, следующая попытка докачает через Range
+                        print(f"[retry] {fname}: {http_resume.part_offset(tmp)}/{total} байт")
+                        METRICS.inc("retries_total", host=urlsplit(u).hostname or "")
+                        backoff_sleep(i)
+                        continue
+                    extra = {}
+                    if store is not None:
+                        extra["digest"] = f.digest
+                        if store.commit(tmp, f.digest, path, key=cas_key, ext=ext):
+                            print(f"[dedup] {fname} — такой контент уже был, записана ссылка")
+                    else:
+                        os.replace(tmp, path)
+                    http_resume.discard(tmp)  # валидатор .part больше не нужен
+                    if cache is not None:
+                        cache.record(u, r.headers, path, length=os.path.getsize(path))
+                    if key:
+                        manifest.record(key, fname, size=os.path.getsize(path), **extra)
+                    METRICS.inc("files_total")
+                    METRICS.inc("bytes_total", os.path.getsize(path))
+                    METRICS.observe("stage_seconds", time.monotonic() - t0, stage="download", site="pinterest")
+                    resumed = f", докачка с {offset} байт" if mode == "ab" else ""
+                    print(f"[OK] {fname} ({'original' if attempt == 1 else 'fallback'}{resumed})")
+                    return True
+
+            except http_resume.ResumeError as e:
+                print(f"[resume] {e} — качаю заново")
+                http_resume.discard(tmp)
+            except Exception as e:
+                print(f"[ERR] попытка {attempt} для {u}: {e} ({i + 1}/{MAX_RETRIES})")
+                backoff_sleep(i)
+
+    if key:
+        manifest.record(key, "", status="failed")
+    return False
 
-            ctype = r.headers.get("Content-Type", "").lower()
-            ext = ".jpg"
-            if "png" in ctype:
-                ext = ".png"
-            elif "webp" in ctype:
-                ext = ".webp"
 
-            fname = f"pinterest_{index:05d}{ext}"
-            path = os.path.join(out_dir, fname)
+def save_sidecars(manifest: Optional[Manifest],
+                  store: Optional[CasStore],
+                  cache: Optional[RevalidationCache]) -> None:
+    if manifest is not None:
+        manifest.save()
+    if store is not None:
+        store.save()
+    if cache is not None:
+        cache.save()
+        print(cache.summary())
 
-            if os.path.exists(path):
-                print(f"[skip] {fname} уже есть")
-                return True
-
-            tmp = path + ".part"
-            with open(tmp, "wb") as f:
-                for chunk in r.iter_content(1024 * 32):
-                    if chunk:
-                        f.write(chunk)
-            os.replace(tmp, path)
-            print(f"[OK] {fname} ({'original' if attempt == 1 else 'fallback'})")
-            return True
 
-        except Exception as e:
-            print(f"[ERR] попытка {attempt} для {u}: {e}")
+def download_all(urls: List[str], out_dir: str, workers: int,
+                 manifest: Optional[Manifest] = None,
+                 store: Optional[CasStore] = None,
+                 cache: Optional[RevalidationCache] = None) -> int:
+    """
+    Качает список URL пулом из `workers` потоков через одну общую Session.
+    Без манифеста нумерация файлов — по позиции в списке,
+    как и в последовательном режиме.
+    Возвращает число успешно скачанных файлов.
+    """
+    ensure_dir(out_dir)
+    workers = max(1, workers)
+    sess = make_session(workers)
+    total = len(urls)
+    results: List[Optional[bool]] = [None] * total
+    done = 0
+    started = time.time()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(download_image, u, out_dir, idx, sess, manifest, store, cache): idx
+                for idx, u in enumerate(urls, 1)
+            }
+            for fut in as_completed(futures):
+                idx = futures[fut]
+                try:
+                    ok = fut.result()
+                except Exception as e:
+                    print(f"[ERR] #{idx}: {e}")
+                    ok = False
+                results[idx - 1] = ok
+                done += 1
+                if done % PROGRESS_EVERY == 0 or done == total:
+                    rate = done / max(time.time() - started, 1e-6)
+                    print(f"[progress] {done}/{total} ({rate:.1f} файлов/с)")
+    finally:
+        sess.close()
+        save_sidecars(manifest, store, cache)
+
+    failed = [i for i, ok in enumerate(results, 1) if not ok]
+    if failed:
+        # Упорядоченная сводка: номера не скачавшихся файлов по возрастанию
+        print(f"Не удалось скачать ({len(failed)}): "
+              + ", ".join(f"#{i}" for i in failed[:50])
+              + (" ..." if len(failed) > 50 else ""))
+    return total - len(failed)
+
+
+class PipelineProgress:
+    """Общий прогресс скролла и скачивания в потоковом режиме."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.found = 0
+        self.done = 0
+        self.ok = 0
+        self.failed: List[int] = []
+
+    def discovered(self) -> int:
+        with self._lock:
+            self.found += 1
+            return self.found
+
+    def finished(self, index: int, ok: bool) -> None:
+        with self._lock:
+            self.done += 1
+            if ok:
+                self.ok += 1
+            else:
+                self.failed.append(index)
+            report = self.done % PROGRESS_EVERY == 0
+        if report:
+            print(f"[progress] {self.line()}")
+
+    def line(self) -> str:
+        rate = self.done / max(time.time() - self.started, 1e-6)
+        return f"скачано {self.done}/{self.found}, ошибок {len(self.failed)} ({rate:.1f} файлов/с)"
+
+
+def stream_collect_and_download(driver, out_dir: str, workers: int,
+                                manifest: Optional[Manifest] = None,
+                                store: Optional[CasStore] = None,
+                                cache: Optional[RevalidationCache] = None,
+                                known: Optional[Set[str]] = None,
+                                journal: Optional[ScrollJournal] = None) -> PipelineProgress:
+    """
+    Скролл и скачивание одновременно: collect_image_urls() кладёт каждый новый
+    пин в ограниченную очередь, `workers` потоков тут же его качают.
+    Заполненная очередь притормаживает скролл, так что память не растёт.
+    Время ≈ max(скролл, скачивание) вместо их суммы.
+    """
+    ensure_dir(out_dir)
+    workers = max(1, workers)
+    sess = make_session(workers)
+    q: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max(1, STREAM_QUEUE_SIZE))
+    progress = PipelineProgress()
+    seen_keys: Set[str] = set()
+
+    def worker() -> None:
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            idx, u = item
+            try:
+                ok = download_image(u, out_dir, idx, sess, manifest, store, cache)
+            except Exception as e:
+                print(f"[ERR] #{idx}: {e}")
+                ok = False
+            progress.finished(idx, ok)
+
+    def on_new(u: str) -> None:
+        # Один URL на пин (превью разных размеров — один и тот же пин)
+        k = pin_key(u)
+        if k in seen_keys:
+            return
+        seen_keys.add(k)
+        if known and k in known and not REVALIDATE_EXISTING:
+            return
+        q.put((progress.discovered(), u))  # блокируется, если воркеры не успевают
 
-    return False
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    try:
+        stable_rounds, stable_seconds = stop_params()
+        collect_image_urls(
+            driver,
+            MAX_SCROLLS,
+            SCROLL_PAUSE,
+            stable_rounds,
+            known=known,
+            known_stop_run=KNOWN_STOP_RUN if known else 0,
+            on_new=on_new,
+            status=progress.line,
+            adaptive=ADAPTIVE_PACING,
+            stable_seconds=stable_seconds,
+            journal=journal
+        )
+        print(f"Скролл закончен, новых пинов: {progress.found}. Докачиваю очередь...")
+    finally:
+        for _ in threads:
+            q.put(None)
+        for t in threads:
+            t.join()
+        sess.close()
+        save_sidecars(manifest, store, cache)
+
+    print(f"[progress] {progress.line()}")
+    if progress.failed:
+        failed = sorted(progress.failed)
+        print(f"Не удалось скачать ({len(failed)}): "
+              + ", ".join(f"#{i}" for i in failed[:50])
+              + (" ..." if len(failed) > 50 else ""))
+    return progress
 
 
 def main():
@@ -226,6 +684,9 @@ def main():
 
     service = EdgeService(executable_path=EDGE_DRIVER_PATH)
     driver = webdriver.Edge(service=service, options=edge_options)
+    reporter = (MetricsReporter(METRICS, os.path.join(DOWNLOAD_DIR, ".metrics.json"),
+                                os.path.join(DOWNLOAD_DIR, ".metrics.prom"), METRICS_REFRESH).start()
+                if METRICS_ENABLED else None)
 
     try:
         print("Открываю https://www.pinterest.com/ ...")
@@ -241,12 +702,40 @@ def main():
         print("  3) Пролистай чуть вниз, чтобы убедиться, что всё грузится.")
         input("  4) Когда будешь на нужной странице — вернись сюда и нажми Enter...\n")
 
+        manifest = Manifest.in_dir(DOWNLOAD_DIR) if SYNC_MODE else None
+        known = manifest.known_keys() if manifest is not None else None
+        if known:
+            print(f"Манифест: уже скачано {len(known)} пинов — качаю только новые.")
+
+        store = CasStore(CAS_DIR) if CAS_ENABLED else None
+        cache = (RevalidationCache(os.path.join(DOWNLOAD_DIR, ".http_cache.json"))
+                 if HTTP_CACHE_ENABLED else None)
+        journal = (ScrollJournal(os.path.join(DOWNLOAD_DIR, JOURNAL_NAME))
+                   if SCROLL_CHECKPOINTS else None)
+
+        if STREAMING:
+            print(f"Скроллю и сразу качаю ({DOWNLOAD_WORKERS} потоков)...")
+            progress = stream_collect_and_download(
+                driver, DOWNLOAD_DIR, DOWNLOAD_WORKERS, manifest, store, cache, known, journal
+            )
+            print("\n==== Готово ====")
+            print(f"Новых пинов:         {progress.found}")
+            print(f"Файлов скачано:      {progress.ok}")
+            print("Папка с результатом:", os.path.abspath(DOWNLOAD_DIR))
+            return
+
         print("Начинаю скроллить и собирать URL картинок...")
+        stable_rounds, stable_seconds = stop_params()
         urls = collect_image_urls(
             driver,
             MAX_SCROLLS,
             SCROLL_PAUSE,
-            STABLE_ROUNDS
+            stable_rounds,
+            known=known,
+            known_stop_run=KNOWN_STOP_RUN if known else 0,
+            adaptive=ADAPTIVE_PACING,
+            stable_seconds=stable_seconds,
+            journal=journal
         )
 
         print(f"\nНайдено уникальных картинок (pinimg.com): {len(urls)}")
@@ -255,15 +744,21 @@ def main():
             print("❌ Не нашёл ни одной картинки. Скорее всего, Pinterest ещё не подгрузил контент или открыт не тот экран.")
             return
 
-        print("\nНачинаю скачивание...")
-        total_ok = 0
-        for idx, u in enumerate(urls, 1):
-            ok = download_image(u, DOWNLOAD_DIR, idx)
-            if ok:
-                total_ok += 1
+        total_found = len(urls)
+        if manifest is not None:
+            # Один URL на пин, уже скачанные отбрасываем до любых запросов
+            by_key = {}
+            for u in urls:
+                by_key.setdefault(pin_key(u), u)
+            urls = [u for k, u in sorted(by_key.items())
+                    if REVALIDATE_EXISTING or k not in known]
+            print(f"Новых пинов: {len(urls)} (пропущено известных: {len(by_key) - len(urls)})")
+
+        print(f"\nНачинаю скачивание ({DOWNLOAD_WORKERS} потоков)...")
+        total_ok = download_all(urls, DOWNLOAD_DIR, DOWNLOAD_WORKERS, manifest, store, cache)
 
         print("\n==== Готово ====")
-        print(f"Всего URL:           {len(urls)}")
+        print(f"Всего URL:           {total_found}")
         print(f"Файлов скачано:      {total_ok}")
         print("Папка с результатом:", os.path.abspath(DOWNLOAD_DIR))
 
@@ -272,6 +767,8 @@ def main():
             driver.quit()
         except Exception:
             pass
+        if reporter is not None:
+            reporter.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,1403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ядро Pixiv-загрузчика (без GUI): настройки, сессия, AJAX-резолв,
+конвейер скачивания, обработчики URL.
+- Скачивает ОРИГИНАЛ (полный размер) для иллюстраций/манги
+- Поддерживает ugoira (ZIP через ugoira_meta)
+- Получает ПОЛНЫЙ список работ профиля: AJAX + ?p= + «умный» скролл
+- «Прогревает» вкладками: открывает /artworks/{id}
+- Ретраи/бэкофф, стабильный Referer
+
+tkinter здесь не импортируется, Selenium — только при запуске Edge:
+модуль используют и окно (downloader_edge_gui_v8), и консольный
+combined_downloader.
+"""
+
+import os, re, time, json, threading, subprocess, random, queue
+from pathlib import Path
+from urllib.parse import urlparse, unquote, parse_qs, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import dom_extract
+from scroll_pacing import AdaptivePacer, StableTracker
+from warmup import WarmupPolicy
+from rate_limit import RateLimiter, RateLimitedSession
+from cas_store import CasStore
+from http_cache import RevalidationCache
+from meta_cache import MetaCache
+from pixiv_sync import UserSyncState
+from ugoira_convert import UgoiraConverter
+from cookie_store import LazyDriver, WarmDriver, load_cookies, save_cookies, apply_cookies
+from metrics import METRICS, MetricsReporter
+import ugoira_convert
+import http_resume
+
+# ===================== CONFIG =====================
+EDGE_DRIVER_PATH   = r"D:\Projekts\Script\Downloader\drivers\edgedriver_win64\msedgedriver.exe"
+REQUEST_TIMEOUT    = 30
+DOWNLOAD_ROOT      = "downloads"
+PIXIV_REFERER_ROOT = "https://www.pixiv.net/"
+PIXIV_API_ROOT     = "https://www.pixiv.net"   # хост /ajax/ (для замеров — локальная подмена)
+# Настройки стратегий (можно выключать по желанию):
+USE_AJAX_ALL         = True   # /ajax/user/{uid}/profile/all
+USE_PAGE_PAGINATION  = True   # /users/{uid}/artworks?p=N
+USE_SMART_SCROLL     = True   # умный скролл с детекцией стабильности
+DISCOVERY_RUN_ALL    = False  # True — как раньше: все стратегии подряд и объединение; иначе браузер — только запасной путь
+# Прогрев — открыть /artworks/{id} во вкладке:
+#   "session" — один раз за сессию, повторно только если пошли 403 / HTML вместо картинки
+#   "always"  — перед каждой работой (медленно: ~1 с на работу), "off" — без прогрева
+WARMUP_MODE          = "session"
+WARMUP_TABS          = 3      # сколько вкладок прогрева открывать одновременно
+WARMUP_WAIT_S        = 20.0   # сколько рабочий поток ждёт повторного прогрева перед ретраем
+GRAB_UGOIRA          = True   # качать zip ugoira, если есть (+ {id}.ugoira.json с задержками кадров)
+UGOIRA_CONVERT       = "webp" # собрать анимацию из zip: "webp" / "gif" / "apng"; "" — не конвертировать (нужен Pillow)
+UGOIRA_WORKERS       = 0      # процессов для конвертации; 0 — по числу ядер
+MAX_PAGES_TO_SCAN    = 120    # максимум страниц ?p=N
+SCROLL_MAX_ROUNDS    = 80     # максимум итераций скролла
+SCROLL_STABLE_ROUNDS = 3      # сколько подряд «без роста», чтобы остановиться
+# Адаптивные паузы: шаг заканчивается, как только пришли новые работы и сеть затихла
+ADAPTIVE_PACING      = True
+SCROLL_PAUSE_S       = 1.3    # обычный потолок ожидания после скролла (и фиксированная пауза без адаптива)
+SCROLL_MAX_WAIT_S    = 4.0    # жёсткий потолок, до которого растёт ожидание при тишине
+SCROLL_STABLE_S      = 4.0    # и не меньше стольких секунд без роста, чтобы остановиться
+PAGE_SETTLE_S        = 0.9    # потолок ожидания отрисовки после driver.get(?p=N)
+# Дедупликация: контент хранится один раз в {out_root}/.cas, по путям — жёсткие ссылки
+CAS_ENABLED          = False
+# Кеш ETag/Last-Modified ({out_root}/.http_cache.json) и перепроверка уже скачанного:
+HTTP_CACHE_ENABLED   = True
+REVALIDATE_EXISTING  = False  # True — не пропускать существующие файлы, а слать условный запрос
+# Инкрементальная синхронизация пользователя: состояние в {out_root}/pixiv/{uid}/.sync_state.json,
+# резолвятся и качаются только новые и недокачанные работы
+PIXIV_SYNC           = True
+# Кеш ответов AJAX ({out_root}/.pixiv_meta.json): повторный запуск резолвит старые работы без сети
+META_CACHE_ENABLED   = True
+META_CACHE_BYPASS    = False  # True — читать мимо кеша (ответы всё равно освежают его)
+META_CACHE_MAX       = 50000  # записей; лишние вытесняются по давности обращения
+META_CACHE_TTL       = {      # секунды жизни по эндпоинту; None — не протухает
+    "pages": None,            # оригиналы опубликованной работы не меняются
+    "illust": None,
+    "ugoira_meta": None,
+    "work": None,             # тип/число страниц/шаблон оригинала из пакетного /profile/illusts
+    "profile_all": 3600,      # список работ пользователя растёт — держим час
+}
+# Конвейер для пользователя: резолв метаданных и скачивание — отдельные пулы потоков
+RESOLVE_WORKERS      = 3      # сколько работ одновременно резолвить через /ajax/illust
+DOWNLOAD_WORKERS     = 4      # сколько файлов одновременно качать с i.pximg.net
+PIPELINE_QUEUE_SIZE  = 64     # размер очередей между стадиями (ограничивает память)
+BATCH_RESOLVE        = True   # метаданные пачками через /ajax/user/{uid}/profile/illusts?ids[]=…
+BATCH_SIZE           = 48     # ID в одном пакетном запросе
+# Быстрый старт без браузера: куки Pixiv сохраняются (DPAPI в Windows / файл 0600),
+# Edge запускается только когда реально нужен (пагинация/скролл, прогрев после 403)
+PERSIST_COOKIES      = True
+COOKIE_FILE          = os.path.join(os.path.expanduser("~"), ".artdownloader", "pixiv_cookies")
+COOKIE_REQUIRED      = ("PHPSESSID",)  # без живого логина сохранённые куки не годятся
+COOKIE_MAX_AGE_DAYS  = 14
+LAZY_DRIVER          = True
+# Пачка URL: сколько URL обрабатывать одновременно (браузерные шаги всё равно идут по очереди)
+BULK_WORKERS         = 3
+# Общий темп запросов по хостам (AIMD): растёт на успехах, вдвое падает на 429/5xx
+RATE_START           = 4.0    # запросов/с к хосту на старте
+RATE_MIN             = 0.5
+RATE_MAX             = 16.0
+CIRCUIT_THRESHOLD    = 5      # столько 429/5xx за 10 с — пауза для всех потоков
+CIRCUIT_OPEN_S       = 30.0
+# Метрики по стадиям: {out_root}/.metrics.json и Prometheus textfile, обновляются во время запуска
+METRICS_ENABLED      = True
+METRICS_REFRESH_S    = 15.0
+METRICS_PROM_FILE    = ""     # "" — {out_root}/.metrics.prom; или путь в каталог textfile-коллектора node_exporter
+# Ретраи:
+MAX_RETRIES          = 5
+BASE_BACKOFF_S       = 0.7
+# ==================================================
+
+# ----------------- helpers (UI/log) -----------------
+def ui_log(w, msg: str):
+    # w — окно лога с post() (кладёт строку в очередь) или None — тогда в консоль
+    post = getattr(w, "post", None)
+    if post is not None:
+        post(msg)
+        return
+    print(msg)
+
+def ensure_dir(p: str):
+    os.makedirs(p, exist_ok=True)
+
+def safe_name(s: str) -> str:
+    s = unquote(s or "").strip()
+    s = re.sub(r'[\\/:*?"<>|]+', '_', s)
+    return (s or "unknown")[:160]
+
+def replace_query_param(url: str, key: str, val: str) -> str:
+    sp = urlsplit(url)
+    q = parse_qs(sp.query)
+    q[key] = [val]
+    return urlunsplit((sp.scheme, sp.netloc, sp.path, urlencode(q, doseq=True), sp.fragment))
+
+def artwork_ids_from_hrefs(hrefs, ids: set[str]) -> int:
+    """Добавляет в ids номера работ из ссылок /artworks/{id}; возвращает, сколько новых."""
+    before = len(ids)
+    for href in hrefs:
+        m = re.search(r"/artworks/(\d+)$", (href or "").split("?")[0])
+        if m:
+            ids.add(m.group(1))
+    return len(ids) - before
+
+# Один лимитер на процесс: через него идут все pixiv-сессии и все их потоки
+RATE_LIMITER = RateLimiter(rate=RATE_START, min_rate=RATE_MIN, max_rate=RATE_MAX,
+                           threshold=CIRCUIT_THRESHOLD, open_s=CIRCUIT_OPEN_S)
+
+# Браузерная «полоса»: драйвер один на все потоки, браузерные шаги выполняются по очереди
+BROWSER_LANE = threading.RLock()
+
+def browser_step(driver, step):
+    """
+    step() в BROWSER_LANE. Тёплый Edge мог умереть между проверками
+    WarmDriver — тогда шаг падает (WebDriverException или обрыв связи с
+    драйвером): мёртвый Edge выбрасывается, шаг повторяется один раз на новом.
+    Ошибка живого браузера пробрасывается как есть.
+    """
+    with BROWSER_LANE:
+        try:
+            return step()
+        except Exception:
+            if not isinstance(driver, WarmDriver) or not driver.drop_dead():
+                raise
+            return step()
+
+class TransferStats:
+    """Счётчики за запуск — для общей скорости, прогресса по работам и ETA в GUI."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.files = 0
+            self.bytes = 0
+            self.works_total = 0
+            self.works_done = 0
+            self.started = time.time()
+
+    def add(self, nbytes: int):
+        with self._lock:
+            self.files += 1
+            self.bytes += nbytes
+        METRICS.inc("files_total")
+        METRICS.inc("bytes_total", nbytes)
+
+    def add_works(self, n: int):
+        with self._lock:
+            self.works_total += n
+        METRICS.inc("works_queued_total", n)
+
+    def work_done(self):
+        with self._lock:
+            self.works_done += 1
+        METRICS.inc("works_done_total")
+
+    def rate(self) -> float:
+        return self.bytes / max(time.time() - self.started, 1e-6)
+
+    def eta(self) -> float | None:
+        """Секунды до конца по средней скорости обработки работ; None — рано считать."""
+        with self._lock:
+            done, left = self.works_done, self.works_total - self.works_done
+        if not done or left <= 0:
+            return None
+        return left * (time.time() - self.started) / done
+
+TRANSFER = TransferStats()
+
+def backoff_sleep(try_index: int):
+    # try_index: 0..MAX_RETRIES-1
+    METRICS.sleep(BASE_BACKOFF_S * (2 ** try_index) + random.random() * 0.3, "backoff")
+
+# ----------------- requests session from WebDriver cookies -----------------
+def browser_cookies(driver) -> list[dict]:
+    """Куки pixiv из браузера (с pixiv-страницы — get_cookies отдаёт только текущий домен)."""
+    def step():
+        try:
+            if "pixiv.net" not in (driver.current_url or ""):
+                driver.get(PIXIV_REFERER_ROOT)
+        except Exception:
+            pass
+        return driver.get_cookies()
+    return browser_step(driver, step)
+
+def session_cookies(driver, logw) -> tuple[list[dict], bool]:
+    """(куки, взяты ли с диска): сохранённые живые куки, иначе — из браузера (и сохранить)."""
+    if PERSIST_COOKIES:
+        cookies = load_cookies(COOKIE_FILE, COOKIE_REQUIRED, COOKIE_MAX_AGE_DAYS * 86400,
+                               log=lambda m: ui_log(logw, m))
+        if cookies is not None:
+            ui_log(logw, f"[i] Куки с диска ({len(cookies)}) — браузер не нужен")
+            return cookies, True
+    cookies = browser_cookies(driver)
+    persist_cookies(cookies, logw)
+    return cookies, False
+
+def persist_cookies(cookies: list[dict], logw):
+    if not PERSIST_COOKIES:
+        return
+    try:
+        save_cookies(COOKIE_FILE, cookies)
+    except Exception as e:
+        ui_log(logw, f"[warn] куки не сохранены: {e}")
+
+def get_session_with_cookies(driver, referer: str | None = None, pool_size: int = 10,
+                             cookies: list[dict] | None = None) -> requests.Session:
+    sess = RateLimitedSession(RATE_LIMITER)
+    # Пул соединений под все потоки конвейера (резолв + скачивание)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(10, pool_size))
+    sess.mount("https://", adapter)
+    sess.mount("http://", adapter)
+    sess.headers.update({
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36",
+        "Accept-Language": "ru,en;q=0.9",
+    })
+    if referer:
+        sess.headers["Referer"] = referer
+    # Переносим куки из Edge-профиля (важно для R-18)
+    try:
+        apply_cookies(sess, cookies if cookies is not None else browser_cookies(driver))
+    except Exception:
+        pass
+    return sess
+
+_cas_stores: dict[str, CasStore] = {}
+_cas_lock = threading.Lock()
+
+def cas_store_for(out_root: str) -> CasStore | None:
+    """Общее хранилище дедупликации для папки загрузок (или None, если выключено)."""
+    if not CAS_ENABLED:
+        return None
+    root = os.path.abspath(os.path.join(out_root, ".cas"))
+    with _cas_lock:
+        if root not in _cas_stores:
+            _cas_stores[root] = CasStore(root)
+        return _cas_stores[root]
+
+_http_caches: dict[str, RevalidationCache] = {}
+
+def http_cache_for(out_root: str) -> RevalidationCache | None:
+    """Кеш ревалидации для папки загрузок (или None, если выключен)."""
+    if not HTTP_CACHE_ENABLED:
+        return None
+    path = os.path.abspath(os.path.join(out_root, ".http_cache.json"))
+    with _cas_lock:
+        if path not in _http_caches:
+            _http_caches[path] = RevalidationCache(path)
+        return _http_caches[path]
+
+_meta_caches: dict[str, MetaCache] = {}
+
+def meta_cache_for(out_root: str) -> MetaCache | None:
+    """Кеш AJAX-метаданных для папки загрузок (или None, если выключен)."""
+    if not META_CACHE_ENABLED:
+        return None
+    path = os.path.abspath(os.path.join(out_root, ".pixiv_meta.json"))
+    with _cas_lock:
+        if path not in _meta_caches:
+            _meta_caches[path] = MetaCache(path, ttl=META_CACHE_TTL, max_entries=META_CACHE_MAX)
+        _meta_caches[path].bypass = META_CACHE_BYPASS
+        return _meta_caches[path]
+
+def cached_ajax(meta: MetaCache | None, endpoint: str, key: str, fetch):
+    """fetch() через кеш метаданных: попадание — без запроса, промах — запрос и запись."""
+    value = meta.get(endpoint, key) if meta is not None else None
+    if value is not None:
+        METRICS.inc("meta_cache_hits_total", endpoint=endpoint)
+        return value
+    with METRICS.timed("stage_seconds", stage="ajax", endpoint=endpoint):
+        value = fetch()
+    if meta is not None:
+        meta.put(endpoint, key, value)
+    return value
+
+def should_skip_existing(path: str) -> bool:
+    return os.path.exists(path) and not REVALIDATE_EXISTING
+
+def cas_key_for_url(url: str) -> str:
+    # Оригиналы i.pximg.net не меняются — путь без query и есть стабильный ключ
+    sp = urlsplit(url)
+    return f"{sp.netloc}{sp.path}"
+
+def download_binary(sess: requests.Session, url: str, outpath: str, logw, referer: str | None = None,
+                    store: CasStore | None = None, cache: RevalidationCache | None = None) -> bool:
+    ensure_dir(os.path.dirname(outpath))
+    # Персональный referer на каждый запрос — для Pixiv обязателен
+    headers = {}
+    if referer:
+        headers["Referer"] = referer
+    # Уже скачанный файл — условный запрос: 304 = файл актуален, тело не качаем
+    if cache is not None:
+        headers.update(cache.conditional_headers(url, outpath))
+
+    cas_key = cas_key_for_url(url)
+    if store is not None and store.link_known(cas_key, outpath):
+        ui_log(logw, f"[dedup] {os.path.basename(outpath)} (уже в хранилище)")
+        return True
+
+    tmp = outpath + ".part"
+    host = urlsplit(url).hostname or ""
+    t0 = time.monotonic()
+    for i in range(MAX_RETRIES):
+        # Остался .part от прошлой попытки/запуска — докачиваем с его конца (If-Range)
+        offset, range_headers = http_resume.resume_headers(tmp, url)
+        req_headers = dict(headers)
+        if offset:
+            req_headers.pop("If-None-Match", None)
+            req_headers.pop("If-Modified-Since", None)
+            req_headers.update(range_headers)
+        try:
+            with sess.get(url, headers=req_headers, timeout=REQUEST_TIMEOUT, stream=True) as r:
+                if r.status_code == 429 or r.status_code >= 500:
+                    ui_log(logw, f"[retry] HTTP {r.status_code} → {url}")
+                    METRICS.inc("retries_total", host=host)
+                    backoff_sleep(i)
+                    continue
+                if r.status_code == 304 and cache is not None:
+                    cache.note_hit(url)
+                    ui_log(logw, f"[304] {os.path.basename(outpath)} не изменился")
+                    return True
+                if r.status_code == 416 and offset:
+                    # .part длиннее/не совпадает с файлом на сервере — начинаем заново
+                    ui_log(logw, f"[resume] HTTP 416, качаю {os.path.basename(outpath)} с нуля")
+                    http_resume.discard(tmp)
+                    continue
+                if not r.ok:
+                    ui_log(logw, f"[!] HTTP {r.status_code}: {url}")
+                    return False
+                ctype = r.headers.get("Content-Type", "")
+                if ("image" not in ctype) and ("octet-stream" not in ctype) and (not url.lower().endswith(".zip")):
+                    ui_log(logw, f"[!] Не похоже на изображение/zip ({ctype}): {url}")
+                    return False
+                mode, total = http_resume.begin(r, offset, tmp, url)
+                if mode == "ab":
+                    ui_log(logw, f"[resume] {os.path.basename(outpath)} с {offset} байт")
+                with (store.writer(tmp, mode) if store is not None else open(tmp, mode)) as f:
+                    for chunk in r.iter_content(1024 * 32):
+                        if chunk:
+                            f.write(chunk)
+                if not http_resume.is_complete(tmp, total):
+                    # Оборвалось — .part оставляем, следующая попытка докачает
+                    ui_log(logw, f"[retry] {os.path.basename(outpath)}: {http_resume.part_offset(tmp)}/{total} байт")
+                    METRICS.inc("retries_total", host=host)
+                    backoff_sleep(i)
+                    continue
+                if store is not None:
+                    if store.commit(tmp, f.digest, outpath, key=cas_key, ext=os.path.splitext(outpath)[1]):
+                        ui_log(logw, f"[dedup] {os.path.basename(outpath)} — такой контент уже был, записана ссылка")
+                else:
+                    os.replace(tmp, outpath)
+                http_resume.discard(tmp)  # валидатор .part больше не нужен
+                TRANSFER.add(os.path.getsize(outpath))
+                METRICS.observe("stage_seconds", time.monotonic() - t0, stage="download", site="pixiv")
+                if cache is not None:
+                    cache.record(url, r.headers, outpath, length=os.path.getsize(outpath))
+                ui_log(logw, f"[ok] {os.path.basename(outpath)}")
+                return True
+        except http_resume.ResumeError as e:
+            ui_log(logw, f"[resume] {e} — качаю заново")
+            http_resume.discard(tmp)
+        except requests.exceptions.ReadTimeout:
+            ui_log(logw, f"[timeout] {url} (попытка {i+1}/{MAX_RETRIES})")
+            backoff_sleep(i)
+        except Exception as e:
+            ui_log(logw, f"[fail] {os.path.basename(outpath)} -> {e} (попытка {i+1}/{MAX_RETRIES})")
+            backoff_sleep(i)
+    return False
+
+# ----------------- Edge preflight & setup -----------------
+def _gentle_kill_edge():
+    try:
+        subprocess.run(["taskkill", "/F", "/IM", "msedge.exe"], capture_output=True, text=True)
+    except Exception:
+        pass
+    try:
+        subprocess.run(["taskkill", "/F", "/IM", "msedgewebview2.exe"], capture_output=True, text=True)
+    except Exception:
+        pass
+
+def preflight_edge_launch(profile_root: str, profile_name: str, logw):
+    # Удаляем DevToolsActivePort и lock'и, чтобы не упал на старте
+    prof_dir = Path(profile_root) / profile_name
+    for name in ["SingletonLock", "SingletonCookie", "SingletonSocket", "DevToolsActivePort"]:
+        for p in [Path(profile_root)/name, prof_dir/name]:
+            try:
+                if p.exists():
+                    p.unlink()
+            except Exception:
+                pass
+    # Версию драйвера — в лог
+    try:
+        drv_ver = subprocess.run([EDGE_DRIVER_PATH, "--version"], capture_output=True, text=True)
+        if drv_ver and drv_ver.stdout:
+            ui_log(logw, f"[i] msedgedriver: {drv_ver.stdout.strip()}")
+    except Exception:
+        pass
+
+def find_msedge_binary() -> str | None:
+    candidates = [
+        r"C:\Program Files\Microsoft\Edge\Application\msedge.exe",
+        r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe",
+        os.path.expandvars(r"%LOCALAPPDATA%\Microsoft\Edge SxS\Application\msedge.exe"),
+    ]
+    for p in candidates:
+        if os.path.isfile(p):
+            return p
+    return None
+
+def setup_edge_driver(profile_dir: str, headless: bool, profile_name: str, logw):
+    # Selenium грузится только здесь: запуск без браузера его не импортирует
+    from selenium import webdriver
+    from selenium.webdriver.edge.options import Options as EdgeOptions
+    from selenium.webdriver.edge.service import Service as EdgeService
+    from selenium.common.exceptions import WebDriverException
+
+    preflight_edge_launch(profile_dir, profile_name, logw)
+
+    opts = EdgeOptions()
+    edge_bin = find_msedge_binary()
+    if edge_bin:
+        try:
+            opts.binary_location = edge_bin  # type: ignore[attr-defined]
+            ui_log(logw, f"[i] msedge.exe: {edge_bin}")
+        except Exception:
+            pass
+
+    # Флаги для стабильной работы
+    opts.add_argument("--start-maximized")
+    opts.add_argument("--disable-gpu")
+    opts.add_argument("--enable-unsafe-swiftshader")  # когда WebGL ругается — включаем софт-рендер
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
+    opts.add_argument("--disable-extensions")
+    opts.add_argument("--no-first-run")
+    opts.add_argument("--no-default-browser-check")
+    opts.add_argument("--disable-features=Translate,RendererCodeIntegrity,AutomationControlled")
+    opts.add_argument("--disable-renderer-backgrounding")
+    opts.add_argument("--disable-background-timer-throttling")
+    opts.add_argument("--remote-allow-origins=*")
+    opts.add_argument(f"--user-data-dir={profile_dir}")
+    opts.add_argument(f"--profile-directory={profile_name}")
+    if headless:
+        opts.add_argument("--headless=new")
+
+    # Две попытки старта
+    try:
+        service = EdgeService(executable_path=EDGE_DRIVER_PATH)
+        driver = webdriver.Edge(service=service, options=opts)
+        ui_log(logw, f"[+] Edge WebDriver запущен. Profile='{profile_name}'")
+        return driver
+    except WebDriverException:
+        ui_log(logw, "[i] Перезапуск: форс-закрытие Edge и повторная попытка…")
+        _gentle_kill_edge()
+        preflight_edge_launch(profile_dir, profile_name, logw)
+        try:
+            service = EdgeService(executable_path=EDGE_DRIVER_PATH)
+            driver = webdriver.Edge(service=service, options=opts)
+            ui_log(logw, f"[+] Edge WebDriver запущен со второй попытки. Profile='{profile_name}'")
+            return driver
+        except WebDriverException as e2:
+            ui_log(logw, "[ERROR] Edge не стартовал с оригинальным профилем. "
+                         "Убедись, что версии Edge и msedgedriver совпадают и Edge полностью закрыт.\n"
+                         f"{e2}")
+            return None
+
+# ----------------- Pixiv helpers -----------------
+def pixiv_user_id_from_url(url: str) -> str | None:
+    m = re.search(r"/users/(\d+)", url)
+    return m.group(1) if m else None
+
+def pixiv_art_id_from_url(url: str) -> str | None:
+    m = re.search(r"/artworks/(\d+)", url)
+    return m.group(1) if m else None
+
+def pixiv_fetch_user_all_illust_ids(sess: requests.Session, user_id: str, logw=None) -> list[str]:
+    if not USE_AJAX_ALL:
+        return []
+    api = f"{PIXIV_API_ROOT}/ajax/user/{user_id}/profile/all?lang=en"
+    headers = {"Referer": f"https://www.pixiv.net/users/{user_id}"}
+    ids = set()
+    for i in range(MAX_RETRIES):
+        try:
+            r = sess.get(api, headers=headers, timeout=REQUEST_TIMEOUT)
+            if r.status_code == 429 or r.status_code >= 500:
+                if logw: ui_log(logw, f"[retry] profile/all HTTP {r.status_code}")
+                backoff_sleep(i)
+                continue
+            if not r.ok:
+                if logw: ui_log(logw, f"[!] profile/all HTTP {r.status_code}")
+                return []
+            j = r.json()
+            body = j.get("body", {})
+            for key in ("illusts", "manga"):
+                d = body.get(key, {}) or {}
+                for k in d.keys():
+                    if re.fullmatch(r"\d+", k):
+                        ids.add(k)
+            break
+        except Exception as e:
+            if logw: ui_log(logw, f"[warn] profile/all: {e} (попытка {i+1})")
+            backoff_sleep(i)
+    return sorted(ids, key=lambda x: int(x))
+
+def pixiv_fetch_user_top_ids(sess: requests.Session, user_id: str) -> list[str] | None:
+    """Свежие работы пользователя (/profile/top) — для выборочной проверки полноты; None — не удалось."""
+    api = f"{PIXIV_API_ROOT}/ajax/user/{user_id}/profile/top?lang=en"
+    headers = {"Referer": f"https://www.pixiv.net/users/{user_id}"}
+    for i in range(MAX_RETRIES):
+        try:
+            r = sess.get(api, headers=headers, timeout=REQUEST_TIMEOUT)
+            if r.status_code == 429 or r.status_code >= 500:
+                backoff_sleep(i); continue
+            if not r.ok:
+                return None
+            body = r.json().get("body", {}) or {}
+            ids = set()
+            for key in ("illusts", "manga"):
+                ids.update(k for k in (body.get(key) or {}) if re.fullmatch(r"\d+", k))
+            return sorted(ids, key=lambda x: int(x))
+        except Exception:
+            backoff_sleep(i)
+    return None
+
+ORIGINAL_EXTS = ("jpg", "png", "gif")
+# Сколько подтверждённых оригиналов автора нужно, чтобы угадывать его привычное расширение
+USER_EXT_MIN_SEEN = 3
+
+def with_ext(path_or_url: str, ext: str) -> str:
+    return re.sub(r"\.[A-Za-z0-9]+$", f".{ext}", path_or_url)
+
+def original_template(thumb_url: str, illust_id: str, ext: str | None = None) -> str | None:
+    """
+    Превью из /profile/illusts → шаблон оригинала с {page}:
+      i.pximg.net/c/250x250_80_a2/img-master/img/<дата>/<id>_p0_square1200.jpg
+      → i.pximg.net/img-original/img/<дата>/<id>_p{page}.<ext>
+    Расширения оригинала пакетный ответ не сообщает: превью pixiv почти
+    всегда .jpg (перекодированы), а illustType различает только картинку,
+    мангу и ugoira. Поэтому .jpg из превью — лишь догадка по умолчанию
+    (png/gif в превью берём как есть). Уточняет её конвейер: расширение,
+    подтверждённое другой страницей работы, или преобладающее у автора
+    (PixivPipeline._likely_ext). Компромисс: промах стоит одного 404 и
+    перебора остальных ORIGINAL_EXTS (ext_guess_miss_total), а точный
+    ответ через /pages — лишнего запроса на каждую работу.
+    """
+    m = re.search(r"^(https?://[^/]+(?:/[^/]+)*?)/(?:c/[^/]+/)?(?:img-master|custom-thumb)/img/(\d{4}/\d\d/\d\d/\d\d/\d\d/\d\d)/"
+                  + re.escape(illust_id) + r"_p0[^/]*?\.(\w+)(?:\?|$)", thumb_url or "")
+    if not m:
+        return None
+    if ext is None:
+        ext = m.group(3).lower() if m.group(3).lower() in ORIGINAL_EXTS else ORIGINAL_EXTS[0]
+    return f"{m.group(1)}/img-original/img/{m.group(2)}/{illust_id}_p{{page}}.{ext}"
+
+def pixiv_ajax_user_works(sess: requests.Session, user_id: str, ids: list[str]) -> dict[str, dict] | None:
+    """Одна пачка /profile/illusts?ids[]=…: id → тело работы (illustType, pageCount, url превью)."""
+    api = f"{PIXIV_API_ROOT}/ajax/user/{user_id}/profile/illusts"
+    params = [("ids[]", i) for i in ids] + [("work_category", "illustManga"), ("is_first_page", "0"), ("lang", "en")]
+    headers = {"Referer": f"https://www.pixiv.net/users/{user_id}/artworks"}
+    for i in range(MAX_RETRIES):
+        try:
+            r = sess.get(api, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+            if r.status_code == 429 or r.status_code >= 500:
+                backoff_sleep(i); continue
+            if not r.ok:
+                return None
+            return dict((r.json().get("body") or {}).get("works") or {})
+        except Exception:
+            backoff_sleep(i)
+    return None
+
+def pixiv_batch_resolve(sess: requests.Session, user_id: str, ids: list[str],
+                        meta: MetaCache | None = None, logw=None) -> dict[str, dict]:
+    """
+    Пакетный резолв: id → {"type", "pages", "tmpl"}. Работы, для которых
+    шаблон оригинала не собрать, в результат не попадают — их резолвят
+    поштучно (/pages, /ajax/illust).
+    """
+    out: dict[str, dict] = {}
+    todo = []
+    for i in ids:
+        hit = meta.get("work", i) if meta is not None else None
+        if hit:
+            out[i] = hit
+        else:
+            todo.append(i)
+    requests_made = 0
+    for k in range(0, len(todo), BATCH_SIZE):
+        chunk = todo[k:k + BATCH_SIZE]
+        with METRICS.timed("stage_seconds", stage="ajax", endpoint="profile_illusts"):
+            works = pixiv_ajax_user_works(sess, user_id, chunk)
+        requests_made += 1
+        for i in chunk:
+            w = (works or {}).get(i) or {}
+            info = {"type": int(w.get("illustType") or 0), "pages": int(w.get("pageCount") or 1),
+                    "tmpl": original_template(w.get("url") or "", i)}
+            if not w or (not info["tmpl"] and info["type"] != 2):
+                continue
+            out[i] = info
+            if meta is not None:
+                meta.put("work", i, info)
+    if logw:
+        ui_log(logw, f"[i] Пакетный резолв: {len(out)}/{len(ids)} работ, из кеша {len(ids) - len(todo)}, "
+                     f"запросов {requests_made} (остальные — поштучно)")
+    return out
+
+def resolve_from_batch(sess: requests.Session, illust_id: str, info: dict,
+                       meta: MetaCache | None = None) -> tuple[list[str], dict | None]:
+    """Оригиналы по шаблону из пакетного ответа — как pixiv_ajax_single() по _p0."""
+    if info["type"] == 2:
+        if not GRAB_UGOIRA:
+            return [], None
+        return [], cached_ajax(meta, "ugoira_meta", illust_id, lambda: pixiv_ugoira_meta(sess, illust_id))
+    return [info["tmpl"].replace("{page}", str(p)) for p in range(info["pages"])], None
+
+def pixiv_collect_ids_via_pages(driver, user_id: str, logw=None) -> list[str]:
+    if not USE_PAGE_PAGINATION:
+        return []
+    ids = set()
+    base = f"https://www.pixiv.net/users/{user_id}/artworks"
+    pacer = AdaptivePacer(driver, 'a[href*="/artworks/"]') if ADAPTIVE_PACING else None
+    for p in range(1, MAX_PAGES_TO_SCAN + 1):
+        url = f"{base}?p={p}"
+        try:
+            driver.get(url)
+            if pacer is not None:
+                METRICS.slept(pacer.settle(PAGE_SETTLE_S), "page_settle")
+            else:
+                METRICS.sleep(PAGE_SETTLE_S, "page_settle")
+            # Новая страница → первый вызов отдаёт все ссылки одним round trip
+            hrefs = dom_extract.collect_links(driver, 'a[href*="/artworks/"]')
+            added = artwork_ids_from_hrefs(hrefs, ids)
+            if logw: ui_log(logw, f"[p={p}] найдено id (суммарно): {len(ids)}")
+            if added == 0:
+                break
+        except Exception as e:
+            if p == 1:
+                raise  # браузер не открыл даже первую страницу — решает вызывающий
+            if logw: ui_log(logw, f"[warn] пагинация p={p}: {e}")
+            break
+    return sorted(ids, key=lambda x: int(x))
+
+def smart_infinite_scroll(driver, logw=None) -> set[str]:
+    if not USE_SMART_SCROLL:
+        return set()
+    last_h = 0
+    last_cnt = 0
+    ids = set()
+    dom_extract.reset(driver)
+    tracker = StableTracker(SCROLL_STABLE_ROUNDS, SCROLL_STABLE_S if ADAPTIVE_PACING else 0.0)
+    pacer = None
+    if ADAPTIVE_PACING:
+        pacer = AdaptivePacer(driver, 'a[href*="/artworks/"]',
+                              base_cap=SCROLL_PAUSE_S, max_wait=SCROLL_MAX_WAIT_S)
+        pacer.start()
+    for i in range(SCROLL_MAX_ROUNDS):
+        t0 = time.monotonic()
+        try:
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            if pacer is not None:
+                METRICS.slept(pacer.wait()[0], "scroll")
+            else:
+                METRICS.sleep(0.9 + random.random()*(SCROLL_PAUSE_S - 0.9), "scroll")
+            h = driver.execute_script("return document.body.scrollHeight;")
+            # Только ссылки, добавленные с прошлого шага — один round trip
+            hrefs = dom_extract.collect_links(driver, 'a[href*="/artworks/"]')
+            artwork_ids_from_hrefs(hrefs, ids)
+            grew = (h > last_h) or (len(ids) > last_cnt)
+            last_h, last_cnt = h, len(ids)
+            stop = tracker.update(grew)
+            METRICS.observe("stage_seconds", time.monotonic() - t0, stage="scroll_step", site="pixiv")
+            if logw:
+                ui_log(logw, f"[scroll] ids={len(ids)} height={h} "
+                             f"stable={tracker.stable}/{SCROLL_STABLE_ROUNDS} ({tracker.quiet_for:.1f} с)")
+            if stop:
+                break
+        except Exception as e:
+            if logw: ui_log(logw, f"[warn] scroll: {e}")
+            break
+    return ids
+
+def pixiv_ajax_pages(sess: requests.Session, illust_id: str) -> list[str]:
+    api = f"{PIXIV_API_ROOT}/ajax/illust/{illust_id}/pages?lang=en"
+    headers = {"Referer": f"https://www.pixiv.net/artworks/{illust_id}"}
+    for i in range(MAX_RETRIES):
+        try:
+            r = sess.get(api, headers=headers, timeout=REQUEST_TIMEOUT)
+            if r.status_code == 429 or r.status_code >= 500:
+                backoff_sleep(i); continue
+            if not r.ok:
+                return []
+            j = r.json()
+            body = j.get("body", []) or []
+            out = []
+            for item in body:
+                u = (item.get("urls") or {}).get("original")
+                if u:
+                    out.append(u)
+            return out
+        except Exception:
+            backoff_sleep(i)
+    return []
+
+def pixiv_ajax_single(sess: requests.Session, illust_id: str) -> list[str]:
+    api = f"{PIXIV_API_ROOT}/ajax/illust/{illust_id}?lang=en"
+    headers = {"Referer": f"https://www.pixiv.net/artworks/{illust_id}"}
+    for i in range(MAX_RETRIES):
+        try:
+            r = sess.get(api, headers=headers, timeout=REQUEST_TIMEOUT)
+            if r.status_code == 429 or r.status_code >= 500:
+                backoff_sleep(i); continue
+            if not r.ok:
+                return []
+            j = r.json()
+            body = j.get("body", {}) or {}
+            page_count = int(body.get("pageCount", 1))
+            illust_type = int(body.get("illustType", 0))  # 2 = ugoira
+            urls = []
+            orig = (body.get("urls") or {}).get("original")
+            if orig:
+                base = re.sub(r"_p0(\.[a-z]+)$", r"_p{page}\1", orig, flags=re.I)
+                for p in range(page_count):
+                    urls.append(base.replace("{page}", str(p)))
+            # Вернём также тип — через маркер
+            if illust_type == 2 and GRAB_UGOIRA:
+                # добавим маркер, чтобы вызывающий код мог проверить тип
+                urls.append("__UGOIRA__")
+            return urls
+        except Exception:
+            backoff_sleep(i)
+    return []
+
+def pixiv_ugoira_meta(sess: requests.Session, illust_id: str) -> dict | None:
+    """{"src": URL zip, "frames": [{"file", "delay"}]} — задержки нужны для сборки анимации."""
+    api = f"{PIXIV_API_ROOT}/ajax/illust/{illust_id}/ugoira_meta?lang=en"
+    headers = {"Referer": f"https://www.pixiv.net/artworks/{illust_id}"}
+    for i in range(MAX_RETRIES):
+        try:
+            r = sess.get(api, headers=headers, timeout=REQUEST_TIMEOUT)
+            if r.status_code == 429 or r.status_code >= 500:
+                backoff_sleep(i); continue
+            if not r.ok:
+                return None
+            body = r.json().get("body") or {}
+            u = (body.get("originalSrc") or "").strip()
+            if not u:
+                return None
+            frames = [{"file": f.get("file"), "delay": int(f.get("delay") or 0)}
+                      for f in (body.get("frames") or []) if f.get("file")]
+            return {"src": u, "frames": frames}
+        except Exception:
+            backoff_sleep(i)
+    return None
+
+# ----------------- Pixiv handlers -----------------
+def resolve_work(sess: requests.Session, illust_id: str,
+                 meta: MetaCache | None = None) -> tuple[list[str], dict | None]:
+    """Оригиналы страниц работы (+ ugoira_meta: URL zip и задержки кадров, если это ugoira)."""
+    # Оригиналы через /pages
+    originals = cached_ajax(meta, "pages", illust_id, lambda: pixiv_ajax_pages(sess, illust_id))
+    if not originals:
+        originals = cached_ajax(meta, "illust", illust_id, lambda: pixiv_ajax_single(sess, illust_id))
+
+    # Ugoira: маркер от /ajax/illust или первый кадр *_ugoira0.* из /pages — нужен zip
+    ugoira = None
+    if GRAB_UGOIRA and any(u == "__UGOIRA__" or "_ugoira" in u for u in originals):
+        originals = [u for u in originals if u != "__UGOIRA__" and "_ugoira" not in u]
+        ugoira = cached_ajax(meta, "ugoira_meta", illust_id, lambda: pixiv_ugoira_meta(sess, illust_id))
+    originals = [u for u in originals if u != "__UGOIRA__"]
+
+    # Фильтруем на всякий
+    originals = [u for u in originals if ("i.pximg.net" in u and "/img-original/" in u)]
+    return originals, ugoira
+
+def save_ugoira_frames(dest_dir: str, illust_id: str, ugoira: dict | None, converter: UgoiraConverter | None = None):
+    """Пишет {id}.ugoira.json с задержками; zip уже лежит — сразу отдаёт в конвертацию."""
+    if not ugoira:
+        return
+    zip_path = os.path.join(dest_dir, f"{illust_id}.ugoira.zip")
+    if not os.path.exists(ugoira_convert.frames_path(zip_path)):
+        ugoira_convert.save_frames(zip_path, ugoira.get("frames") or [])
+    if converter is not None and os.path.exists(zip_path):
+        converter.submit(zip_path, ugoira.get("frames"))
+
+def work_files(illust_id: str, originals: list[str], ugoira: dict | None) -> list[tuple[str, str]]:
+    """Все файлы работы: (url, имя файла)."""
+    files = []
+    if ugoira:
+        files.append((ugoira["src"], f"{illust_id}.ugoira.zip"))
+    for u in originals:
+        pm = re.search(r"_p(\d+)\.(jpg|png|jpeg|gif|webp)$", u, re.I)
+        page_idx = pm.group(1) if pm else "0"
+        ext = pm.group(2) if pm else "jpg"
+        files.append((u, f"{illust_id}_p{page_idx}.{ext}"))
+    return files
+
+def work_download_jobs(illust_id: str, originals: list[str], ugoira: dict | None,
+                       dest_dir: str, logw, existing: set[str] | None = None) -> list[tuple[str, str, str]]:
+    """
+    Задания (url, outpath, referer) для работы; уже скачанное отбрасывается.
+    existing — имена файлов папки из одного scandir (вместо exists на каждый файл).
+    """
+    referer = f"https://www.pixiv.net/artworks/{illust_id}"
+    jobs = []
+    for u, fname in work_files(illust_id, originals, ugoira):
+        outp = os.path.join(dest_dir, fname)
+        if existing is not None and not REVALIDATE_EXISTING:
+            skip = fname in existing
+        else:
+            skip = should_skip_existing(outp)
+        if skip:
+            ui_log(logw, f"[skip] {fname}")
+            continue
+        jobs.append((u, outp, referer))
+    return jobs
+
+class PixivPipeline:
+    """
+    Конвейер discover → resolve → download для работ пользователя.
+    ID подаются из вызывающего потока (там же прогрев вкладкой — драйвер
+    однопоточный), резолв метаданных и скачивание идут в отдельных пулах,
+    связанных ограниченными очередями: пока качаются страницы работы N,
+    уже резолвится работа N+1.
+    """
+
+    def __init__(self, sess: requests.Session, dest_dir: str, logw, store=None, cache=None,
+                 warmup: WarmupPolicy | None = None, meta: MetaCache | None = None,
+                 state: UserSyncState | None = None, converter: UgoiraConverter | None = None,
+                 batch: dict[str, dict] | None = None,
+                 resolve_workers: int = RESOLVE_WORKERS, download_workers: int = DOWNLOAD_WORKERS,
+                 queue_size: int = PIPELINE_QUEUE_SIZE):
+        self.sess = sess
+        self.warmup = warmup
+        self.meta = meta
+        self.state = state
+        self.converter = converter
+        self.batch = batch or {}
+        self.guessed: set[str] = set()  # URL оригиналов с угаданным расширением
+        self._work_ext: dict[str, str] = {}  # подтверждённое скачиванием расширение работы
+        # Расширения оригиналов автора: уже лежащие файлы + скачанные в этом запуске
+        self._user_exts: dict[str, int] = {}
+        for name in (state.files if state is not None else ()):
+            ext = name.rsplit(".", 1)[-1]
+            if ext in ORIGINAL_EXTS and "_p" in name:
+                self._user_exts[ext] = self._user_exts.get(ext, 0) + 1
+        self._left: dict[str, int] = {}  # сколько файлов работы ещё в очереди скачивания
+        self.dest_dir = dest_dir
+        self.logw = logw
+        self.store = store
+        self.cache = cache
+        self.id_q: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.dl_q: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.resolvers = [threading.Thread(target=self._resolve_loop, daemon=True)
+                          for _ in range(max(1, resolve_workers))]
+        self.downloaders = [threading.Thread(target=self._download_loop, daemon=True)
+                            for _ in range(max(1, download_workers))]
+        self._lock = threading.Lock()
+        self.total = 0
+        self.resolved = 0
+        self.files_ok = 0
+        self.files_failed = 0
+        self.no_originals: list[str] = []
+        self.started = time.time()
+
+    def start(self):
+        for t in self.resolvers + self.downloaders:
+            t.start()
+        return self
+
+    def _service(self):
+        # Пока поток драйвера ждёт очередь/потоки — выполняет запрошенные прогревы
+        if self.warmup is not None:
+            self.warmup.service()
+
+    def _put(self, q: queue.Queue, item):
+        while True:
+            try:
+                q.put(item, timeout=0.5)  # ждём, если следующая стадия не успевает
+                return
+            except queue.Full:
+                self._service()
+
+    def _join(self, threads: list[threading.Thread]):
+        for t in threads:
+            while t.is_alive():
+                t.join(0.5)
+                self._service()
+
+    def submit(self, illust_id: str):
+        TRANSFER.add_works(1)
+        with self._lock:
+            self.total += 1
+        if self.warmup is not None:
+            self.warmup.ensure(illust_id)
+        self._put(self.id_q, illust_id)
+
+    def close(self) -> dict:
+        """Дожидается, пока обе стадии доработают; возвращает итог (см. result())."""
+        for _ in self.resolvers:
+            self._put(self.id_q, None)
+        self._join(self.resolvers)
+        for _ in self.downloaders:
+            self._put(self.dl_q, None)
+        self._join(self.downloaders)
+        dt = max(time.time() - self.started, 1e-6)
+        ui_log(self.logw, f"[i] Конвейер: работ {self.resolved}/{self.total}, файлов ok={self.files_ok} "
+                          f"fail={self.files_failed}, {self.files_ok / dt:.2f} файлов/с")
+        if self.no_originals:
+            ui_log(self.logw, f"[!] Без оригиналов (нужна авторизация/рейтинг?): {', '.join(self.no_originals[:30])}"
+                              + (" …" if len(self.no_originals) > 30 else ""))
+        return self.result()
+
+    def result(self) -> dict:
+        """Итог для вызывающего: работ, файлов скачано/не скачано, работы без оригиналов."""
+        with self._lock:
+            return work_result(self.resolved, self.files_ok, self.files_failed, self.no_originals)
+
+    def _rewarmed(self, illust_id: str) -> bool:
+        # 403 / HTML вместо картинки → хук сессии запросил прогрев; ждём его и пробуем ещё раз
+        return self.warmup is not None and self.warmup.wait(illust_id, WARMUP_WAIT_S)
+
+    def _resolve(self, illust_id: str) -> tuple[list[str], dict | None]:
+        try:
+            info = self.batch.pop(illust_id, None)
+            if info is not None:
+                originals, ugoira = resolve_from_batch(self.sess, illust_id, info, self.meta)
+                return self._settle_ext(illust_id, originals), ugoira
+            return resolve_work(self.sess, illust_id, self.meta)
+        except Exception as e:
+            ui_log(self.logw, f"[warn] resolve {illust_id}: {e}")
+            return [], None
+
+    def _settle_ext(self, illust_id: str, originals: list[str]) -> list[str]:
+        # Файл уже лежит с другим расширением — берём его, иначе запоминаем догадку
+        existing = self.state.files if self.state is not None else None
+        out = []
+        for u in originals:
+            name = u.rsplit("/", 1)[-1]
+            for ext in ORIGINAL_EXTS:
+                alt = with_ext(name, ext)
+                if (alt in existing) if existing is not None else os.path.exists(os.path.join(self.dest_dir, alt)):
+                    u = with_ext(u, ext)
+                    break
+            else:
+                with self._lock:
+                    self.guessed.add(u)
+            out.append(u)
+        return out
+
+    def _download_guessed(self, url: str, outp: str, referer: str) -> tuple[bool, str]:
+        # Угаданное расширение не подошло (404) — пробуем остальные
+        for ext in ORIGINAL_EXTS:
+            alt_url, alt_outp = with_ext(url, ext), with_ext(outp, ext)
+            if alt_url != url and self._download(alt_url, alt_outp, referer):
+                return True, alt_outp
+        return False, outp
+
+    def _resolve_loop(self):
+        while True:
+            illust_id = self.id_q.get()
+            if illust_id is None:
+                return
+            originals, ugoira = self._resolve(illust_id)
+            if not originals and not ugoira and self._rewarmed(illust_id):
+                originals, ugoira = self._resolve(illust_id)
+            with self._lock:
+                self.resolved += 1
+                n, total = self.resolved, self.total
+            ui_log(self.logw, f"[{n}/{total}] illust={illust_id}: страниц {len(originals)}"
+                              + (" + ugoira" if ugoira else ""))
+            if not originals and not ugoira:
+                with self._lock:
+                    self.no_originals.append(illust_id)
+                if self.state is not None:
+                    self.state.mark_failed(illust_id)
+                TRANSFER.work_done()
+                continue
+            existing = None
+            if self.state is not None:
+                self.state.expect(illust_id, [fname for _, fname in work_files(illust_id, originals, ugoira)])
+                existing = self.state.files
+            save_ugoira_frames(self.dest_dir, illust_id, ugoira, self.converter)
+            jobs = work_download_jobs(illust_id, originals, ugoira, self.dest_dir, self.logw, existing)
+            if not jobs:
+                TRANSFER.work_done()
+                continue
+            with self._lock:
+                self._left[illust_id] = len(jobs)
+            for job in jobs:
+                self.dl_q.put(job)  # воркеры скачивания не зависят от драйвера — блокироваться можно
+
+    def _download(self, url: str, outp: str, referer: str) -> bool:
+        try:
+            return download_binary(self.sess, url, outp, self.logw, referer=referer,
+                                   store=self.store, cache=self.cache)
+        except Exception as e:
+            ui_log(self.logw, f"[fail] {os.path.basename(outp)} -> {e}")
+            return False
+
+    def _download_loop(self):
+        while True:
+            job = self.dl_q.get()
+            if job is None:
+                return
+            illust_id = WarmupPolicy.key_from_referer(job[2])
+            ok = False
+            try:
+                ok = self._download_job(job, illust_id)
+            except Exception as e:
+                # Поток скачивания не должен умирать: иначе резолв навсегда встанет на полной dl_q
+                ui_log(self.logw, f"[fail] {os.path.basename(job[1])} -> {e}")
+            finally:
+                self._job_finished(illust_id, ok)
+
+    def _download_job(self, job: tuple[str, str, str], illust_id: str) -> bool:
+        url, outp, referer = job
+        guessed_name = os.path.basename(outp)
+        guessed = url in self.guessed
+        if guessed:
+            METRICS.inc("ext_guesses_total")
+            # Другая страница этой работы уже показала настоящее расширение, иначе — привычное автору
+            ext = self._work_ext.get(illust_id) or self._likely_ext()
+            if ext:
+                url, outp = with_ext(url, ext), with_ext(outp, ext)
+        ok = self._download(url, outp, referer)
+        if not ok and self._rewarmed(illust_id):
+            ok = self._download(url, outp, referer)
+        if not ok and guessed:
+            METRICS.inc("ext_guess_miss_total")
+            ok, outp = self._download_guessed(url, outp, referer)
+        if ok:
+            self._confirm_ext(illust_id, outp)
+        if ok and self.state is not None:
+            if os.path.basename(outp) != guessed_name:
+                self.state.replace_file(illust_id, guessed_name, os.path.basename(outp))
+            self.state.mark_done(illust_id, os.path.basename(outp))
+        if ok and self.converter is not None and outp.endswith(".ugoira.zip"):
+            # Кодирование — в пуле процессов, поток скачивания сразу свободен
+            self.converter.submit(outp)
+        return ok
+
+    def _likely_ext(self) -> str | None:
+        """
+        Преобладающее (больше половины) расширение оригиналов автора; None —
+        подтверждений меньше USER_EXT_MIN_SEEN или явного лидера нет.
+        """
+        with self._lock:
+            seen = sum(self._user_exts.values())
+            if seen < USER_EXT_MIN_SEEN:
+                return None
+            ext = max(self._user_exts, key=self._user_exts.get)
+            return ext if self._user_exts[ext] * 2 > seen else None
+
+    def _confirm_ext(self, illust_id: str, outp: str):
+        # Скачанный оригинал подтверждает расширение для остальных страниц работы и для автора
+        ext = outp.rsplit(".", 1)[-1]
+        if ext in ORIGINAL_EXTS:
+            with self._lock:
+                self._work_ext[illust_id] = ext
+                self._user_exts[ext] = self._user_exts.get(ext, 0) + 1
+
+    def _job_finished(self, illust_id: str, ok: bool):
+        with self._lock:
+            if ok:
+                self.files_ok += 1
+            else:
+                self.files_failed += 1
+            left = self._left.get(illust_id, 1) - 1
+            if left > 0:
+                self._left[illust_id] = left
+            else:
+                self._left.pop(illust_id, None)
+        if left <= 0:
+            TRANSFER.work_done()
+
+def discover_user_ids(driver, sess: requests.Session, user_id: str, meta: MetaCache | None, logw,
+                      top_ids: list[str] | None = None) -> list[str]:
+    """
+    Планировщик сбора ID: сначала дешёвый и полный AJAX /profile/all,
+    его полнота проверяется по /profile/top (свежие работы должны быть
+    в списке; уже полученный ответ передаётся в top_ids). Браузерные пагинация и скролл — только если AJAX не дал
+    результата или проверка не сошлась (или DISCOVERY_RUN_ALL). Если
+    браузера нет (--no-browser, Edge не запустился) — остаются ID из AJAX.
+    """
+    ids: set[str] = set()
+    stats = []
+
+    def run(name: str, strategy: str, fn, browser: bool = False):
+        t0 = time.monotonic()
+        try:
+            got = set(fn())
+        except Exception as e:
+            if not browser:
+                raise
+            ui_log(logw, f"[warn] {name}: браузер недоступен ({e}) — остаюсь с {len(ids)} id из AJAX")
+            return False
+        added = len(got - ids)
+        ids.update(got)
+        stats.append((name, time.monotonic() - t0, len(got), added))
+        METRICS.observe("stage_seconds", stats[-1][1], stage="discovery", strategy=strategy)
+        ui_log(logw, f"[i] {name}: {len(got)} id (+{added} новых) за {stats[-1][1]:.1f} с")
+        return True
+
+    complete = False
+    if USE_AJAX_ALL:
+        fetch_all = lambda: pixiv_fetch_user_all_illust_ids(sess, user_id, logw=logw)
+        hits0 = meta.hits if meta is not None else 0
+        run("AJAX /profile/all", "ajax_all", lambda: cached_ajax(meta, "profile_all", user_id, fetch_all))
+        if ids:
+            t0 = time.monotonic()
+            top = top_ids if top_ids is not None else pixiv_fetch_user_top_ids(sess, user_id)
+            missing = set(top or []) - ids
+            if missing and meta is not None and meta.hits > hits0:
+                # Список из кеша устарел (вышли новые работы) — перезапрашиваем мимо кеша
+                fresh = fetch_all()
+                meta.put("profile_all", user_id, fresh)
+                ids.update(fresh)
+                missing = set(top or []) - ids
+            complete = top is not None and not missing
+            stats.append(("проверка /profile/top", time.monotonic() - t0, len(top or []), 0))
+            METRICS.observe("stage_seconds", stats[-1][1], stage="discovery", strategy="profile_top")
+            if complete:
+                ui_log(logw, f"[i] /profile/top: {len(top)} свежих работ на месте — список полный")
+            elif top is None:
+                ui_log(logw, "[i] /profile/top не ответил — проверю браузером")
+            else:
+                ui_log(logw, f"[i] /profile/top: {len(missing)} работ нет в списке — добираю браузером")
+                ids.update(missing)
+
+    if (DISCOVERY_RUN_ALL or not complete) and driver is not None:
+        browser_ok = True
+        if USE_PAGE_PAGINATION:
+            def pages():
+                return pixiv_collect_ids_via_pages(driver, user_id, logw=logw)
+            browser_ok = run("пагинация ?p=N", "pages", lambda: browser_step(driver, pages), browser=True)
+        # Скролл видит ту же первую страницу — нужен, только если пагинация ничего не дала
+        if USE_SMART_SCROLL and browser_ok and (DISCOVERY_RUN_ALL or not ids):
+            def scroll():
+                driver.get(f"https://www.pixiv.net/users/{user_id}/artworks")
+                METRICS.sleep(1.0, "page_load")
+                return smart_infinite_scroll(driver, logw=logw)
+            run("скролл", "scroll", lambda: browser_step(driver, scroll), browser=True)
+    elif not complete:
+        ui_log(logw, f"[i] браузера нет — остаюсь с {len(ids)} id из AJAX")
+
+    ui_log(logw, "[i] Сбор ID по стратегиям: " + "; ".join(
+        f"{name} {dt:.1f} с, {n} id, +{added}" for name, dt, n, added in stats))
+    return sorted(ids, key=lambda x: int(x))
+
+def work_result(works: int = 0, files: int = 0, failed: int = 0, no_originals=()) -> dict:
+    return {"works": works, "files": files, "failed": failed, "no_originals": list(no_originals)}
+
+def merge_results(a: dict, b: dict) -> dict:
+    return work_result(a["works"] + b["works"], a["files"] + b["files"], a["failed"] + b["failed"],
+                       a["no_originals"] + b["no_originals"])
+
+def handle_pixiv_user(driver, sess: requests.Session, user_url: str, out_root: str, logw,
+                      warmup: WarmupPolicy | None = None, converter: UgoiraConverter | None = None) -> dict:
+    """Синхронизирует работы пользователя; итог — work_result()."""
+    user_id = pixiv_user_id_from_url(user_url)
+    if not user_id:
+        ui_log(logw, "[!] Не распознал user_id в URL.")
+        return work_result()
+
+    user_dir = os.path.join(out_root, "pixiv", user_id)
+    ensure_dir(user_dir)
+    state = None
+    top = None
+    if PIXIV_SYNC:
+        state = UserSyncState(user_dir, log=lambda m: ui_log(logw, m))
+        state.scan()
+        # Дешёвая проверка до сбора ID: свежие работы уже есть — синхронизировать нечего
+        top = pixiv_fetch_user_top_ids(sess, user_id)
+        if state.nothing_new(top or []):
+            ui_log(logw, f"[i] {user_id}: новых работ нет (известно {len(state.works)}, max id {state.max_id})")
+            return work_result()
+
+    ui_log(logw, f"[i] Сбор ID работ пользователя {user_id}…")
+    meta = meta_cache_for(out_root)
+    # Тот же ответ /profile/top служит и проверкой полноты — второй запрос не нужен
+    all_ids = discover_user_ids(driver, sess, user_id, meta, logw, top_ids=top)
+    ui_log(logw, f"[i] Итого уникальных работ: {len(all_ids)}")
+    if state is not None:
+        all_ids = state.pending(all_ids)
+        ui_log(logw, f"[i] Синхронизация: новых/недокачанных {len(all_ids)}, "
+                     f"готовых {state.complete_count()}")
+
+    # Метаданные пачками: одна пачка /profile/illusts вместо BATCH_SIZE запросов /pages
+    batch = pixiv_batch_resolve(sess, user_id, all_ids, meta, logw) if BATCH_RESOLVE and all_ids else {}
+
+    # Резолв и скачивание — в пулах конвейера; здесь только подача ID (и прогрев)
+    pipe = PixivPipeline(sess, user_dir, logw, store=cas_store_for(out_root),
+                         cache=http_cache_for(out_root), warmup=warmup, meta=meta, state=state,
+                         converter=converter, batch=batch).start()
+    try:
+        for illust_id in all_ids:
+            pipe.submit(illust_id)
+    finally:
+        result = pipe.close()
+        if state is not None:
+            state.save()
+    return result
+
+def handle_pixiv_art(driver, sess: requests.Session, art_url: str, out_root: str, logw,
+                     warmup: WarmupPolicy | None = None, converter: UgoiraConverter | None = None) -> dict:
+    """Скачивает одну работу; итог — work_result()."""
+    illust_id = pixiv_art_id_from_url(art_url)
+    if not illust_id:
+        ui_log(logw, "[!] Не распознал illust_id в URL.")
+        return work_result()
+
+    TRANSFER.add_works(1)
+    try:
+        return _download_art(sess, illust_id, out_root, logw, warmup, converter)
+    finally:
+        TRANSFER.work_done()
+
+def _download_art(sess: requests.Session, illust_id: str, out_root: str, logw,
+                  warmup: WarmupPolicy | None, converter: UgoiraConverter | None) -> dict:
+    base_dir = os.path.join(out_root, "pixiv")
+    ensure_dir(base_dir)
+    store = cas_store_for(out_root)
+    cache = http_cache_for(out_root)
+    meta = meta_cache_for(out_root)
+
+    # Прогрев вкладкой (по политике: обычно один раз за сессию)
+    if warmup is not None:
+        warmup.ensure(illust_id)
+
+    originals, ugoira = resolve_work(sess, illust_id, meta)
+    if not originals and not ugoira and warmup is not None and warmup.service():
+        originals, ugoira = resolve_work(sess, illust_id, meta)
+    if not originals and not ugoira:
+        ui_log(logw, "[!] Оригинальные URL не найдены.")
+        return work_result(1, no_originals=[illust_id])
+
+    save_ugoira_frames(base_dir, illust_id, ugoira, converter)
+    files = failed = 0
+    for u, outp, referer in work_download_jobs(illust_id, originals, ugoira, base_dir, logw):
+        ok = download_binary(sess, u, outp, logw, referer=referer, store=store, cache=cache)
+        if not ok and warmup is not None and warmup.service():
+            ok = download_binary(sess, u, outp, logw, referer=referer, store=store, cache=cache)
+        if ok and converter is not None and outp.endswith(".ugoira.zip"):
+            converter.submit(outp)
+        files, failed = files + ok, failed + (not ok)
+    return work_result(1, files, failed)
+
+class PixivRun:
+    """
+    Общее на пачку URL: сессия с куками браузера (один пул соединений на все
+    потоки), политика прогрева и пул конвертации ugoira.
+    """
+
+    def __init__(self, driver, logw, url_workers: int = 1):
+        self.logw = logw
+        cookies, from_disk = session_cookies(driver, logw)
+        self.sess = get_session_with_cookies(driver, PIXIV_REFERER_ROOT, cookies=cookies,
+                                             pool_size=url_workers * (RESOLVE_WORKERS + DOWNLOAD_WORKERS))
+        self.warmup = WarmupPolicy(driver, WARMUP_MODE, pool_size=WARMUP_TABS, base_url=PIXIV_REFERER_ROOT,
+                                   lock=BROWSER_LANE, log=lambda m: ui_log(logw, m))
+        self.warmup.attach(self.sess)
+        if from_disk:
+            # Сессия уже «прогрета» прошлым запуском — вкладка понадобится только после 403
+            self.warmup.session_warm = True
+        if isinstance(driver, LazyDriver):
+            driver.on_start = self._on_browser_start
+        RATE_LIMITER.log = lambda m: ui_log(logw, m)
+        self.converter = None
+        if GRAB_UGOIRA and UGOIRA_CONVERT:
+            if ugoira_convert.available():
+                self.converter = UgoiraConverter(UGOIRA_CONVERT, UGOIRA_WORKERS or None, log=lambda m: ui_log(logw, m))
+            else:
+                ui_log(logw, "[i] Pillow не установлен — ugoira остаются zip (+ .ugoira.json с задержками)")
+
+    def _on_browser_start(self, drv):
+        # Браузер всё-таки запустили — берём его свежие куки в сессию и на диск
+        try:
+            cookies = browser_cookies(drv)
+            apply_cookies(self.sess, cookies)
+            persist_cookies(cookies, self.logw)
+        except Exception as e:
+            ui_log(self.logw, f"[warn] куки браузера: {e}")
+
+    def close(self):
+        if self.converter is not None:
+            self.converter.close()
+        if self.warmup.warmed or self.warmup.skipped:
+            ui_log(self.logw, f"[i] {self.warmup.summary()}")
+        ui_log(self.logw, f"[i] {RATE_LIMITER.summary()}")
+
+def save_sidecars(out_root: str, logw):
+    store = cas_store_for(out_root)
+    if store is not None:
+        store.save()
+    cache = http_cache_for(out_root)
+    if cache is not None:
+        cache.save()
+        if cache.hits or cache.misses:
+            ui_log(logw, f"[i] {cache.summary()}")
+    meta = meta_cache_for(out_root)
+    if meta is not None:
+        meta.save()
+        if meta.hits or meta.misses:
+            ui_log(logw, f"[i] {meta.summary()}")
+
+def start_metrics(out_root: str, logw) -> MetricsReporter | None:
+    """Обнуляет метрики и запускает периодическую запись; в конце — reporter.stop()."""
+    if not METRICS_ENABLED:
+        return None
+    METRICS.reset()
+    return MetricsReporter(METRICS, os.path.join(out_root, ".metrics.json"),
+                           METRICS_PROM_FILE or os.path.join(out_root, ".metrics.prom"),
+                           interval=METRICS_REFRESH_S, log=lambda m: ui_log(logw, m)).start()
+
+def handle_pixiv(driver, url, out_root, logw, run: PixivRun | None = None) -> dict:
+    """Обрабатывает pixiv-URL; итог — work_result() (failed / no_originals — что не скачалось)."""
+    own = run is None
+    if own:
+        run = PixivRun(driver, logw)
+    try:
+        return _dispatch_pixiv(driver, run.sess, url, out_root, logw, run.warmup, run.converter)
+    finally:
+        if own:
+            run.close()
+        save_sidecars(out_root, logw)
+
+def _dispatch_pixiv(driver, sess: requests.Session, url, out_root, logw, warmup: WarmupPolicy | None = None,
+                    converter: UgoiraConverter | None = None) -> dict:
+    if pixiv_user_id_from_url(url):
+        return handle_pixiv_user(driver, sess, url, out_root, logw, warmup, converter)
+
+    if pixiv_art_id_from_url(url):
+        return handle_pixiv_art(driver, sess, url, out_root, logw, warmup, converter)
+
+    # Если непонятная pixiv-страница — попробуем вытащить /artworks/ со страницы
+    ids = set()
+    def page():
+        driver.get(url); METRICS.sleep(1.0, "page_load")
+        artwork_ids_from_hrefs(dom_extract.collect_links(driver, 'a[href*="/artworks/"]', incremental=False), ids)
+    browser_step(driver, page)
+    if not ids:
+        ui_log(logw, "[!] На странице не нашёл работ.")
+        return work_result()
+    # Пройдёмся по найденным id как по артам
+    result = work_result()
+    for illust_id in sorted(ids, key=lambda x: int(x)):
+        result = merge_results(result, handle_pixiv_art(driver, sess, f"https://www.pixiv.net/artworks/{illust_id}",
+                                                        out_root, logw, warmup, converter))
+    return result
+
+# ----------------- Orchestrator (Pixiv only) -----------------
+def process_single_url(driver, url, out_root, logw, run: PixivRun | None = None) -> dict:
+    host = (urlparse(url).hostname or "").lower()
+    if "pixiv.net" in host:
+        ui_log(logw, "[+] Сайт: pixiv");    return handle_pixiv(driver, url, out_root, logw, run)
+    else:
+        ui_log(logw, "[!] Это не Pixiv. Этот билд v7.5 сфокусирован только на Pixiv.")
+        return work_result()
@@ -0,0 +1,160 @@
+"""
+Состояние инкрементальной синхронизации пользователя Pixiv
+(downloads/pixiv/{user_id}/.sync_state.json).
+
+  max_id — наибольший ID работы, виденный в прошлых запусках
+  works  — illust_id → {"files": [ожидаемые имена], "done": [скачанные]}
+  stale  — работы, где verify_library.py нашёл битый файл: их надо
+           пройти заново, даже если свежих работ у автора нет
+  failed — работы, у которых в прошлый раз не нашлось оригиналов
+           (не отрезолвились): их тоже пробуем снова
+
+Работа «готова», когда все её ожидаемые файлы скачаны. Следующий запуск
+резолвит и качает только новые ID и недокачанные работы. Наличие файлов
+проверяется одним проходом os.scandir по папке пользователя вместо
+os.path.exists на каждую страницу.
+"""
+
+import json
+import os
+import threading
+
+STATE_NAME = ".sync_state.json"
+
+
+def scan_files(directory: str) -> set[str]:
+    """Имена всех файлов папки — один проход scandir."""
+    try:
+        with os.scandir(directory) as it:
+            return {e.name for e in it if e.is_file(follow_symlinks=False)}
+    except FileNotFoundError:
+        return set()
+
+
+class UserSyncState:
+    def __init__(self, directory: str, name: str = STATE_NAME, autosave_every: int = 50, log=print):
+        self.dir = directory
+        self.path = os.path.join(directory, name)
+        self.autosave_every = autosave_every
+        self.log = log
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.max_id = 0
+        self.works: dict[str, dict] = {}
+        self.stale: set[str] = set()
+        self.failed: set[str] = set()
+        self.files: set[str] = set()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.max_id = int(data.get("max_id") or 0)
+            self.works = dict(data.get("works") or {})
+            self.stale = set(data.get("stale") or ())
+            self.failed = set(data.get("failed") or ())
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            self.log(f"[warn] состояние синхронизации {self.path} не прочитано: {e}")
+
+    def save(self) -> None:
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        os.makedirs(self.dir, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "max_id": self.max_id, "works": self.works,
+                       "stale": sorted(self.stale), "failed": sorted(self.failed)}, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self._dirty = 0
+
+    def _touch_locked(self) -> None:
+        self._dirty += 1
+        if self.autosave_every and self._dirty >= self.autosave_every:
+            self._save_locked()
+
+    # ---------- что делать в этом запуске ----------
+    def scan(self) -> set[str]:
+        self.files = scan_files(self.dir)
+        return self.files
+
+    def has_file(self, name: str) -> bool:
+        return name in self.files
+
+    def is_complete(self, illust_id: str) -> bool:
+        w = self.works.get(illust_id)
+        if not w or not w.get("files") or illust_id in self.stale:
+            return False
+        # Файл удалили руками — работу надо докачать
+        return all(f in self.files for f in w["files"])
+
+    def pending(self, ids: list[str]) -> list[str]:
+        """ID, которые надо резолвить: новые и недокачанные."""
+        return [i for i in ids if not self.is_complete(i)]
+
+    def nothing_new(self, recent_ids: list[str]) -> bool:
+        """
+        Свежие работы (/profile/top) все известны и готовы, а старые
+        все докачаны (файлы на месте, нет stale/failed) — делать нечего.
+        """
+        if not recent_ids or not self.works or self.stale or self.failed:
+            return False
+        return (max(int(i) for i in recent_ids) <= self.max_id
+                and all(self.is_complete(i) for i in recent_ids)
+                and all(self.is_complete(i) for i in self.works))
+
+    # ---------- учёт ----------
+    def expect(self, illust_id: str, names: list[str]) -> None:
+        """Полный список файлов работы (после резолва); уже лежащие считаются скачанными."""
+        with self._lock:
+            w = self.works.setdefault(illust_id, {"files": [], "done": []})
+            w["files"] = sorted(set(names))
+            w["done"] = sorted(n for n in w["files"] if n in self.files or n in w["done"])
+            self.stale.discard(illust_id)
+            self.failed.discard(illust_id)
+            self.max_id = max(self.max_id, int(illust_id))
+            self._touch_locked()
+
+    def mark_done(self, illust_id: str, name: str) -> None:
+        with self._lock:
+            self.files.add(name)
+            w = self.works.setdefault(illust_id, {"files": [name], "done": []})
+            if name not in w["done"]:
+                w["done"].append(name)
+            self._touch_locked()
+
+    def replace_file(self, illust_id: str, old: str, new: str) -> None:
+        """Расширение оригинала угадали неверно — в ожидаемых файлах меняем имя."""
+        with self._lock:
+            w = self.works.get(illust_id)
+            if w:
+                w["files"] = sorted({new if f == old else f for f in w["files"]})
+                self._touch_locked()
+
+    def mark_failed(self, illust_id: str) -> None:
+        """Оригиналы работы не нашлись — следующий запуск пройдёт её заново."""
+        with self._lock:
+            self.failed.add(illust_id)
+            self.max_id = max(self.max_id, int(illust_id))
+            self._touch_locked()
+
+    def invalidate(self, illust_id: str, name: str) -> None:
+        """Файл работы битый (убран в карантин) — работу пройти заново."""
+        with self._lock:
+            self.files.discard(name)
+            w = self.works.get(illust_id)
+            if w and name in w["done"]:
+                w["done"].remove(name)
+            self.stale.add(illust_id)
+            self._touch_locked()
+
+    def file_owners(self) -> dict[str, str]:
+        """Имя файла → illust_id по ожидаемым файлам работ."""
+        return {f: illust_id for illust_id, w in self.works.items() for f in w.get("files", ())}
+
+    def complete_count(self) -> int:
+        return sum(1 for i in self.works if self.is_complete(i))
@@ -0,0 +1,180 @@
+"""
+Общий на процесс ограничитель темпа запросов по хостам.
+
+Каждый хост — свой token bucket. Темп подстраивается по AIMD:
+успешный ответ понемногу поднимает его (+increase), 429/5xx режет
+вдвое (не чаще раза в cooldown, чтобы пачка одновременных 429 не
+обрушила темп до минимума). Retry-After запрещает запросы к хосту
+до указанного момента. Если за window секунд пришло больше
+threshold «притормаживаний» — цепь размыкается: все потоки ждут
+open_s секунд (или дольше, если так сказал Retry-After).
+
+RateLimitedSession — requests.Session, у которой через лимитер
+проходит каждый запрос, поэтому ретрай-циклы вызывающего кода
+менять не нужно: их повторы тоже встают в общую очередь.
+"""
+
+import email.utils
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+
+from metrics import METRICS
+
+THROTTLE_CODES = (429, 500, 502, 503, 504)
+
+
+def parse_retry_after(value: str | None, cap: float = 300.0) -> float:
+    """Секунды из Retry-After (число или HTTP-дата); 0 — заголовка нет/не разобрался."""
+    if not value:
+        return 0.0
+    value = value.strip()
+    try:
+        return min(cap, max(0.0, float(value)))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return min(cap, max(0.0, when.timestamp() - time.time()))
+    except (TypeError, ValueError, OverflowError):
+        return 0.0
+
+
+class HostBucket:
+    def __init__(self, host: str, rate: float, min_rate: float, max_rate: float,
+                 burst: float, increase: float):
+        self.host = host
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.tokens = burst
+        self.stamp = time.monotonic()
+        self.not_before = 0.0      # Retry-After / разомкнутая цепь (monotonic)
+        self.last_cut = 0.0
+        self.throttles: deque[float] = deque()
+        self.ok = 0
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def reserve(self, now: float) -> float:
+        """Берёт жетон или возвращает, сколько ждать до следующей попытки."""
+        if now < self.not_before:
+            return self.not_before - now
+        self._refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, rate: float = 4.0, min_rate: float = 0.5, max_rate: float = 16.0,
+                 burst: float = 4.0, increase: float = 0.05, cooldown: float = 1.0,
+                 threshold: int = 5, window: float = 10.0, open_s: float = 30.0,
+                 report_every: int = 200, log=print):
+        self.defaults = dict(rate=rate, min_rate=min_rate, max_rate=max_rate,
+                             burst=burst, increase=increase)
+        self.cooldown = cooldown
+        self.threshold = threshold
+        self.window = window
+        self.open_s = open_s
+        self.report_every = report_every
+        self.log = log
+        self._lock = threading.Lock()
+        self._hosts: dict[str, HostBucket] = {}
+
+    def bucket(self, host: str) -> HostBucket:
+        with self._lock:
+            b = self._hosts.get(host)
+            if b is None:
+                b = self._hosts[host] = HostBucket(host, **self.defaults)
+            return b
+
+    def acquire(self, host: str) -> float:
+        """Блокирует, пока к хосту можно слать запрос; возвращает время ожидания."""
+        b = self.bucket(host)
+        waited = 0.0
+        while True:
+            with self._lock:
+                delay = b.reserve(time.monotonic())
+            if delay <= 0:
+                METRICS.slept(waited, "rate_limit")
+                return waited
+            time.sleep(min(delay, 1.0))
+            waited += min(delay, 1.0)
+
+    def feedback(self, host: str, status: int, retry_after: str | None = None) -> None:
+        b = self.bucket(host)
+        now = time.monotonic()
+        msg = None
+        with self._lock:
+            if status not in THROTTLE_CODES:
+                b.ok += 1
+                b.rate = min(b.max_rate, b.rate + b.increase)
+                if self.report_every and b.ok % self.report_every == 0:
+                    msg = f"[rate] {host}: {b.rate:.1f} запр/с, ok={b.ok}, притормаживаний={b.throttled}"
+            else:
+                METRICS.inc("throttles_total", host=host)
+                b.throttled += 1
+                pause = parse_retry_after(retry_after)
+                old = b.rate
+                if now - b.last_cut >= self.cooldown:
+                    b.rate = max(b.min_rate, b.rate / 2)
+                    b.last_cut = now
+                    b.tokens = min(b.tokens, 0.0)
+                b.throttles.append(now)
+                while b.throttles and now - b.throttles[0] > self.window:
+                    b.throttles.popleft()
+                if len(b.throttles) >= self.threshold:
+                    # Слишком много 429/5xx подряд — пауза для всех потоков
+                    pause = max(pause, self.open_s)
+                    b.throttles.clear()
+                    METRICS.inc("circuit_open_total", host=host)
+                    msg = (f"[rate] {host}: {self.threshold}+ ответов {status} за {self.window:.0f} с — "
+                           f"пауза {pause:.0f} с, темп {b.rate:.1f} запр/с")
+                else:
+                    msg = (f"[rate] {host}: HTTP {status}"
+                           + (f", Retry-After {pause:.0f} с" if pause else "")
+                           + f", темп {old:.1f}→{b.rate:.1f} запр/с")
+                if pause:
+                    b.not_before = max(b.not_before, now + pause)
+        if msg:
+            self.log(msg)
+
+    def summary(self) -> str:
+        with self._lock:
+            parts = [f"{b.host} {b.rate:.1f} запр/с (ok={b.ok}, притормаживаний={b.throttled})"
+                     for b in self._hosts.values()]
+        return "темп: " + ("; ".join(parts) if parts else "запросов не было")
+
+
+class RateLimitedSession(requests.Session):
+    """Session, каждый запрос которой проходит через общий RateLimiter."""
+
+    def __init__(self, limiter: RateLimiter):
+        super().__init__()
+        self.limiter = limiter
+
+    def request(self, method, url, *args, **kwargs):
+        host = (urlsplit(url).hostname or "").lower()
+        self.limiter.acquire(host)
+        # Сетевые ошибки/таймауты темп не трогают — их ретраит вызывающий код
+        t0 = time.monotonic()
+        try:
+            r = super().request(method, url, *args, **kwargs)
+        except requests.RequestException as e:
+            METRICS.inc("http_errors_total", host=host, error=type(e).__name__)
+            raise
+        # Для stream=True — время до заголовков ответа, тело качает вызывающий код
+        METRICS.observe("http_seconds", time.monotonic() - t0, host=host)
+        METRICS.inc("http_responses_total", host=host, code=r.status_code)
+        self.limiter.feedback(host, r.status_code, r.headers.get("Retry-After"))
+        return r
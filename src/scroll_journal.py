@@ -0,0 +1,80 @@
+"""
+Журнал скролла: периодические чекпоинты собранных URL и позиции страницы.
+
+Файл — JSONL (дописывается построчно, после падения Edge/сети можно
+прочитать всё, что успело записаться):
+  {"page": "<url страницы>", "ts": ...}                     — шапка
+  {"offset": <scrollY>, "urls": [...новые...], "ts": ...}   — чекпоинт
+Следующий запуск на той же странице загружает URL, проматывает ленту
+примерно до последней позиции и продолжает сбор оттуда.
+После нормального завершения журнал удаляется.
+"""
+
+import json
+import os
+import time
+
+
+def _norm_page(url: str) -> str:
+    return (url or "").split("#")[0].split("?")[0].rstrip("/")
+
+
+class ScrollJournal:
+    def __init__(self, path: str):
+        self.path = path
+        self.page = ""
+        self.urls: set[str] = set()
+        self.offset = 0
+        self.position = 0  # последняя известная позиция скролла (обновляет сборщик)
+        self._pending: list[str] = []
+
+    def load(self, page_url: str) -> bool:
+        """Читает журнал; True — есть что продолжать для этой страницы."""
+        self.urls, self.offset = set(), 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return False
+        for ln in lines:
+            try:
+                rec = json.loads(ln)
+            except ValueError:
+                # Последняя строка могла оборваться на падении — пропускаем
+                continue
+            if "page" in rec:
+                self.page = rec["page"]
+                continue
+            self.urls.update(rec.get("urls") or [])
+            self.offset = max(self.offset, int(rec.get("offset") or 0))
+        self.position = self.offset
+        if _norm_page(self.page) != _norm_page(page_url):
+            self.urls, self.offset, self.position = set(), 0, 0
+            return False
+        return bool(self.urls)
+
+    def begin(self, page_url: str) -> None:
+        """Начинает новый журнал (если продолжать нечего)."""
+        self.page = page_url
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"page": page_url, "ts": time.time()}) + "\n")
+
+    def add(self, url: str) -> None:
+        self._pending.append(url)
+
+    def checkpoint(self, offset: int | None = None) -> None:
+        offset = self.position if offset is None else offset
+        rec = {"offset": int(offset), "urls": self._pending, "ts": time.time()}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.offset = max(self.offset, int(offset))
+        self._pending = []
+
+    def finish(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,167 @@
+"""
+Адаптивная пауза между шагами скролла вместо фиксированного time.sleep.
+
+На странице ставится небольшой трекер: MutationObserver считает
+добавленные узлы, обёртки fetch/XHR — запросы «в полёте», а
+PerformanceObserver отмечает время последней сетевой активности.
+После scroll шаг заканчивается, как только появились новые узлы и сеть
+затихла на idle_ms; если ничего не приходит — ждём дольше (бэкофф),
+но не больше жёсткого потолка.
+"""
+
+import time
+
+_PROBE_JS = r"""
+const sel = arguments[0];
+let t = window.__adPace;
+if (!t) {
+    t = window.__adPace = {added: 0, inflight: 0, last: performance.now()};
+    const bump = () => { t.last = performance.now(); };
+    new MutationObserver((muts) => {
+        for (const m of muts) {
+            for (const n of m.addedNodes) {
+                if (n.nodeType !== 1) continue;
+                if (n.matches(sel)) t.added++;
+                if (n.querySelectorAll) t.added += n.querySelectorAll(sel).length;
+            }
+        }
+    }).observe(document.documentElement, {childList: true, subtree: true});
+    try {
+        new PerformanceObserver(bump).observe({type: "resource", buffered: false});
+    } catch (e) {}
+    const ofetch = window.fetch;
+    if (ofetch) {
+        window.fetch = function () {
+            t.inflight++; bump();
+            return ofetch.apply(this, arguments).finally(() => { t.inflight--; bump(); });
+        };
+    }
+    const osend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        t.inflight++; bump();
+        this.addEventListener("loadend", () => { t.inflight--; bump(); }, {once: true});
+        return osend.apply(this, arguments);
+    };
+}
+return [t.added, t.inflight, performance.now() - t.last, document.body ? document.body.scrollHeight : 0];
+"""
+
+
+class AdaptivePacer:
+    """
+    wait() вызывается сразу после scroll вместо time.sleep(pause).
+    Возвращает (сколько ждали, пришли ли новые узлы).
+    """
+
+    def __init__(self, driver, selector: str = "img",
+                 min_wait: float = 0.15, base_cap: float = 1.2, max_wait: float = 4.0,
+                 idle_ms: float = 350, poll: float = 0.1, backoff: float = 1.6):
+        self.driver = driver
+        self.selector = selector
+        self.min_wait = min_wait
+        self.base_cap = base_cap
+        self.max_wait = max_wait
+        self.idle_ms = idle_ms
+        self.poll = poll
+        self.backoff = backoff
+        self.cap = base_cap
+        self.total_waited = 0.0
+        self.steps = 0
+        self._last_added = None
+
+    def _probe(self):
+        try:
+            added, inflight, idle, height = self.driver.execute_script(_PROBE_JS, self.selector)
+            return int(added), int(inflight), float(idle), int(height)
+        except Exception:
+            return None
+
+    def start(self) -> None:
+        """Ставит трекер на текущую страницу (нужно повторять после driver.get)."""
+        st = self._probe()
+        self._last_added = st[0] if st else None
+
+    def wait(self) -> tuple[float, bool]:
+        t0 = time.monotonic()
+        if self._last_added is None:
+            self.start()
+        base = self._last_added or 0
+        arrived = False
+        time.sleep(self.min_wait)
+        while True:
+            elapsed = time.monotonic() - t0
+            st = self._probe()
+            if st is None:
+                # Трекер недоступен — ведём себя как фиксированная пауза
+                time.sleep(max(0.0, self.cap - elapsed))
+                break
+            added, inflight, idle, _ = st
+            arrived = added > base
+            if arrived and inflight == 0 and idle >= self.idle_ms:
+                break
+            if elapsed >= self.cap:
+                break
+            time.sleep(self.poll)
+        if st is not None:
+            self._last_added = st[0]
+        # Контент идёт — держим короткий потолок; тишина — растягиваем до max_wait
+        self.cap = self.base_cap if arrived else min(self.max_wait, self.cap * self.backoff)
+        waited = time.monotonic() - t0
+        self.total_waited += waited
+        self.steps += 1
+        return waited, arrived
+
+    def settle(self, timeout: float) -> float:
+        """
+        После driver.get: ждём, пока на странице появятся узлы selector
+        и сеть затихнет, но не дольше timeout.
+        """
+        t0 = time.monotonic()
+        self.start()
+        while True:
+            elapsed = time.monotonic() - t0
+            try:
+                cnt, inflight, idle = self.driver.execute_script(
+                    "const t = window.__adPace || {inflight: 0, last: 0};"
+                    "return [document.querySelectorAll(arguments[0]).length, t.inflight,"
+                    " performance.now() - t.last];", self.selector)
+            except Exception:
+                time.sleep(max(0.0, timeout - elapsed))
+                break
+            if cnt > 0 and inflight == 0 and idle >= self.idle_ms:
+                break
+            if elapsed >= timeout:
+                break
+            time.sleep(self.poll)
+        self._last_added = None
+        waited = time.monotonic() - t0
+        self.total_waited += waited
+        return waited
+
+
+class StableTracker:
+    """
+    Условие остановки «контент перестал расти», учитывающее время:
+    не меньше rounds шагов подряд без роста И не меньше seconds секунд
+    с последнего роста. С адаптивными (короткими) шагами одних раундов мало.
+    """
+
+    def __init__(self, rounds: int, seconds: float = 0.0):
+        self.rounds = rounds
+        self.seconds = seconds
+        self.stable = 0
+        self.last_growth = time.monotonic()
+
+    def update(self, grew: bool) -> bool:
+        """Возвращает True, когда пора остановиться."""
+        now = time.monotonic()
+        if grew:
+            self.stable = 0
+            self.last_growth = now
+            return False
+        self.stable += 1
+        return self.stable >= self.rounds and (now - self.last_growth) >= self.seconds
+
+    @property
+    def quiet_for(self) -> float:
+        return time.monotonic() - self.last_growth
@@ -0,0 +1,313 @@
+"""
+Локальная подмена сайтов для замеров без сети.
+
+Сейчас умеет:
+  /feed                  — страница с бесконечной лентой (как board Pinterest):
+                           при подскролле к низу JS тянет /api/feed?page=N
+  /feed?kind=pixiv       — то же, но ссылки <a href="/artworks/{id}"> (как профиль Pixiv)
+  /api/feed?page=N       — JSON со следующей пачкой картинок (с задержкой)
+  /i.pinimg.com/236x/... — маленькие «картинки» для <img>
+  /i.pinimg.com/originals/..., /736x/... — «оригиналы» размером file_size
+  /ajax/user/{uid}/profile/all, /profile/top, /profile/illusts?ids[]=…
+  /ajax/illust/{id}, /ajax/illust/{id}/pages  — AJAX Pixiv (works работ, ID от 1000)
+  /i.pximg.net/img-original/... — оригиналы Pixiv (без Referer — 403; у id%5==0 — .png)
+
+Для всех ответов — задержка latency ± jitter (картинки — img_latency),
+error_rate — доля случайных 429 (с Retry-After) и 503. Оригиналы отдаются
+с ETag/Last-Modified (If-None-Match → 304) и поддерживают Range (206)
+с If-Range.
+Счётчик запросов по типам — config.hits (для «запросов на работу»),
+последние запросы с заголовками — config.seen (для тестов).
+
+Запуск отдельно:  python src/standin_server.py --port 8765 --items 2000
+Замеры на нём — bench.py.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import Counter, deque
+from urllib.parse import parse_qs, urlsplit
+
+_FEED_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>stand-in feed</title>
+<style>body{margin:0;font:14px sans-serif} .pin{display:inline-block;width:236px;height:300px;margin:4px;background:#eee}
+.pin img{width:236px;height:300px;object-fit:cover}</style></head>
+<body><div id="grid"></div><div id="end" style="height:40px"></div>
+<script>
+let page = 0, loading = false, done = false;
+const kind = new URLSearchParams(location.search).get("kind") || "";
+const grid = document.getElementById("grid");
+async function more() {
+  if (loading || done) return;
+  loading = true;
+  try {
+    const r = await fetch("/api/feed?kind=" + kind + "&page=" + page);
+    const j = await r.json();
+    for (const it of j.items) {
+      const d = document.createElement(it.href ? "a" : "div"); d.className = "pin";
+      if (it.href) d.href = it.href;
+      const img = document.createElement("img");
+      img.src = it.src; img.srcset = it.srcset || ""; img.loading = "lazy";
+      d.appendChild(img); grid.appendChild(d);
+    }
+    page++; done = !j.more;
+  } finally { loading = false; }
+}
+window.addEventListener("scroll", () => {
+  if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 1200) more();
+});
+more();
+</script></body></html>
+"""
+
+# Однопиксельный GIF — тело для <img> ленты
+_PIXEL = bytes.fromhex("47494638396101000100800000ffffff00000021f90401000000002c00000000010001000002024401003b")
+
+
+def pin_hash(i: int) -> str:
+    return hashlib.md5(f"pin-{i}".encode()).hexdigest()
+
+
+def pixiv_pages(illust_id: int) -> int:
+    return illust_id % 3 + 1
+
+
+def pixiv_ext(illust_id: int) -> str:
+    # Часть оригиналов — png: угадывание расширения по превью должно промахиваться
+    return "png" if illust_id % 5 == 0 else "jpg"
+
+
+class StandinConfig:
+    def __init__(self, items: int = 1000, page_size: int = 25,
+                 latency: float = 0.25, jitter: float = 0.15,
+                 works: int | None = None, file_size: int = 64 * 1024,
+                 img_latency: float = 0.0, error_rate: float = 0.0, retry_after: float = 1.0,
+                 seed: int = 1):
+        self.items = items
+        self.page_size = page_size
+        self.latency = latency
+        self.jitter = jitter
+        self.works = items if works is None else works
+        self.file_size = file_size
+        self.img_latency = img_latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.payload = b"\xff\xd8\xff\xe0" + self.rng.randbytes(max(0, file_size - 4))
+        self.hits: Counter = Counter()
+        self.seen: deque = deque(maxlen=256)   # (path, {заголовок: значение})
+        self._lock = threading.Lock()
+
+    def hit(self, kind: str) -> None:
+        with self._lock:
+            self.hits[kind] += 1
+
+    def roll_error(self) -> int:
+        """0 — отвечать нормально, иначе код подсунутой ошибки (429/503)."""
+        if self.error_rate <= 0:
+            return 0
+        with self._lock:
+            x = self.rng.random()
+        if x >= self.error_rate:
+            return 0
+        return 429 if x < self.error_rate / 2 else 503
+
+    def reset_hits(self) -> Counter:
+        with self._lock:
+            old, self.hits = self.hits, Counter()
+        return old
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = StandinConfig()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code: int, body: bytes, ctype: str, extra: dict | None = None):
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _delay(self, base: float | None = None):
+        cfg = self.config
+        base = cfg.latency if base is None else base
+        if base > 0:
+            time.sleep(max(0.0, base + random.uniform(-cfg.jitter, cfg.jitter)))
+
+    def _json(self, body) -> None:
+        self._send(200, json.dumps(body).encode(), "application/json")
+
+    def _fault(self, kind: str) -> bool:
+        """Подсунуть 429/503 вместо ответа; True — ответ уже отправлен."""
+        code = self.config.roll_error()
+        if not code:
+            return False
+        self.config.hit(f"{kind}:{code}")
+        extra = {"Retry-After": f"{self.config.retry_after:g}"} if code == 429 else None
+        self._send(code, b"slow down", "text/plain", extra)
+        return True
+
+    def do_GET(self):
+        self.config.seen.append((self.path, dict(self.headers.items())))
+        sp = urlsplit(self.path)
+        q = parse_qs(sp.query)
+        if sp.path == "/feed":
+            return self._send(200, _FEED_HTML.encode(), "text/html; charset=utf-8")
+        if sp.path == "/api/feed":
+            self.config.hit("feed")
+            return self._api_feed(int((q.get("page") or ["0"])[0]), (q.get("kind") or [""])[0])
+        if sp.path.startswith("/i.pinimg.com/"):
+            if "/236x/" in sp.path:
+                return self._send(200, _PIXEL, "image/gif")
+            return self._original("pinimg", "image/jpeg")
+        if sp.path.startswith("/ajax/"):
+            return self._ajax(sp.path, q)
+        if sp.path.startswith("/i.pximg.net/"):
+            if "/img-original/" not in sp.path:
+                return self._send(200, _PIXEL, "image/gif")
+            if "pixiv" not in (self.headers.get("Referer") or ""):
+                return self._send(403, b"forbidden", "text/html")
+            name = sp.path.rsplit("/", 1)[1]
+            iid, _, rest = name.partition("_p")
+            page, _, ext = rest.partition(".")
+            if (not iid.isdigit() or not (1000 <= int(iid) < 1000 + self.config.works)
+                    or ext != pixiv_ext(int(iid)) or int(page or 99) >= pixiv_pages(int(iid))):
+                self.config.hit("pximg:404")
+                return self._send(404, b"not found", "text/html")
+            return self._original("pximg", f"image/{'jpeg' if ext == 'jpg' else ext}")
+        self._send(404, b"not found", "text/plain")
+
+    do_HEAD = do_GET
+
+    def _api_feed(self, page: int, kind: str = ""):
+        cfg = self.config
+        self._delay()
+        start = page * cfg.page_size
+        items = []
+        host = f"http://{self.headers.get('Host')}"
+        for i in range(start, min(cfg.items, start + cfg.page_size)):
+            h = pin_hash(i)
+            path = f"{h[:2]}/{h[2:4]}/{h[4:6]}/{h}.jpg"
+            if kind == "pixiv":
+                items.append({"href": f"{host}/artworks/{1000 + i}", "src": f"{host}/i.pximg.net/c/250x250/{i}.jpg"})
+                continue
+            items.append({
+                "src": f"{host}/i.pinimg.com/236x/{path}",
+                "srcset": f"{host}/i.pinimg.com/236x/{path} 236w, {host}/i.pinimg.com/736x/{path} 736w",
+            })
+        body = json.dumps({"items": items, "more": start + cfg.page_size < cfg.items}).encode()
+        self._send(200, body, "application/json")
+
+    # ---------- «оригиналы»: ETag / Range ----------
+    def _original(self, kind: str, ctype: str):
+        cfg = self.config
+        self._delay(cfg.img_latency)
+        if self._fault(kind):
+            return
+        etag = '"' + hashlib.md5(self.path.split("?")[0].encode()).hexdigest()[:16] + '"'
+        common = {"ETag": etag, "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT", "Accept-Ranges": "bytes"}
+        if self.headers.get("If-None-Match") == etag:
+            cfg.hit(f"{kind}:304")
+            return self._send(304, b"", ctype, common)
+        body = cfg.payload
+        rng = self.headers.get("Range") or ""
+        if_range = self.headers.get("If-Range")
+        if if_range and if_range not in (etag, common["Last-Modified"]):
+            rng = ""    # ресурс не тот, с которого начинали — отдаём целиком
+        if rng.startswith("bytes="):
+            start = int(rng[6:].split("-")[0] or 0)
+            if start >= len(body):
+                cfg.hit(f"{kind}:416")
+                return self._send(416, b"", ctype, {"Content-Range": f"bytes */{len(body)}"})
+            cfg.hit(f"{kind}:206")
+            return self._send(206, body[start:], ctype,
+                              {**common, "Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"})
+        cfg.hit(kind)
+        self._send(200, body, ctype, common)
+
+    # ---------- AJAX Pixiv ----------
+    def _ajax(self, path: str, q: dict):
+        cfg = self.config
+        parts = path.strip("/").split("/")      # ajax, user|illust, id, ...
+        kind = "ajax:" + "/".join(p for p in parts[1:] if not p.isdigit())
+        self._delay()
+        if self._fault(kind):
+            return
+        cfg.hit(kind)
+        host = f"http://{self.headers.get('Host')}/i.pximg.net"
+        stamp = "2024/01/02/03/04/05"
+        ids = range(1000, 1000 + cfg.works)
+        if parts[1] == "user" and parts[-1] == "all":
+            return self._json({"error": False, "body": {"illusts": {str(i): None for i in ids}, "manga": {}}})
+        if parts[1] == "user" and parts[-1] == "top":
+            return self._json({"error": False, "body": {"illusts": {str(i): {} for i in list(ids)[-12:]}}})
+        if parts[1] == "user" and parts[-1] == "illusts":
+            works = {}
+            for s in q.get("ids[]") or []:
+                if s.isdigit() and int(s) in ids:
+                    works[s] = {"id": s, "illustType": 0, "pageCount": pixiv_pages(int(s)),
+                                "url": f"{host}/c/250x250_80_a2/img-master/img/{stamp}/{s}_p0_square1200.jpg"}
+            return self._json({"error": False, "body": {"works": works}})
+        if parts[1] == "illust" and parts[2].isdigit() and int(parts[2]) in ids:
+            iid = int(parts[2])
+            orig = f"{host}/img-original/img/{stamp}/{iid}_p{{p}}.{pixiv_ext(iid)}"
+            if parts[-1] == "pages":
+                return self._json({"error": False, "body": [{"urls": {"original": orig.format(p=p)}}
+                                                            for p in range(pixiv_pages(iid))]})
+            return self._json({"error": False, "body": {"illustType": 0, "pageCount": pixiv_pages(iid),
+                                                        "urls": {"original": orig.format(p=0)}}})
+        self._send(404, json.dumps({"error": True, "body": []}).encode(), "application/json")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Клиент закрыл keep-alive соединение (конец замера) — это не ошибка стенда
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_server(config: StandinConfig | None = None, port: int = 0):
+    """Запускает сервер в фоне; возвращает (server, base_url)."""
+    handler = type("Handler", (StandinHandler,), {"config": config or StandinConfig()})
+    srv = _Server(("127.0.0.1", port), handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Локальная подмена Pinterest/Pixiv для замеров")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--items", type=int, default=1000)
+    ap.add_argument("--latency", type=float, default=0.25)
+    ap.add_argument("--file-kb", type=int, default=64, help="размер «оригинала», КБ")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 429/503")
+    args = ap.parse_args()
+    srv, base = start_server(StandinConfig(items=args.items, latency=args.latency,
+                                           file_size=args.file_kb * 1024, error_rate=args.error_rate),
+                             args.port)
+    print(f"stand-in: {base}/feed, {base}/feed?kind=pixiv, AJAX Pixiv: PIXIV_API_ROOT={base}  (Ctrl+C — выход)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
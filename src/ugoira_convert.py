@@ -0,0 +1,147 @@
+"""
+Конвертация ugoira (zip с кадрами + задержки из ugoira_meta) в
+анимированный WebP / GIF / APNG.
+
+Кадры читаются прямо из zip, отображённого в память (mmap), без
+распаковки на диск. Кодирование — CPU-задача, поэтому идёт в пуле
+процессов: сеть не ждёт, все ядра заняты. Pillow — необязательная
+зависимость: без неё zip и .ugoira.json с задержками просто остаются
+как есть.
+"""
+
+import io
+import json
+import mmap
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow не установлен — конвертация выключается
+    Image = None
+
+FORMATS = {"webp": ".webp", "gif": ".gif", "apng": ".png"}
+
+
+class _Mapped(mmap.mmap):
+    # zipfile спрашивает seekable(), у mmap он появился только в 3.13
+    def seekable(self) -> bool:
+        return True
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def frames_path(zip_path: str) -> str:
+    """{id}.ugoira.zip → {id}.ugoira.json (рядом, с задержками кадров)."""
+    return zip_path[:-len(".zip")] + ".json" if zip_path.endswith(".zip") else zip_path + ".json"
+
+
+def output_path(zip_path: str, fmt: str) -> str:
+    base = zip_path[:-len(".ugoira.zip")] if zip_path.endswith(".ugoira.zip") else os.path.splitext(zip_path)[0]
+    return base + FORMATS[fmt]
+
+
+def save_frames(zip_path: str, frames: list[dict]) -> str:
+    """Сохраняет [{"file", "delay"}] рядом с zip — данные о задержках не теряются."""
+    path = frames_path(zip_path)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"frames": frames}, f, separators=(",", ":"))
+    os.replace(tmp, path)
+    return path
+
+
+def load_frames(zip_path: str) -> list[dict] | None:
+    try:
+        with open(frames_path(zip_path), "r", encoding="utf-8") as f:
+            return list(json.load(f).get("frames") or [])
+    except (OSError, ValueError):
+        return None
+
+
+def convert(zip_path: str, frames: list[dict], fmt: str = "webp", out_path: str | None = None) -> tuple[str, int, float]:
+    """
+    Кодирует анимацию; возвращает (путь, кадров, секунд).
+    Выполняется в дочернем процессе — только picklable аргументы.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow не установлен")
+    t0 = time.monotonic()
+    out_path = out_path or output_path(zip_path, fmt)
+    with open(zip_path, "rb") as f, _Mapped(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with zipfile.ZipFile(mm) as zf:
+            names = [fr["file"] for fr in frames] if frames else sorted(zf.namelist())
+            delays = [int(fr.get("delay") or 100) for fr in frames] if frames else [100] * len(names)
+            images = []
+            for name in names:
+                im = Image.open(io.BytesIO(zf.read(name)))
+                im.load()
+                images.append(im.convert("RGBA") if fmt != "gif" else im.convert("RGB"))
+    if not images:
+        raise ValueError("в zip нет кадров")
+    tmp = out_path + ".part"
+    opts = dict(save_all=True, append_images=images[1:], duration=delays, loop=0)
+    if fmt == "webp":
+        images[0].save(tmp, format="WEBP", quality=90, method=4, **opts)
+    elif fmt == "gif":
+        images[0].save(tmp, format="GIF", optimize=False, disposal=2, **opts)
+    else:
+        images[0].save(tmp, format="PNG", **opts)
+    os.replace(tmp, out_path)
+    return out_path, len(images), time.monotonic() - t0
+
+
+class UgoiraConverter:
+    """Пул процессов для конвертации; submit() не блокирует сетевые потоки."""
+
+    def __init__(self, fmt: str = "webp", workers: int | None = None, log=print):
+        self.fmt = fmt
+        self.workers = workers or os.cpu_count() or 2
+        self.log = log
+        self._lock = threading.Lock()  # submit() зовут потоки резолва и скачивания, колбэки — поток пула
+        self._pool: ProcessPoolExecutor | None = None
+        self._futures = []
+        self.done = 0
+        self.failed = 0
+
+    def submit(self, zip_path: str, frames: list[dict] | None = None) -> bool:
+        if not available():
+            return False
+        out = output_path(zip_path, self.fmt)
+        if os.path.exists(out):
+            return False
+        frames = frames if frames is not None else (load_frames(zip_path) or [])
+        with self._lock:
+            if self._pool is None:
+                # Процессы поднимаем только когда действительно есть что кодировать
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            fut = self._pool.submit(convert, zip_path, frames, self.fmt, out)
+            self._futures.append(fut)
+        fut.add_done_callback(self._on_done)
+        return True
+
+    def _on_done(self, fut) -> None:
+        try:
+            path, n, dt = fut.result()
+            with self._lock:
+                self.done += 1
+            self.log(f"[ugoira] {os.path.basename(path)}: {n} кадров за {dt:.1f} с")
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            self.log(f"[ugoira] ошибка конвертации: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+            futures, self._futures = self._futures, []
+        if pool is not None:
+            # Без блокировки: колбэки завершившихся задач сами её берут
+            pool.shutdown(wait=True)
+        if futures:
+            self.log(f"[ugoira] сконвертировано {self.done}, ошибок {self.failed} ({self.fmt}, процессов {self.workers})")
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Проверка папки загрузок: обрезанные и битые файлы.
+
+Загрузчики не смотрят внутрь сохранённого, а проверки «файл уже есть»
+навсегда считают обрезанный файл скачанным. Здесь каждый файл
+отображается в память (mmap) и проверяется по структуре — читаются
+только начало и конец (у zip — ещё центральный каталог), а не весь файл:
+
+  JPEG — SOI в начале и EOI последними байтами
+  PNG  — сигнатура, IHDR и чанк IEND последним
+  WebP — RIFF/WEBP и длина из заголовка RIFF против размера файла
+  GIF  — заголовок и завершающий ';'
+  ZIP  — (ugoira) конец центрального каталога, его записи и локальные
+         заголовки в пределах файла
+
+Сигнатура сверяется с расширением: HTML-страница ошибки под именем .jpg —
+тоже битый файл. Блобы CAS-хранилища (.cas/objects, без расширения)
+проверяются по сигнатуре — битый блоб иначе раздаётся ссылками дальше.
+
+Обход каталогов — в главном процессе, проверки — пачками в пуле
+процессов на все ядра. Итог — {root}/.verify.json. С --fix битые файлы
+уходят в карантин (*.corrupt, или удаляются с --delete) и ставятся на
+перекачку: в .sync_state.json папки Pixiv работа помечается stale,
+в manifest.json Pinterest пин — failed. Код выхода 1, если нашлись битые.
+
+  python verify_library.py downloads
+  python verify_library.py downloads --fix
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# ===================== НАСТРОЙКИ =====================
+DOWNLOAD_ROOT  = "downloads"
+VERIFY_WORKERS = 0       # процессов; 0 — по числу ядер
+CHUNK_FILES    = 512     # файлов в одном задании пулу (меньше — больше накладных на IPC)
+REPORT_NAME    = ".verify.json"
+QUARANTINE_EXT = ".corrupt"
+PROGRESS_EVERY = 50000   # файлов между строками прогресса
+# =====================================================
+
+KINDS = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png", ".webp": "webp", ".gif": "gif", ".zip": "zip"}
+CAS_DIR = ".cas"
+PIXIV_STATE = ".sync_state.json"
+PIN_MANIFEST = "manifest.json"
+
+PNG_SIG = b"\x89PNG\r\n\x1a\n"
+PNG_IEND = b"IEND\xaeB`\x82"  # пустой чанк IEND с его CRC
+TAIL = 64        # сколько байт с конца смотреть на маркер конца (после нулевого хвоста)
+ZIP_EOCD_MAX = 22 + 65535
+
+
+def sniff(mm) -> str | None:
+    head = mm[:16]
+    if head[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if head[:8] == PNG_SIG:
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] in (b"PK\x03\x04", b"PK\x05\x06"):
+        return "zip"
+    if head.lstrip()[:1] == b"<":
+        return "html"
+    return None
+
+
+def _tail(mm) -> bytes:
+    """Последние TAIL байт до нулевого хвоста (некоторые сохранения добиты нулями после маркера конца)."""
+    end = len(mm)
+    while end > 0:
+        start = max(0, end - TAIL)
+        window = mm[start:end].rstrip(b"\x00")
+        if window:
+            end = start + len(window)
+            return mm[max(0, end - TAIL):end]
+        end = start
+    return b""
+
+
+def check_jpeg(mm) -> str | None:
+    # Именно в конце: FF D9 встречается и внутри (в превью EXIF), обрезанный файл с ним — всё равно битый
+    return None if _tail(mm).endswith(b"\xff\xd9") else "нет EOI — файл обрезан"
+
+
+def check_png(mm) -> str | None:
+    if mm[12:16] != b"IHDR":
+        return "нет IHDR"
+    return None if _tail(mm).endswith(PNG_IEND) else "нет IEND — файл обрезан"
+
+
+def check_webp(mm) -> str | None:
+    n = len(mm)
+    if n < 16:
+        return "короче заголовка"
+    need = struct.unpack_from("<I", mm, 4)[0] + 8
+    if n < need:
+        return f"обрезан: {n} из {need} байт"
+    if mm[12:15] != b"VP8":
+        return "нет чанка VP8/VP8L/VP8X"
+    return None
+
+
+def check_gif(mm) -> str | None:
+    return None if _tail(mm).endswith(b";") else "нет завершающего ';' — файл обрезан"
+
+
+def check_zip(mm) -> str | None:
+    n = len(mm)
+    eocd = mm.rfind(b"PK\x05\x06", max(0, n - ZIP_EOCD_MAX))
+    if eocd < 0 or eocd + 22 > n:
+        return "нет конца центрального каталога — архив обрезан"
+    entries, cd_size, cd_off = struct.unpack_from("<HLL", mm, eocd + 10)
+    if entries == 0:
+        return "пустой архив"
+    if cd_off == 0xFFFFFFFF:
+        return None  # ZIP64 — у ugoira не бывает, глубже не проверяем
+    if cd_off + cd_size > eocd:
+        return "центральный каталог за пределами файла"
+    p = cd_off
+    for _ in range(entries):
+        if p + 46 > eocd or mm[p:p + 4] != b"PK\x01\x02":
+            return "повреждён центральный каталог"
+        comp, _, name_len, extra_len, comment_len = struct.unpack_from("<LLHHH", mm, p + 20)
+        local = struct.unpack_from("<L", mm, p + 42)[0]
+        if local + 30 + comp > cd_off or mm[local:local + 4] != b"PK\x03\x04":
+            return "запись архива за пределами данных"
+        p += 46 + name_len + extra_len + comment_len
+    return None
+
+
+CHECKS = {"jpeg": check_jpeg, "png": check_png, "webp": check_webp, "gif": check_gif, "zip": check_zip}
+
+
+def check_file(path: str) -> tuple[str, str | None]:
+    """("ok" / "bad" / "warn", причина) для одного файла."""
+    expected = KINDS.get(os.path.splitext(path)[1].lower())
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return "bad", "пустой файл"
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                kind = sniff(mm)
+                if kind == "html":
+                    return "bad", "HTML-страница вместо файла"
+                if kind is None:
+                    return "bad", f"неизвестная сигнатура {mm[:8].hex()}"
+                reason = CHECKS[kind](mm)
+    except (OSError, ValueError) as e:
+        return "bad", f"не читается: {e}"
+    if reason:
+        return "bad", reason
+    if expected and expected != kind:
+        # Целый файл, но расширение не то — смотрелке может не понравиться
+        return "warn", f"внутри {kind}"
+    return "ok", None
+
+
+def check_many(paths: list[str]) -> tuple[int, list[tuple[str, str, str]]]:
+    """Пачка для процесса пула: назад идут только число файлов и проблемы."""
+    problems = []
+    for p in paths:
+        status, reason = check_file(p)
+        if status != "ok":
+            problems.append((status, p, reason))
+    return len(paths), problems
+
+
+def walk(root: str):
+    """Файлы для проверки: картинки и zip, плюс блобы .cas; сайдкары и .part — мимо."""
+    stack = [(root, False)]
+    while stack:
+        d, in_cas = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError as e:
+            print(f"[warn] {d}: {e}")
+            continue
+        with it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    if not e.name.startswith("."):
+                        stack.append((e.path, in_cas))
+                    elif e.name == CAS_DIR:
+                        stack.append((os.path.join(e.path, "objects"), True))
+                elif e.is_file(follow_symlinks=False) and not e.name.startswith("."):
+                    ext = os.path.splitext(e.name)[1].lower()
+                    if ext in KINDS or (in_cas and not ext):
+                        yield e.path
+
+
+def chunks(it, size: int):
+    batch = []
+    for x in it:
+        batch.append(x)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def verify(root: str, workers: int = VERIFY_WORKERS, log=print) -> dict:
+    t0 = time.time()
+    checked, bad, warn = 0, [], []
+    next_progress = PROGRESS_EVERY
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as ex:
+        for n, problems in ex.map(check_many, chunks(walk(root), CHUNK_FILES)):
+            checked += n
+            for status, path, reason in problems:
+                (bad if status == "bad" else warn).append({"path": path, "reason": reason})
+                if status == "bad":
+                    log(f"[bad] {path}: {reason}")
+            if checked >= next_progress:
+                log(f"[i] проверено {checked} файлов ({checked / max(time.time() - t0, 1e-6):.0f}/с), битых {len(bad)}")
+                next_progress += PROGRESS_EVERY
+    return {"root": os.path.abspath(root), "started": t0, "seconds": round(time.time() - t0, 2),
+            "files": checked, "bad": bad, "warnings": warn}
+
+
+# ----------------- карантин и перекачка -----------------
+_UGOIRA_OUT = re.compile(r"^(\d+)\.(webp|gif|png)$")
+
+
+def quarantine(path: str, delete: bool) -> None:
+    if delete:
+        os.remove(path)
+    else:
+        os.replace(path, path + QUARANTINE_EXT)
+
+
+def requeue_pixiv(directory: str, names: list[str], log) -> int:
+    from pixiv_sync import UserSyncState
+    state = UserSyncState(directory, log=log)
+    owners = state.file_owners()
+    n = 0
+    for name in names:
+        illust_id = owners.get(name)
+        if illust_id is None:
+            m = _UGOIRA_OUT.match(name)
+            # Битая анимация из ugoira: zip цел, работу надо только пройти — конвертер соберёт заново
+            illust_id = m.group(1) if m and f"{m.group(1)}.ugoira.zip" in owners else None
+        if illust_id is None:
+            continue
+        state.invalidate(illust_id, name)
+        n += 1
+    state.save()
+    return n
+
+
+def requeue_pinterest(directory: str, names: list[str]) -> int:
+    from manifest import Manifest, STATUS_FAILED
+    manifest = Manifest(os.path.join(directory, PIN_MANIFEST))
+    by_file = {e.get("file"): k for k, e in manifest.entries.items() if e.get("file")}
+    n = 0
+    for name in names:
+        key = by_file.get(name)
+        if key is not None:
+            manifest.record(key, "", status=STATUS_FAILED)
+            n += 1
+    manifest.save()
+    return n
+
+
+def fix(bad: list[dict], delete: bool = False, log=print) -> dict:
+    """Карантин битых файлов и отметки в сайдкарах, чтобы следующий запуск их перекачал."""
+    by_dir: dict[str, list[str]] = {}
+    moved = 0
+    for item in bad:
+        try:
+            quarantine(item["path"], delete)
+            moved += 1
+        except OSError as e:
+            log(f"[warn] {item['path']}: {e}")
+            continue
+        by_dir.setdefault(os.path.dirname(item["path"]), []).append(os.path.basename(item["path"]))
+    requeued = 0
+    for d, names in by_dir.items():
+        if os.path.exists(os.path.join(d, PIXIV_STATE)):
+            requeued += requeue_pixiv(d, names, log)
+        elif os.path.exists(os.path.join(d, PIN_MANIFEST)):
+            requeued += requeue_pinterest(d, names)
+    # Без сайдкаров (и для блобов CAS) перекачку запустит сама пропажа файла
+    return {"quarantined": moved, "requeued": requeued}
+
+
+def write_report(path: str, report: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Проверка скачанных файлов на обрезанные и битые")
+    ap.add_argument("root", nargs="?", default=DOWNLOAD_ROOT, help="папка загрузок")
+    ap.add_argument("-j", "--jobs", type=int, default=VERIFY_WORKERS, help="процессов (0 — по числу ядер)")
+    ap.add_argument("--fix", action="store_true", help="битые — в карантин и на перекачку")
+    ap.add_argument("--delete", action="store_true", help="с --fix: удалять, а не переименовывать в *.corrupt")
+    ap.add_argument("--report", help=f"куда писать отчёт (по умолчанию {{root}}/{REPORT_NAME})")
+    args = ap.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(f"нет папки {args.root}", file=sys.stderr)
+        return 2
+    report = verify(args.root, args.jobs)
+    print(f"[i] проверено {report['files']} файлов за {report['seconds']:.1f} с: "
+          f"битых {len(report['bad'])}, с чужим расширением {len(report['warnings'])}")
+    if args.fix and report["bad"]:
+        report["fix"] = fix(report["bad"], args.delete)
+        print(f"[i] в карантине {report['fix']['quarantined']}, "
+              f"поставлено на перекачку по сайдкарам {report['fix']['requeued']}")
+    write_report(args.report or os.path.join(args.root, REPORT_NAME), report)
+    return 1 if report["bad"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Прогрев браузером: открыть страницу работы во вкладке, чтобы сайт
+выставил куки/проверки, без которых AJAX и картинки отвечают 403.
+
+Раньше вкладка открывалась перед КАЖДОЙ работой (0.6–0.9 с + загрузка).
+Теперь режимы:
+  "session" — один прогрев на сессию, дальше только по сигналу: хук
+              requests видит 403 или HTML вместо картинки и ставит работу
+              в очередь на повторный прогрев;
+  "always"  — старое поведение, перед каждой работой;
+  "off"     — без прогрева.
+Накопившиеся прогревы открываются пачкой вкладок (window.open) и
+грузятся одновременно. Драйвер однопоточный: ensure()/service()
+вызываются из потоков, которые работают с драйвером (при общем
+драйвере — под переданным lock); request() и wait() — из любых.
+"""
+
+import contextlib
+import re
+import threading
+import time
+
+from metrics import METRICS
+
+MODES = ("session", "always", "off")
+
+
+class WarmupPolicy:
+    def __init__(self, driver, mode: str = "session", pool_size: int = 3,
+                 settle: float = 0.8, base_url: str = "https://www.pixiv.net/",
+                 hosts: tuple[str, ...] = ("pixiv.net", "pximg.net"), lock=None, log=print):
+        self.driver = driver
+        self.lock = lock or contextlib.nullcontext()
+        self.mode = mode if mode in MODES else "session"
+        self.pool_size = max(1, pool_size)
+        self.settle = settle
+        self.base_url = base_url
+        self.hosts = hosts
+        self.log = log
+        self._lock = threading.Lock()
+        self._pending: list[str] = []
+        self._events: dict[str, threading.Event] = {}  # ключ → «повторный прогрев выполнен»
+        self.session_warm = False
+        self.warmed = 0
+        self.rewarms = 0
+        self.skipped = 0
+        self.spent = 0.0
+
+    # ---------- куда идём греться ----------
+    def url_for(self, key: str) -> str:
+        return f"https://www.pixiv.net/artworks/{key}" if key else self.base_url
+
+    @staticmethod
+    def key_from_referer(referer: str | None) -> str:
+        m = re.search(r"/artworks/(\d+)", referer or "")
+        return m.group(1) if m else ""
+
+    # ---------- сигналы от HTTP ----------
+    def attach(self, sess) -> None:
+        """Вешает хук на все ответы сессии: 403 / HTML вместо картинки → нужен прогрев."""
+        if self.mode != "off":
+            sess.hooks.setdefault("response", []).append(self._on_response)
+
+    def _on_response(self, r, *args, **kwargs):
+        url = r.url or ""
+        host = url.split("/")[2] if url.count("/") >= 2 else ""
+        if not any(h in host for h in self.hosts):
+            return r
+        ctype = r.headers.get("Content-Type", "")
+        blocked = r.status_code == 403 or (
+            "pximg.net" in host and r.ok and ctype.startswith("text/html"))
+        if blocked:
+            self.request(self.key_from_referer(r.request.headers.get("Referer")))
+        return r
+
+    def request(self, key: str) -> threading.Event | None:
+        """Ставит ключ в очередь на прогрев; None — уже грели повторно, второй раз не поможет."""
+        with self._lock:
+            ev = self._events.get(key)
+            if ev is not None:
+                return None if ev.is_set() else ev
+            ev = self._events[key] = threading.Event()
+            self._pending.append(key)
+            return ev
+
+    def reset(self) -> None:
+        """Новый запуск на той же политике: выполненные повторные прогревы снова можно запросить."""
+        with self._lock:
+            self._events = {k: ev for k, ev in self._events.items() if not ev.is_set()}
+
+    def wait(self, key: str, timeout: float) -> bool:
+        """Из рабочего потока: True, если по ключу был запрошен и выполнен прогрев."""
+        with self._lock:
+            ev = self._events.get(key)
+        t0 = time.monotonic()
+        done = bool(ev and ev.wait(timeout))
+        METRICS.slept(time.monotonic() - t0, "warmup_wait")
+        return done
+
+    # ---------- поток драйвера ----------
+    def ensure(self, key: str) -> None:
+        """Перед работой: греем по режиму, иначе считаем пропущенный прогрев."""
+        with self._lock:
+            need = self.mode == "always" or (self.mode == "session" and not self.session_warm)
+            self.session_warm = self.session_warm or need
+            if not need:
+                self.skipped += 1
+        if need:
+            self._warm([key])
+        self.service()
+
+    def service(self) -> int:
+        """Выполняет накопившиеся запросы на прогрев пачками по pool_size вкладок."""
+        with self._lock:
+            keys, self._pending = self._pending, []
+            if keys:
+                self.rewarms += len(keys)
+        for i in range(0, len(keys), self.pool_size):
+            batch = keys[i:i + self.pool_size]
+            self._warm(batch)
+            for k in batch:
+                self._events[k].set()
+            self.log(f"[warm] повторный прогрев: {', '.join(k or 'pixiv' for k in batch)}")
+        return len(keys)
+
+    def _warm(self, keys: list[str]) -> None:
+        with self.lock:
+            self._warm_locked(keys)
+
+    def _warm_locked(self, keys: list[str]) -> None:
+        t0 = time.monotonic()
+        drv = self.driver
+        try:
+            main = drv.current_window_handle
+            before = set(drv.window_handles)
+            # Все вкладки открываем разом — страницы грузятся параллельно
+            for k in keys:
+                drv.execute_script("window.open(arguments[0], '_blank');", self.url_for(k))
+            METRICS.sleep(self.settle, "warmup")
+            for h in drv.window_handles:
+                if h not in before:
+                    drv.switch_to.window(h)
+                    drv.close()
+            drv.switch_to.window(main)
+        except Exception as e:
+            self.log(f"[warm] вкладка: {e}")
+        with self._lock:
+            self.warmed += len(keys)
+            self.spent += time.monotonic() - t0
+
+    def summary(self) -> str:
+        # Одна вкладка раньше стоила примерно столько же, сколько средний прогрев сейчас
+        per_tab = self.spent / self.warmed if self.warmed else self.settle
+        return (f"прогрев: вкладок {self.warmed} (повторных {self.rewarms}), "
+                f"пропущено {self.skipped}, сэкономлено ~{self.skipped * per_tab:.0f} с")
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from standin_server import StandinConfig, start_server  # noqa: E402
+
+
+@pytest.fixture
+def standin():
+    """Локальная подмена pinimg / i.pximg без задержек; (config, base_url)."""
+    cfg = StandinConfig(items=10, works=10, latency=0.0, jitter=0.0, file_size=8 * 1024)
+    srv, base = start_server(cfg)
+    yield cfg, base
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def px(standin, monkeypatch):
+    """Pixiv-ядро, направленное на стенд: (config, сессия) со своим быстрым лимитером."""
+    import pixiv_core
+    from rate_limit import RateLimiter
+
+    cfg, base = standin
+    monkeypatch.setattr(pixiv_core, "PIXIV_API_ROOT", base)
+    monkeypatch.setattr(pixiv_core, "BASE_BACKOFF_S", 0.0)
+    monkeypatch.setattr(pixiv_core, "RATE_LIMITER", RateLimiter(rate=1000.0, max_rate=1000.0, burst=1000.0))
+    sess = pixiv_core.get_session_with_cookies(None, pixiv_core.PIXIV_REFERER_ROOT, cookies=[])
+    yield cfg, sess
+    sess.close()
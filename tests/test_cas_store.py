@@ -0,0 +1,73 @@
+"""Хранилище дедупликации: один blob на контент, жёсткие ссылки по путям."""
+
+import hashlib
+import os
+
+import pinterest_download_pins as pdp
+from cas_store import CasStore
+from standin_server import pin_hash
+
+
+def write_part(store: CasStore, path: str, data: bytes) -> str:
+    with store.writer(path) as f:
+        f.write(data[:1000])
+        f.write(data[1000:])
+    return f.digest
+
+
+def test_same_content_is_stored_once_and_hard_linked(tmp_path):
+    store = CasStore(str(tmp_path / ".cas"))
+    data = os.urandom(5000)
+    a, b = tmp_path / "board1" / "a.jpg", tmp_path / "board2" / "b.jpg"
+
+    digest = write_part(store, str(tmp_path / "a.part"), data)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert store.commit(str(tmp_path / "a.part"), digest, str(a), key="k:a", ext=".jpg") is False
+    # Тот же контент под другим ключом — дубликат, .part выброшен, ссылка на тот же blob
+    assert store.commit(str(tmp_path / "b.part"), write_part(store, str(tmp_path / "b.part"), data),
+                        str(b), key="k:b", ext=".jpg") is True
+    assert not (tmp_path / "b.part").exists()
+
+    blob = store.blob_path(digest)
+    assert os.path.samefile(a, blob) and os.path.samefile(b, blob)
+    assert os.stat(blob).st_nlink == 3
+    assert a.read_bytes() == data
+    assert [os.path.basename(p) for p in (tmp_path / ".cas" / "objects" / digest[:2]).iterdir()] == [digest]
+
+
+def test_index_survives_restart_and_links_without_download(tmp_path):
+    store = CasStore(str(tmp_path / ".cas"))
+    data = b"x" * 3000
+    digest = write_part(store, str(tmp_path / "a.part"), data)
+    store.commit(str(tmp_path / "a.part"), digest, str(tmp_path / "a.jpg"), key="pinimg:ab/cd", ext=".jpg")
+    store.save()
+
+    store = CasStore(str(tmp_path / ".cas"))
+    assert store.lookup("pinimg:ab/cd") == (digest, {"size": 3000, "ext": ".jpg"})
+    assert store.link_known("pinimg:ab/cd", str(tmp_path / "other" / "a.jpg"))
+    assert os.path.samefile(tmp_path / "other" / "a.jpg", store.blob_path(digest))
+    assert store.lookup("pinimg:unknown") is None
+
+
+def test_resumed_part_hash_covers_prefix(tmp_path):
+    store = CasStore(str(tmp_path / ".cas"))
+    data = os.urandom(4000)
+    part = tmp_path / "a.part"
+    part.write_bytes(data[:1500])
+    with store.writer(str(part), "ab") as f:
+        f.write(data[1500:])
+    assert f.digest == hashlib.sha256(data).hexdigest() and f.size == 4000
+
+
+def test_pin_in_second_board_is_linked_without_request(standin, tmp_path):
+    cfg, base = standin
+    h = pin_hash(0)
+    url = f"{base}/i.pinimg.com/736x/{h[:2]}/{h[2:4]}/{h[4:6]}/{h}.jpg"
+    store = CasStore(str(tmp_path / ".cas"))
+    assert pdp.download_image(url, str(tmp_path / "board1"), 0, store=store)
+    assert cfg.hits["pinimg"] == 1
+
+    assert pdp.download_image(url, str(tmp_path / "board2"), 7, store=store)
+    assert cfg.hits["pinimg"] == 1
+    first, second = tmp_path / "board1" / "pinterest_00000.jpg", tmp_path / "board2" / "pinterest_00007.jpg"
+    assert os.path.samefile(first, second)
@@ -0,0 +1,33 @@
+"""Консольный загрузчик: нескачанные файлы Pixiv — ошибка URL, как у Pinterest."""
+
+import pytest
+
+import combined_downloader
+import pixiv_core
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    r = combined_downloader.Runner(str(tmp_path), 1, True, "", "Default", True)
+    monkeypatch.setattr(r, "pixiv_run", lambda: None)
+    return r
+
+
+@pytest.mark.parametrize("result, status", [
+    (pixiv_core.work_result(3, 5), "ok"),
+    (pixiv_core.work_result(3, 4, failed=1), "error"),
+    (pixiv_core.work_result(3, 5, no_originals=["1002"]), "error"),
+])
+def test_pixiv_failures_mark_url_failed(runner, monkeypatch, result, status):
+    monkeypatch.setattr(pixiv_core, "handle_pixiv", lambda *a, **kw: result)
+    res = runner.process("https://www.pixiv.net/users/1")
+    assert res["status"] == status
+    if status == "ok":
+        assert res["works"] == 3 and res["files"] == 5
+
+
+def test_user_sync_reports_failed_downloads(px, tmp_path, monkeypatch):
+    _, sess = px
+    monkeypatch.setattr(pixiv_core, "download_binary", lambda *a, **kw: False)
+    res = pixiv_core.handle_pixiv_user(None, sess, "https://www.pixiv.net/users/1", str(tmp_path), None)
+    assert res["works"] == 10 and res["files"] == 0 and res["failed"] == 20
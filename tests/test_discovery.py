@@ -0,0 +1,38 @@
+"""Сбор ID пользователя без браузера: AJAX-результат не теряется."""
+
+import pytest
+import requests
+
+import pixiv_core
+from cookie_store import LazyDriver
+
+
+def no_browser():
+    raise RuntimeError("нужен браузер, а он выключен (--no-browser)")
+
+
+@pytest.fixture
+def ajax(standin, monkeypatch):
+    cfg, base = standin
+    monkeypatch.setattr(pixiv_core, "PIXIV_API_ROOT", base)
+    monkeypatch.setattr(pixiv_core, "BASE_BACKOFF_S", 0.0)
+    # /profile/top не ответил — планировщик захочет добрать браузером
+    monkeypatch.setattr(pixiv_core, "pixiv_fetch_user_top_ids", lambda sess, uid: None)
+    with requests.Session() as sess:
+        yield cfg, sess
+
+
+@pytest.mark.parametrize("driver", [None, LazyDriver(no_browser, log=lambda m: None)],
+                         ids=["no-driver", "no-browser"])
+def test_keeps_ajax_ids_without_browser(ajax, driver):
+    cfg, sess = ajax
+    ids = pixiv_core.discover_user_ids(driver, sess, "1", None, None)
+    assert ids == [str(i) for i in range(1000, 1000 + cfg.works)]
+
+
+@pytest.mark.parametrize("driver", [None, LazyDriver(no_browser, log=lambda m: None)],
+                         ids=["no-driver", "no-browser"])
+def test_empty_ajax_without_browser_does_not_raise(ajax, driver, monkeypatch):
+    _, sess = ajax
+    monkeypatch.setattr(pixiv_core, "pixiv_fetch_user_all_illust_ids", lambda *a, **kw: [])
+    assert pixiv_core.discover_user_ids(driver, sess, "1", None, None) == []
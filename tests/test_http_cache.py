@@ -0,0 +1,128 @@
+"""Ревалидация по ETag/Last-Modified: 200, затем 304 без тела."""
+
+import os
+
+import pytest
+import requests
+
+import pinterest_download_pins as pdp
+import pixiv_core
+from http_cache import RevalidationCache
+from standin_server import pin_hash
+
+REFERER = "https://www.pixiv.net/artworks/1001"
+
+
+def last_headers(cfg, marker: str) -> dict:
+    return next(h for path, h in reversed(cfg.seen) if marker in path)
+
+
+def snapshot(path: str) -> tuple[bytes, int]:
+    with open(path, "rb") as f:
+        return f.read(), os.stat(path).st_mtime_ns
+
+
+@pytest.fixture
+def pin_url(standin):
+    _, base = standin
+    h = pin_hash(0)
+    return f"{base}/i.pinimg.com/736x/{h[:2]}/{h[2:4]}/{h[4:6]}/{h}.jpg"
+
+
+@pytest.fixture
+def pximg_url(standin):
+    _, base = standin
+    return f"{base}/i.pximg.net/img-original/img/2024/01/02/03/04/05/1001_p0.jpg"
+
+
+@pytest.fixture(autouse=True)
+def revalidate(monkeypatch):
+    # Без этого Pinterest пропускает существующий файл, не спрашивая сервер
+    monkeypatch.setattr(pdp, "REVALIDATE_EXISTING", True)
+    monkeypatch.setattr(pdp, "BASE_BACKOFF_S", 0.0)
+    monkeypatch.setattr(pixiv_core, "BASE_BACKOFF_S", 0.0)
+
+
+def pinterest_get(url, out_dir, cache):
+    with requests.Session() as sess:
+        return pdp.download_image(url, out_dir, 1, sess=sess, cache=cache)
+
+
+def pixiv_get(url, outpath, cache):
+    with requests.Session() as sess:
+        return pixiv_core.download_binary(sess, url, outpath, None, referer=REFERER, cache=cache)
+
+
+def test_pinterest_304_keeps_file(standin, pin_url, tmp_path):
+    cfg, _ = standin
+    cache = RevalidationCache(str(tmp_path / ".http_cache.json"))
+    assert pinterest_get(pin_url, str(tmp_path), cache)
+    path = str(tmp_path / "pinterest_00001.jpg")
+    assert os.path.getsize(path) == cfg.file_size
+    assert cache.misses == 1 and cache.hits == 0
+    before = snapshot(path)
+
+    assert pinterest_get(pin_url, str(tmp_path), cache)
+    sent = last_headers(cfg, "/originals/")
+    assert sent.get("If-None-Match") and sent.get("If-Modified-Since")
+    assert cfg.hits["pinimg:304"] == 1 and cfg.hits["pinimg"] == 1
+    assert snapshot(path) == before
+    assert not list(tmp_path.glob("*.part"))
+    assert cache.hits == 1 and cache.bytes_saved == cfg.file_size
+
+
+def test_pixiv_304_keeps_file(standin, pximg_url, tmp_path):
+    cfg, _ = standin
+    cache = RevalidationCache(str(tmp_path / ".http_cache.json"))
+    outpath = str(tmp_path / "1001_p0.jpg")
+    assert pixiv_get(pximg_url, outpath, cache)
+    assert os.path.getsize(outpath) == cfg.file_size
+    before = snapshot(outpath)
+
+    assert pixiv_get(pximg_url, outpath, cache)
+    sent = last_headers(cfg, "/img-original/")
+    assert sent.get("If-None-Match") and sent.get("If-Modified-Since")
+    assert cfg.hits["pximg:304"] == 1 and cfg.hits["pximg"] == 1
+    assert snapshot(outpath) == before
+    assert not list(tmp_path.glob("*.part"))
+    assert cache.hits == 1 and cache.bytes_saved == cfg.file_size
+
+
+@pytest.mark.parametrize("damage", ["missing", "wrong_size"])
+def test_pinterest_refetches_damaged_file(standin, pin_url, tmp_path, damage):
+    cfg, _ = standin
+    cache = RevalidationCache(str(tmp_path / ".http_cache.json"))
+    assert pinterest_get(pin_url, str(tmp_path), cache)
+    path = str(tmp_path / "pinterest_00001.jpg")
+    if damage == "missing":
+        os.remove(path)
+    else:
+        with open(path, "r+b") as f:
+            f.truncate(100)
+
+    assert pinterest_get(pin_url, str(tmp_path), cache)
+    sent = last_headers(cfg, "/originals/")
+    assert "If-None-Match" not in sent and "If-Modified-Since" not in sent
+    assert cfg.hits["pinimg"] == 2 and cfg.hits["pinimg:304"] == 0
+    assert os.path.getsize(path) == cfg.file_size
+    assert cache.hits == 0
+
+
+@pytest.mark.parametrize("damage", ["missing", "wrong_size"])
+def test_pixiv_refetches_damaged_file(standin, pximg_url, tmp_path, damage):
+    cfg, _ = standin
+    cache = RevalidationCache(str(tmp_path / ".http_cache.json"))
+    outpath = str(tmp_path / "1001_p0.jpg")
+    assert pixiv_get(pximg_url, outpath, cache)
+    if damage == "missing":
+        os.remove(outpath)
+    else:
+        with open(outpath, "r+b") as f:
+            f.truncate(100)
+
+    assert pixiv_get(pximg_url, outpath, cache)
+    sent = last_headers(cfg, "/img-original/")
+    assert "If-None-Match" not in sent and "If-Modified-Since" not in sent
+    assert cfg.hits["pximg"] == 2 and cfg.hits["pximg:304"] == 0
+    assert os.path.getsize(outpath) == cfg.file_size
+    assert cache.hits == 0
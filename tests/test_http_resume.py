@@ -0,0 +1,113 @@
+"""Докачка .part через Range + If-Range: только тот же ресурс, иначе с нуля."""
+
+import os
+
+import pytest
+import requests
+
+import http_resume
+import pinterest_download_pins as pdp
+import pixiv_core
+from standin_server import pin_hash
+
+REFERER = "https://www.pixiv.net/artworks/1001"
+PREFIX = 3000
+
+
+def last_headers(cfg, marker: str) -> dict:
+    return next(h for path, h in reversed(cfg.seen) if marker in path)
+
+
+def read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def leave_part(part_path: str, data: bytes, url: str, validator: str | None) -> None:
+    with open(part_path, "wb") as f:
+        f.write(data)
+    if validator:
+        http_resume._save_validator(part_path, url, validator)
+
+
+def pin_url(base: str, i: int) -> str:
+    h = pin_hash(i)
+    return f"{base}/i.pinimg.com/736x/{h[:2]}/{h[2:4]}/{h[4:6]}/{h}.jpg"
+
+
+@pytest.fixture
+def pximg_url(standin):
+    _, base = standin
+    return f"{base}/i.pximg.net/img-original/img/2024/01/02/03/04/05/1001_p0.jpg"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(pdp, "BASE_BACKOFF_S", 0.0)
+    monkeypatch.setattr(pixiv_core, "BASE_BACKOFF_S", 0.0)
+
+
+def current_validator(url: str, **headers) -> str:
+    return http_resume.validator_of(requests.head(url, headers=headers).headers)
+
+
+def pixiv_get(url, outpath):
+    with requests.Session() as sess:
+        return pixiv_core.download_binary(sess, url, outpath, None, referer=REFERER)
+
+
+def test_pixiv_resumes_same_resource(standin, pximg_url, tmp_path):
+    cfg, _ = standin
+    outpath = str(tmp_path / "1001_p0.jpg")
+    validator = current_validator(pximg_url, Referer=REFERER)
+    leave_part(outpath + ".part", cfg.payload[:PREFIX], pximg_url, validator)
+
+    assert pixiv_get(pximg_url, outpath)
+    sent = last_headers(cfg, "/img-original/")
+    assert sent["Range"] == f"bytes={PREFIX}-" and sent["If-Range"] == validator
+    assert cfg.hits["pximg:206"] == 1
+    assert read(outpath) == cfg.payload
+    assert not list(tmp_path.glob("*.part*"))
+
+
+def test_pixiv_mismatched_part_restarts(standin, pximg_url, tmp_path):
+    cfg, _ = standin
+    outpath = str(tmp_path / "1001_p0.jpg")
+    leave_part(outpath + ".part", b"\0" * PREFIX, pximg_url, '"someone-else"')
+
+    assert pixiv_get(pximg_url, outpath)
+    sent = last_headers(cfg, "/img-original/")
+    assert sent["If-Range"] == '"someone-else"'
+    assert cfg.hits["pximg"] == 1 and cfg.hits["pximg:206"] == 0
+    assert read(outpath) == cfg.payload
+
+
+def test_pinterest_part_without_validator_is_dropped(standin, tmp_path):
+    cfg, base = standin
+    url = pin_url(base, 0)
+    part = os.path.join(str(tmp_path), pdp.image_filename(url, 7, "", True) + ".part")
+    leave_part(part, b"\0" * PREFIX, pdp.make_original_url(url), None)
+
+    with requests.Session() as sess:
+        assert pdp.download_image(url, str(tmp_path), 7, sess=sess)
+    sent = last_headers(cfg, "/originals/")
+    assert "Range" not in sent
+    assert read(str(tmp_path / "pinterest_00007.jpg")) == cfg.payload
+
+
+def test_pinterest_part_keyed_by_pin_not_index(standin, tmp_path):
+    cfg, base = standin
+    url, other = pin_url(base, 0), pin_url(base, 1)
+    orig = pdp.make_original_url(url)
+    # Прошлый запуск: у этого пина был индекс 2, у другого — 1
+    part = os.path.join(str(tmp_path), pdp.image_filename(url, 2, "", True) + ".part")
+    leave_part(part, cfg.payload[:PREFIX], orig, current_validator(orig))
+
+    with requests.Session() as sess:
+        assert pdp.download_image(other, str(tmp_path), 2, sess=sess)
+        assert "Range" not in last_headers(cfg, "/originals/")
+        assert pdp.download_image(url, str(tmp_path), 1, sess=sess)
+    assert last_headers(cfg, "/originals/")["Range"] == f"bytes={PREFIX}-"
+    assert read(str(tmp_path / "pinterest_00001.jpg")) == cfg.payload
+    assert read(str(tmp_path / "pinterest_00002.jpg")) == cfg.payload
+    assert not list(tmp_path.glob("*.part*"))
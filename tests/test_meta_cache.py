@@ -0,0 +1,94 @@
+"""Кеш метаданных AJAX: срок жизни по эндпоинту и вытеснение давно не читанных."""
+
+import types
+
+import pytest
+
+import meta_cache
+import pixiv_core
+from meta_cache import DAY, MetaCache
+
+ALL = "ajax:user/profile/all"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(t=1_000_000.0)
+    monkeypatch.setattr(meta_cache, "time", types.SimpleNamespace(time=lambda: now.t))
+    return now
+
+
+def cache(tmp_path, **kw) -> MetaCache:
+    opts = dict(ttl={"profile_all": 600, "pages": None}, log=lambda m: None)
+    opts.update(kw)
+    return MetaCache(str(tmp_path / ".meta_cache.json"), **opts)
+
+
+def test_ttl_per_endpoint(tmp_path, clock):
+    mc = cache(tmp_path)
+    mc.put("profile_all", "1", ["1000", "1001"])
+    mc.put("pages", "1000", ["https://i.pximg.net/img-original/1000_p0.png"])
+
+    clock.t += 599
+    assert mc.get("profile_all", "1") == ["1000", "1001"]
+    clock.t += 2
+    assert mc.get("profile_all", "1") is None
+    # Протухшая запись удалена, а не просто пропущена
+    assert "profile_all:1" not in mc.entries
+
+    clock.t += 3650 * DAY
+    assert mc.get("pages", "1000") == ["https://i.pximg.net/img-original/1000_p0.png"]
+    assert (mc.hits, mc.misses) == (2, 1)
+
+
+def test_lru_evicts_least_recently_read(tmp_path, clock):
+    mc = cache(tmp_path, max_entries=10)
+    for i in range(10):
+        clock.t += 1
+        mc.put("pages", str(i), [f"u{i}"])
+    # Старые, но читаемые записи остаются
+    for i in range(3):
+        clock.t += 1
+        assert mc.get("pages", str(i)) == [f"u{i}"]
+
+    clock.t += 1
+    mc.put("pages", "10", ["u10"])
+    # 11 > 10 — выброшено до 90%: 2 записи, к которым дольше всего не обращались
+    assert len(mc.entries) == 9
+    assert mc.get("pages", "3") is None and mc.get("pages", "4") is None
+    assert all(mc.get("pages", str(i)) for i in (0, 1, 2, 5, 10))
+
+
+def test_empty_answers_not_cached_and_bypass_refreshes(tmp_path, clock):
+    mc = cache(tmp_path)
+    for value in (None, [], ""):
+        mc.put("pages", "1", value)
+    assert not mc.entries
+
+    mc = cache(tmp_path, bypass=True)
+    mc.put("pages", "1", ["u1"])
+    assert mc.get("pages", "1") is None
+    mc.save()
+    assert cache(tmp_path).get("pages", "1") == ["u1"]
+
+
+def test_corrupt_file_starts_empty(tmp_path, clock):
+    (tmp_path / ".meta_cache.json").write_text("{oops", encoding="utf-8")
+    logged = []
+    mc = cache(tmp_path, log=logged.append)
+    assert mc.entries == {} and logged
+
+
+def test_profile_all_refetched_after_its_ttl(px, tmp_path, clock, monkeypatch):
+    cfg, sess = px
+    monkeypatch.setattr(pixiv_core, "pixiv_fetch_user_top_ids", lambda sess, uid: None)
+    mc = cache(tmp_path, ttl=pixiv_core.META_CACHE_TTL)
+
+    pixiv_core.discover_user_ids(None, sess, "1", mc, None)
+    pixiv_core.discover_user_ids(None, sess, "1", mc, None)
+    assert cfg.hits[ALL] == 1
+
+    clock.t += pixiv_core.META_CACHE_TTL["profile_all"] + 1
+    cfg.works = 12
+    assert len(pixiv_core.discover_user_ids(None, sess, "1", mc, None)) == 12
+    assert cfg.hits[ALL] == 2
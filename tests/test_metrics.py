@@ -0,0 +1,80 @@
+"""Экспорт метрик: формат Prometheus textfile и JSON-сводка."""
+
+import json
+import re
+
+from metrics import BUCKETS, Metrics, MetricsReporter
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_]\w*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+TYPE = re.compile(r"^# TYPE ([a-zA-Z_:][a-zA-Z0-9_:]*) (counter|gauge|histogram)$")
+
+
+def filled() -> Metrics:
+    m = Metrics(prefix="t")
+    m.inc("files_total", 3)
+    m.inc("bytes_total", 3 * 1024)
+    m.inc("http_responses_total", host="i.pximg.net", code=200)
+    m.inc("http_responses_total", 2, host="i.pximg.net", code=429)
+    m.inc("http_errors_total", host='odd"host\\x', error="ConnectionError")
+    for v in (0.004, 0.2, 0.2, 3.0, 500.0):
+        m.observe("stage_seconds", v, stage="download", site="pixiv")
+    m.slept(1.5, "backoff")
+    return m
+
+
+def parse(text: str) -> tuple[dict, dict]:
+    types, samples = {}, {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            if line.startswith("# TYPE"):
+                name, kind = TYPE.match(line).groups()
+                assert name not in types, f"TYPE {name} дважды"
+                types[name] = kind
+            continue
+        m = SAMPLE.match(line)
+        assert m, f"не по формату: {line!r}"
+        samples[m.group(1) + (m.group(2) or "")] = float(m.group(3))
+    return types, samples
+
+
+def test_prometheus_textfile_format():
+    text = filled().prometheus()
+    assert text.endswith("\n")
+    types, samples = parse(text)
+    assert types == {"t_run_started_seconds": "gauge", "t_files_total": "counter", "t_bytes_total": "counter",
+                     "t_http_responses_total": "counter", "t_http_errors_total": "counter",
+                     "t_sleep_seconds_total": "counter", "t_stage_seconds": "histogram"}
+    assert samples['t_http_responses_total{code="429",host="i.pximg.net"}'] == 2
+    assert samples["t_files_total"] == 3
+    # Кавычки и обратные слеши в значениях меток экранированы
+    assert samples['t_http_errors_total{error="ConnectionError",host="odd\\"host\\\\x"}'] == 1
+
+
+def test_histogram_buckets_are_cumulative_and_end_with_inf():
+    _, samples = parse(filled().prometheus())
+    labels = 'site="pixiv",stage="download"'
+    buckets = [samples[f't_stage_seconds_bucket{{{labels},le="{le}"}}'] for le in list(BUCKETS) + ["+Inf"]]
+    assert buckets == sorted(buckets)
+    assert samples[f't_stage_seconds_bucket{{{labels},le="0.01"}}'] == 1
+    assert samples[f't_stage_seconds_bucket{{{labels},le="0.25"}}'] == 3
+    assert buckets[-2] == 4 and buckets[-1] == 5
+    assert samples[f"t_stage_seconds_count{{{labels}}}"] == 5
+    assert abs(samples[f"t_stage_seconds_sum{{{labels}}}"] - 503.404) < 1e-6
+
+
+def test_json_snapshot_and_reporter_files(tmp_path):
+    m = filled()
+    json_path, prom_path = tmp_path / "m" / ".metrics.json", tmp_path / "m" / ".metrics.prom"
+    MetricsReporter(m, str(json_path), str(prom_path), interval=0, log=lambda s: None).start().stop()
+
+    snap = json.loads(json_path.read_text(encoding="utf-8"))
+    assert snap["counters"]["files_total"] == {"_": 3}
+    assert snap["counters"]["http_responses_total"] == {"code=200,host=i.pximg.net": 1,
+                                                        "code=429,host=i.pximg.net": 2}
+    assert snap["sleep_seconds"] == 1.5
+    hist = snap["histograms"]["stage_seconds"]["site=pixiv,stage=download"]
+    assert (hist["count"], hist["p50"], hist["max"]) == (5, 0.25, 500.0)
+    # p95 за последней границей — оценивается максимумом
+    assert hist["p95"] == 500.0
+    assert prom_path.read_text(encoding="utf-8") == m.prometheus()
+    assert not list(tmp_path.glob("m/*.tmp"))
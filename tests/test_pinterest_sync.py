@@ -0,0 +1,50 @@
+"""Синхронизация Pinterest по манифесту: остановка скролла на известных пинах и пропуск без запросов."""
+
+import pinterest_download_pins as pdp
+from bench import FeedDriver
+from manifest import Manifest
+from standin_server import pin_hash
+
+
+def pin_url(base: str, i: int) -> str:
+    h = pin_hash(i)
+    return f"{base}/i.pinimg.com/736x/{h[:2]}/{h[2:4]}/{h[4:6]}/{h}.jpg"
+
+
+def test_scroll_stops_after_run_of_known_pins(standin):
+    cfg, base = standin
+    cfg.items, cfg.page_size = 500, 25
+    # Прошлые запуски скачали всё, кроме 40 свежих пинов в начале ленты
+    known = {pdp.pin_key(pin_url(base, i)) for i in range(40, 500)}
+    drv = FeedDriver(base)
+    try:
+        drv.get(f"{base}/feed")
+        urls = pdp.collect_image_urls(drv, 200, 0.1, 3, known=known, known_stop_run=30)
+    finally:
+        drv.quit()
+
+    new = {pdp.pin_key(u) for u in urls} - known
+    assert new == {pdp.pin_key(pin_url(base, i)) for i in range(40)}
+    # 40 новых + 30 известных подряд — 3 пачки по 25 из 20, а не вся лента
+    assert cfg.hits["feed"] <= 5
+    assert len(urls) < 150
+
+
+def test_manifest_skips_done_pins_without_requests(standin, tmp_path):
+    cfg, base = standin
+    manifest = Manifest.in_dir(str(tmp_path))
+    urls = [pin_url(base, i) for i in range(3)]
+    for i, u in enumerate(urls):
+        assert pdp.download_image(u, str(tmp_path), i, manifest=manifest)
+    manifest.save()
+    names = sorted(p.name for p in tmp_path.glob("pin_*"))
+    assert names == sorted(f"pin_{pin_hash(i)}.jpg" for i in range(3))
+
+    cfg.reset_hits()
+    manifest = Manifest.in_dir(str(tmp_path))
+    assert manifest.known_keys() == {pdp.pin_key(u) for u in urls}
+    # Порядок другой, индексы другие — имена и пропуск от этого не зависят
+    for i, u in enumerate(reversed(urls)):
+        assert pdp.download_image(u, str(tmp_path), i, manifest=manifest)
+    assert cfg.hits["pinimg"] == 0
+    assert sorted(p.name for p in tmp_path.glob("pin_*")) == names
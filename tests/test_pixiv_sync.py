@@ -0,0 +1,168 @@
+"""Синхронизация пользователя Pixiv на стенде: запросы, догрузка, счётчики."""
+
+import threading
+
+import pytest
+
+import pixiv_core
+from pixiv_sync import UserSyncState
+
+TOP = "ajax:user/profile/top"
+
+
+def test_profile_top_fetched_once_per_sync(px, tmp_path):
+    cfg, sess = px
+    out = str(tmp_path)
+    pixiv_core.handle_pixiv_user(None, sess, "https://www.pixiv.net/users/1", out, None)
+    assert cfg.hits[TOP] == 1
+    assert cfg.hits["pximg"] > 0
+
+    # Второй запуск: всё скачано — выход после той же единственной проверки
+    cfg.reset_hits()
+    pixiv_core.handle_pixiv_user(None, sess, "https://www.pixiv.net/users/1", out, None)
+    assert cfg.hits[TOP] == 1
+    assert cfg.hits["ajax:user/profile/all"] == 0
+
+
+def counter(name: str) -> float:
+    return pixiv_core.METRICS.snapshot()["counters"].get(name, {}).get("_", 0)
+
+
+def test_original_template_takes_ext_from_thumbnail():
+    thumb = "https://i.pximg.net/c/250x250_80_a2/img-master/img/2024/01/02/03/04/05/77_p0_square1200.png"
+    assert pixiv_core.original_template(thumb, "77") == \
+        "https://i.pximg.net/img-original/img/2024/01/02/03/04/05/77_p{page}.png"
+    assert pixiv_core.original_template(thumb.replace(".png", ".webp"), "77").endswith("_p{page}.jpg")
+
+
+def test_guess_miss_counted_once_per_work(px, tmp_path):
+    cfg, sess = px
+    # 1000 — png из двух страниц (превью стенда всегда .jpg), 1001 — jpg
+    batch = pixiv_core.pixiv_batch_resolve(sess, "1", ["1000", "1001"])
+    guesses, misses = counter("ext_guesses_total"), counter("ext_guess_miss_total")
+    pipe = pixiv_core.PixivPipeline(sess, str(tmp_path), None, batch=batch,
+                                    resolve_workers=1, download_workers=1).start()
+    for illust_id in ("1000", "1001"):
+        pipe.submit(illust_id)
+    pipe.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == \
+        ["1000_p0.png", "1000_p1.png", "1001_p0.jpg", "1001_p1.jpg", "1001_p2.jpg"]
+    assert counter("ext_guesses_total") - guesses == 5
+    # Второй странице 1000 хватило подтверждённого расширения первой
+    assert counter("ext_guess_miss_total") - misses == 1
+    assert cfg.hits["pximg:404"] == 1
+
+
+def run_guessing(sess, dest, ids, state=None) -> float:
+    batch = pixiv_core.pixiv_batch_resolve(sess, "1", ids)
+    misses = counter("ext_guess_miss_total")
+    pipe = pixiv_core.PixivPipeline(sess, str(dest), None, state=state, batch=batch,
+                                    resolve_workers=1, download_workers=1).start()
+    for illust_id in ids:
+        pipe.submit(illust_id)
+    pipe.close()
+    return counter("ext_guess_miss_total") - misses
+
+
+# На стенде каждая пятая работа — png, превью всегда .jpg
+PNG_WORKS = ["1000", "1005", "1010", "1015", "1020"]
+
+
+def test_guess_learns_user_ext_within_run(px, tmp_path):
+    cfg, sess = px
+    cfg.works = 30
+    # Промахи только пока у автора меньше USER_EXT_MIN_SEEN подтверждённых png: 1000 (2 стр.) и 1005
+    assert run_guessing(sess, tmp_path, PNG_WORKS) == 2
+
+
+def test_guess_starts_from_user_ext_already_on_disk(px, tmp_path):
+    cfg, sess = px
+    cfg.works = 30
+    for i in range(3):
+        (tmp_path / f"90{i}_p0.png").write_bytes(b"x")
+    state = UserSyncState(str(tmp_path))
+    state.scan()
+    assert run_guessing(sess, tmp_path, PNG_WORKS, state) == 0
+
+
+USER = "https://www.pixiv.net/users/1"
+
+
+@pytest.fixture
+def px30(px):
+    # /profile/top отдаёт 12 последних — старые работы в проверку не попадают
+    cfg, sess = px
+    cfg.works = 30
+    return cfg, sess
+
+
+def test_deleted_file_is_restored_on_next_sync(px30, tmp_path):
+    cfg, sess = px30
+    out = str(tmp_path)
+    pixiv_core.handle_pixiv_user(None, sess, USER, out, None)
+    lost = tmp_path / "pixiv" / "1" / "1001_p0.jpg"
+    lost.unlink()
+
+    cfg.reset_hits()
+    pixiv_core.handle_pixiv_user(None, sess, USER, out, None)
+    assert lost.exists()
+    assert cfg.hits["pximg"] == 1
+
+
+def test_failed_works_are_retried_on_next_sync(px30, tmp_path, monkeypatch):
+    cfg, sess = px30
+    out = str(tmp_path)
+    download, resolve = pixiv_core.download_binary, pixiv_core.PixivPipeline._resolve
+
+    def flaky_download(sess, url, outpath, *a, **kw):
+        return False if outpath.endswith("1002_p0.jpg") else download(sess, url, outpath, *a, **kw)
+
+    def flaky_resolve(self, illust_id):
+        return ([], None) if illust_id == "1003" else resolve(self, illust_id)
+
+    monkeypatch.setattr(pixiv_core, "download_binary", flaky_download)
+    monkeypatch.setattr(pixiv_core.PixivPipeline, "_resolve", flaky_resolve)
+    pixiv_core.handle_pixiv_user(None, sess, USER, out, None)
+    user_dir = tmp_path / "pixiv" / "1"
+    assert not (user_dir / "1002_p0.jpg").exists()
+    assert not (user_dir / "1003_p0.jpg").exists()
+
+    monkeypatch.setattr(pixiv_core, "download_binary", download)
+    monkeypatch.setattr(pixiv_core.PixivPipeline, "_resolve", resolve)
+    cfg.reset_hits()
+    pixiv_core.handle_pixiv_user(None, sess, USER, out, None)
+    assert (user_dir / "1002_p0.jpg").exists() and (user_dir / "1003_p0.jpg").exists()
+
+    # Всё докачано — третий запуск снова выходит после одной проверки /profile/top
+    cfg.reset_hits()
+    pixiv_core.handle_pixiv_user(None, sess, USER, out, None)
+    assert dict(cfg.hits) == {TOP: 1}
+
+
+def test_downloader_survives_errors_after_download(px, tmp_path, monkeypatch):
+    cfg, sess = px
+    state = UserSyncState(str(tmp_path))
+
+    def broken_mark_done(illust_id, name):
+        raise OSError("диск отвалился")
+
+    monkeypatch.setattr(state, "mark_done", broken_mark_done)
+    ids = [str(1000 + i) for i in range(6)]
+    batch = pixiv_core.pixiv_batch_resolve(sess, "1", ids)
+    pipe = pixiv_core.PixivPipeline(sess, str(tmp_path), None, state=state, batch=batch,
+                                    resolve_workers=1, download_workers=1, queue_size=1).start()
+
+    def run():
+        for illust_id in ids:
+            pipe.submit(illust_id)
+        pipe.close()
+
+    # Упавший поток скачивания оставил бы резолв висеть на полной dl_q
+    done = threading.Thread(target=run, daemon=True)
+    done.start()
+    done.join(20)
+    assert not done.is_alive()
+    result = pipe.result()
+    assert result["works"] == 6
+    assert result["failed"] == sum(int(i) % 3 + 1 for i in ids)
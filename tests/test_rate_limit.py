@@ -0,0 +1,109 @@
+"""Ограничитель темпа: AIMD, Retry-After и размыкание цепи."""
+
+import email.utils
+import time
+
+import pytest
+
+from metrics import METRICS
+from rate_limit import RateLimitedSession, RateLimiter, parse_retry_after
+
+HOST = "i.pximg.net"
+
+
+def limiter(**kw) -> RateLimiter:
+    opts = dict(rate=4.0, min_rate=0.5, max_rate=16.0, burst=100.0, increase=0.5, cooldown=1.0,
+                threshold=5, window=10.0, open_s=30.0, log=lambda m: None)
+    opts.update(kw)
+    return RateLimiter(**opts)
+
+
+def circuit_opens() -> float:
+    return METRICS.snapshot()["counters"].get("circuit_open_total", {}).get(f"host={HOST}", 0)
+
+
+def test_aimd_additive_increase_and_one_halving_per_cooldown():
+    rl = limiter()
+    for _ in range(4):
+        rl.feedback(HOST, 200)
+    assert rl.bucket(HOST).rate == pytest.approx(6.0)
+    # Пачка одновременных 429 режет темп один раз, а не до минимума
+    for _ in range(3):
+        rl.feedback(HOST, 429)
+    assert rl.bucket(HOST).rate == pytest.approx(3.0)
+    rl.bucket(HOST).last_cut -= 1.0
+    rl.feedback(HOST, 503)
+    assert rl.bucket(HOST).rate == pytest.approx(1.5)
+    for _ in range(5):
+        rl.bucket(HOST).last_cut -= 1.0
+        rl.feedback(HOST, 503)
+    assert rl.bucket(HOST).rate == 0.5
+
+
+def test_rate_stays_within_max():
+    rl = limiter(max_rate=5.0)
+    for _ in range(10):
+        rl.feedback(HOST, 200)
+    assert rl.bucket(HOST).rate == 5.0
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("2", 2.0), (" 1.5 ", 1.5), ("-3", 0.0), ("9999", 300.0), (None, 0.0), ("soon", 0.0),
+])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    when = email.utils.formatdate(time.time() + 20, usegmt=True)
+    assert 15 < parse_retry_after(when) <= 20
+
+
+def test_retry_after_blocks_host_until_deadline():
+    rl = limiter()
+    rl.feedback(HOST, 429, "0.3")
+    t0 = time.monotonic()
+    rl.acquire(HOST)
+    assert 0.25 <= time.monotonic() - t0 < 1.0
+    # Другой хост не ждёт
+    t0 = time.monotonic()
+    rl.acquire("www.pixiv.net")
+    assert time.monotonic() - t0 < 0.05
+
+
+def test_circuit_opens_after_threshold_throttles_in_window():
+    rl = limiter(threshold=3, open_s=0.4)
+    opened = circuit_opens()
+    rl.feedback(HOST, 503)
+    rl.feedback(HOST, 503)
+    assert rl.bucket(HOST).not_before == 0.0
+    rl.feedback(HOST, 503)
+    assert circuit_opens() - opened == 1
+    # Счётчик окна обнулён: следующий 503 цепь снова не размыкает
+    assert not rl.bucket(HOST).throttles
+    t0 = time.monotonic()
+    rl.acquire(HOST)
+    assert 0.35 <= time.monotonic() - t0 < 1.0
+
+
+def test_old_throttles_fall_out_of_window():
+    rl = limiter(threshold=3, window=10.0)
+    b = rl.bucket(HOST)
+    rl.feedback(HOST, 503)
+    rl.feedback(HOST, 503)
+    b.throttles = type(b.throttles)(t - 11.0 for t in b.throttles)
+    rl.feedback(HOST, 503)
+    assert b.not_before == 0.0 and len(b.throttles) == 1
+
+
+def test_session_feeds_server_throttles_to_limiter(standin):
+    cfg, base = standin
+    cfg.error_rate, cfg.retry_after = 1.0, 0.2
+    rl = limiter(threshold=100)
+    with RateLimitedSession(rl) as sess:
+        codes = [sess.get(f"{base}/i.pinimg.com/736x/ab/cd/ef/x.jpg").status_code for _ in range(4)]
+    assert set(codes) <= {429, 503}
+    b = rl.bucket("127.0.0.1")
+    assert b.throttled == 4 and b.rate < 4.0
+    # 429 стенда шлёт Retry-After — хост закрыт до указанного момента
+    assert (b.not_before > 0.0) == (429 in codes)
@@ -0,0 +1,102 @@
+"""Журнал скролла Pinterest: чекпоинт при падении и продолжение со старой позиции."""
+
+import json
+
+import pytest
+
+import pinterest_download_pins as pdp
+from bench import FeedDriver
+from scroll_journal import ScrollJournal
+
+
+class CrashingFeed(FeedDriver):
+    """Лента, на которой «Edge падает» после crash_after шагов скролла."""
+
+    def __init__(self, base: str, crash_after: int):
+        super().__init__(base)
+        self.crash_after = crash_after
+        self.steps = 0
+
+    def execute_script(self, script: str, *args):
+        if "scrollBy" in script:
+            self.steps += 1
+            if self.steps > self.crash_after:
+                raise ConnectionError("Edge упал")
+        return super().execute_script(script, *args)
+
+
+def collect(drv, journal, on_new=None):
+    return pdp.collect_image_urls(drv, 200, 0.1, 3, on_new=on_new, journal=journal)
+
+
+@pytest.fixture
+def feed(standin):
+    cfg, base = standin
+    cfg.items, cfg.page_size = 300, 25
+    return cfg, base
+
+
+def test_crash_checkpoints_and_next_run_resumes(feed, tmp_path):
+    cfg, base = feed
+    path = tmp_path / pdp.JOURNAL_NAME
+    drv = CrashingFeed(base, crash_after=15)
+    try:
+        drv.get(f"{base}/feed")
+        with pytest.raises(ConnectionError):
+            collect(drv, ScrollJournal(str(path)))
+    finally:
+        drv.quit()
+
+    records = [json.loads(ln) for ln in path.read_text(encoding="utf-8").splitlines()]
+    assert records[0]["page"] == f"{base}/feed"
+    # Чекпоинт каждые CHECKPOINT_EVERY шагов и ещё один на падении
+    assert len(records) == 3
+    found = {u for r in records[1:] for u in r["urls"]}
+    offset = max(r["offset"] for r in records[1:])
+    assert len(found) >= 100 and offset > 0
+
+    cfg.reset_hits()
+    streamed = []
+    drv = FeedDriver(base)
+    try:
+        drv.get(f"{base}/feed")
+        urls = collect(drv, ScrollJournal(str(path)), on_new=streamed.append)
+    finally:
+        drv.quit()
+    assert len(urls) == 300
+    # URL из журнала отданы потоковому скачиванию сразу, без повторного разбора страницы
+    assert found <= set(streamed[:len(found)])
+    assert len(streamed) == 300
+    assert not path.exists()
+
+
+def test_journal_of_other_page_is_not_resumed(feed, tmp_path):
+    _, base = feed
+    path = tmp_path / pdp.JOURNAL_NAME
+    old = ScrollJournal(str(path))
+    old.begin(f"{base}/other-board")
+    old.add(f"{base}/i.pinimg.com/736x/aa/bb/cc/stale.jpg")
+    old.checkpoint(5000)
+
+    drv = FeedDriver(base)
+    try:
+        drv.get(f"{base}/feed")
+        urls = collect(drv, ScrollJournal(str(path)))
+    finally:
+        drv.quit()
+    assert len(urls) == 300 and not any("stale" in u for u in urls)
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = tmp_path / pdp.JOURNAL_NAME
+    j = ScrollJournal(str(path))
+    j.begin("https://www.pinterest.com/u/board/?x=1")
+    j.add("https://i.pinimg.com/736x/a.jpg")
+    j.checkpoint(1200)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"offset": 99999, "urls": ["https://i.pinimg.com/736x/b.j')
+
+    j = ScrollJournal(str(path))
+    # Query и хвостовой слеш не мешают узнать ту же страницу
+    assert j.load("https://www.pinterest.com/u/board")
+    assert j.urls == {"https://i.pinimg.com/736x/a.jpg"} and j.offset == 1200
@@ -0,0 +1,37 @@
+"""AdaptivePacer на FeedDriver: пачка ленты «в полёте» до ответа стенда."""
+
+import scroll_pacing
+from bench import FeedDriver
+
+SCROLL = "window.scrollTo(0, document.body.scrollHeight);"
+
+
+def test_feed_driver_reports_inflight_fetch(standin):
+    cfg, base = standin
+    cfg.items, cfg.latency = 100, 0.3
+    drv = FeedDriver(base)
+    try:
+        drv.get(f"{base}/feed")
+        assert drv.execute_script(scroll_pacing._PROBE_JS, "img")[:2] == [25, 0]
+        drv.execute_script(SCROLL)
+        added, inflight, idle, _ = drv.execute_script(scroll_pacing._PROBE_JS, "img")
+        assert (added, inflight) == (25, 1) and idle < 300
+    finally:
+        drv.quit()
+
+
+def test_pacer_waits_for_response_then_network_idle(standin):
+    cfg, base = standin
+    cfg.items, cfg.latency = 100, 0.3
+    drv = FeedDriver(base)
+    try:
+        drv.get(f"{base}/feed")
+        pacer = scroll_pacing.AdaptivePacer(drv, "img", idle_ms=100, base_cap=2.0)
+        pacer.start()
+        drv.execute_script(SCROLL)
+        waited, arrived = pacer.wait()
+        assert arrived
+        # Ответ через 0.3 с + тишина 0.1 с — а не потолок base_cap
+        assert 0.35 <= waited < 1.0
+    finally:
+        drv.quit()
@@ -0,0 +1,46 @@
+"""UgoiraConverter из нескольких потоков: один пул, точные счётчики."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ugoira_convert
+
+
+class CountingPool(ThreadPoolExecutor):
+    created = 0
+
+    def __init__(self, max_workers=None):
+        type(self).created += 1
+        time.sleep(0.05)  # как запуск процессов: окно, в которое успевает второй поток
+        super().__init__(max_workers=max_workers)
+
+
+def test_concurrent_submit_creates_one_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(ugoira_convert, "available", lambda: True)
+    monkeypatch.setattr(ugoira_convert, "ProcessPoolExecutor", CountingPool)
+    # Половина задач падает — считаются и done, и failed
+    def fake_convert(zip_path, frames, fmt, out):
+        if zip_path.endswith("1.ugoira.zip"):
+            raise ValueError("битый zip")
+        return out, len(frames), 0.0
+    monkeypatch.setattr(ugoira_convert, "convert", fake_convert)
+    CountingPool.created = 0
+
+    conv = ugoira_convert.UgoiraConverter("webp", workers=4, log=lambda m: None)
+    go = threading.Barrier(8)
+
+    def feed(t: int):
+        go.wait()
+        for i in range(50):
+            conv.submit(str(tmp_path / f"{t}_{i}_{i % 2}.ugoira.zip"), [{"file": "0.jpg", "delay": 40}])
+
+    threads = [threading.Thread(target=feed, args=(t,)) for t in range(8)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    conv.close()
+
+    assert CountingPool.created == 1
+    assert (conv.done, conv.failed) == (200, 200)
@@ -0,0 +1,94 @@
+"""Проверка библиотеки: обрезанные JPEG/PNG/ZIP и постановка на перекачку (--fix)."""
+
+import io
+import json
+import struct
+import zipfile
+import zlib
+
+import pytest
+
+import verify_library as vl
+from manifest import Manifest, STATUS_FAILED
+from pixiv_sync import UserSyncState
+
+
+def jpeg(size: int = 4096) -> bytes:
+    # FF D9 и внутри, недалеко от конца (как у превью в EXIF), — обрезка по нему не должна сойти за целый файл
+    return (b"\xff\xd8\xff\xe1" + bytes(range(1, 256)) * (size // 255)
+            + b"\xff\xd9" + bytes(range(1, 40)) + b"\xff\xd9")
+
+
+def png(size: int = 4096) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    ihdr = struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0)
+    return vl.PNG_SIG + chunk(b"IHDR", ihdr) + chunk(b"IDAT", bytes(size)) + chunk(b"IEND", b"")
+
+
+def ugoira_zip(frames: int = 3) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as z:
+        for i in range(frames):
+            z.writestr(f"{i:06d}.jpg", jpeg(1024))
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("data,ext", [(jpeg(), ".jpg"), (png(), ".png"), (ugoira_zip(), ".ugoira.zip"),
+                                      (jpeg() + bytes(100), ".jpg")],
+                         ids=["jpeg", "png", "zip", "jpeg-zero-padded"])
+def test_whole_files_pass(tmp_path, data, ext):
+    p = tmp_path / f"1_p0{ext}"
+    p.write_bytes(data)
+    assert vl.check_file(str(p)) == ("ok", None)
+
+
+@pytest.mark.parametrize("data,ext", [(jpeg()[:-2], ".jpg"), (png()[:-2], ".png"),
+                                      (ugoira_zip()[:-30], ".ugoira.zip"),
+                                      (ugoira_zip()[:1500], ".ugoira.zip")],
+                         ids=["jpeg-eoi-inside", "png-no-iend-crc", "zip-no-eocd", "zip-half"])
+def test_truncated_files_are_bad(tmp_path, data, ext):
+    p = tmp_path / f"1_p0{ext}"
+    p.write_bytes(data)
+    status, reason = vl.check_file(str(p))
+    assert status == "bad" and reason
+
+
+def test_html_and_wrong_extension(tmp_path):
+    (tmp_path / "a.jpg").write_bytes(b"<!DOCTYPE html><html>403</html>")
+    (tmp_path / "b.jpg").write_bytes(png())
+    assert vl.check_file(str(tmp_path / "a.jpg"))[0] == "bad"
+    assert vl.check_file(str(tmp_path / "b.jpg")) == ("warn", "внутри png")
+
+
+def test_fix_requeues_pixiv_and_pinterest(tmp_path):
+    user = tmp_path / "pixiv" / "1"
+    user.mkdir(parents=True)
+    (user / "100_p0.jpg").write_bytes(jpeg())
+    (user / "100_p1.jpg").write_bytes(jpeg()[:-500])
+    state = UserSyncState(str(user))
+    state.scan()
+    state.expect("100", ["100_p0.jpg", "100_p1.jpg"])
+    state.save()
+
+    pins = tmp_path / "pinterest" / "board"
+    pins.mkdir(parents=True)
+    (pins / "abc.png").write_bytes(png()[:100])
+    manifest = Manifest.in_dir(str(pins))
+    manifest.record("ab/cd/abc", "abc.png", size=100)
+    manifest.save()
+
+    assert vl.main([str(tmp_path), "--fix", "-j", "1"]) == 1
+
+    assert not (user / "100_p1.jpg").exists() and (user / "100_p1.jpg.corrupt").exists()
+    state = UserSyncState(str(user))
+    state.scan()
+    assert "100" in state.stale and not state.is_complete("100")
+    assert state.pending(["100"]) == ["100"]
+    assert Manifest.in_dir(str(pins)).get("ab/cd/abc")["status"] == STATUS_FAILED
+
+    report = json.loads((tmp_path / vl.REPORT_NAME).read_text(encoding="utf-8"))
+    assert report["files"] == 3
+    assert report["fix"] == {"quarantined": 2, "requeued": 2}
+    # Второй проход: битые в карантине, остальное цело
+    assert vl.main([str(tmp_path), "-j", "1"]) == 0
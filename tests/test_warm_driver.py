@@ -0,0 +1,77 @@
+"""Тёплый драйвер между запусками: падение Edge посреди шага и повторные прогревы."""
+
+import pytest
+
+import pixiv_core
+from cookie_store import WarmDriver
+from warmup import WarmupPolicy
+
+
+class FakeEdge:
+    def __init__(self, n):
+        self.n = n
+        self.dead = False
+        self.quits = 0
+
+    @property
+    def current_window_handle(self):
+        if self.dead:
+            raise ConnectionRefusedError("драйвер не отвечает")
+        return "main"
+
+    def page(self):
+        if self.dead:
+            raise ConnectionRefusedError("драйвер не отвечает")
+        return self.n
+
+    def quit(self):
+        self.quits += 1
+
+
+@pytest.fixture
+def warm():
+    started = []
+
+    def factory():
+        started.append(FakeEdge(len(started)))
+        return started[-1]
+
+    # check_s большой: проверка перед шагом смерть не заметит — ловит только сам шаг
+    drv = WarmDriver(factory, idle_s=0, check_s=3600, log=lambda m: None)
+    drv.acquire()
+    yield drv, started
+    drv.quit()
+
+
+def test_dead_edge_is_restarted_and_step_retried_once(warm):
+    drv, started = warm
+    assert pixiv_core.browser_step(drv, lambda: drv.page()) == 0
+    started[0].dead = True
+
+    assert pixiv_core.browser_step(drv, lambda: drv.page()) == 1
+    assert len(started) == 2 and started[0].quits == 1
+
+
+def test_error_of_live_edge_is_not_retried(warm):
+    drv, started = warm
+    calls = []
+
+    def step():
+        calls.append(drv.page())
+        raise ValueError("на странице нет ссылок")
+
+    with pytest.raises(ValueError):
+        pixiv_core.browser_step(drv, step)
+    assert calls == [0] and len(started) == 1
+
+
+def test_reset_allows_rewarm_on_next_start():
+    policy = WarmupPolicy(None, "session", log=lambda m: None)
+    policy._warm_locked = lambda keys: None
+    assert policy.request("77") is not None
+    policy.service()
+    # Повторный прогрев уже был — в этом запуске второй не поможет
+    assert policy.request("77") is None
+
+    policy.reset()
+    assert policy.request("77") is not None